@@ -0,0 +1,257 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from math import radians
+
+import numpy as np
+
+from controllers import BangBangController, PidfController
+from model import (ArmModel, BatchModel, DrivetrainModel, ElevatorModel, EmaCurrentFilter, IntakeShooterModel,
+                   ShiftingDrivetrainModel, ShooterSpinupModel)
+from model.motors import BAG, CIM, _775pro
+from optimizer import Optimizer
+
+# Every model type is run with each controller type. Goals sit inside max_dist so the closed loop
+# controllers actually regulate, and simulation_time keeps a single calc() in the tens of milliseconds.
+MODELS = {
+    'drivetrain':          (lambda controller: DrivetrainModel(
+                                _775pro(8), gear_ratio=28.3, robot_mass=68, wheel_diameter=6 * 0.0254,
+                                motor_voltage_limit=12, motor_current_limit=30, max_dist=10, simulation_time=3,
+                                controller=controller, auto_calc=False), 5),
+    'shifting_drivetrain': (lambda controller: ShiftingDrivetrainModel(
+                                CIM(6), low_gear_ratio=9, high_gear_ratio=4, wheel_diameter=4 * 0.0254,
+                                robot_mass=68, shift_velocity=2.3, low_gear_current_limit=40,
+                                high_gear_current_limit=30, max_dist=10, simulation_time=3,
+                                controller=controller, auto_calc=False), 5),
+    'elevator':            (lambda controller: ElevatorModel(
+                                motors=_775pro(4), gear_ratio=16, payload_mass=10, pulley_diameter=2 * 0.0254,
+                                max_dist=2, motor_current_limit=30, motor_voltage_limit=12, simulation_time=2,
+                                controller=controller, auto_calc=False), 1),
+    'arm':                 (lambda controller: ArmModel(
+                                motors=BAG(2), gear_ratio=250, arm_mass=10, arm_cg_distance=24 * 0.0254,
+                                max_dist=radians(110), simulation_time=2, controller=controller,
+                                auto_calc=False), radians(70)),
+    'shooter_spinup':      (lambda controller: ShooterSpinupModel(
+                                motors=_775pro(2), gear_ratio=2, wheel_diameter=2 * 0.0254, wheel_inertia=1,
+                                motor_voltage_limit=12, max_dist=0, simulation_time=2, controller=controller,
+                                auto_calc=False), 500),
+    'intake_shooter':      (lambda controller: IntakeShooterModel(
+                                motors=BAG(2), gear_ratio=3, wheel_diameter=2 * 0.0254, element_mass=3.5 / 2.2,
+                                compression_force=45, motor_voltage_limit=12, motor_current_limit=20,
+                                simulation_time=2, controller=controller, auto_calc=False), 50),
+}
+
+
+def _make_pidf(goal):
+    controller = PidfController()
+    controller.set_deadband(goal * 0.01)
+    controller.set_gains(k_p=12 / goal, k_i=0.1, k_d=0)
+    controller.set_goal(goal)
+    return controller
+
+
+def _make_bang_bang(goal):
+    controller = BangBangController()
+    controller.set_gains(toggle_deadband=goal * 0.02)
+    controller.set_goal(goal)
+    return controller
+
+
+CONTROLLERS = {
+    'fixed_voltage': lambda goal: None,  # the models' default FixedVoltageController
+    'pidf':          _make_pidf,
+    'bang_bang':     _make_bang_bang,
+}
+
+
+def _use_rk23(model):
+    model.integrator = 'rk23'
+    model.current_limit_filter = EmaCurrentFilter()  # rk23 needs a time weighted filter with a current limit
+
+
+def _use_analytic(model):
+    model.analytic = True
+
+
+# Integration paths each model and controller is run with. The closed form only applies to fixed voltage runs.
+# Heun cases keep their plain 'model/controller' names so older baselines still compare.
+VARIANTS = {
+    'heun':     lambda model: None,
+    'rk23':     _use_rk23,
+    'analytic': _use_analytic,
+}
+
+BATCH_LANES = 256  # drivetrain lanes with spread gear ratios run as one BatchModel
+
+METRICS = {  # metric: True if larger is better
+    'steps_per_sec':       True,
+    'lane_steps_per_sec':  True,
+    'calc_time':           False,
+    'peak_trace_memory':   False,
+    'ratios_per_sec':      True,
+}
+
+
+def _build(model_name, controller_name, variant='heun'):
+    make_model, goal = MODELS[model_name]
+    with contextlib.redirect_stdout(io.StringIO()):  # constructors print traction info
+        model = make_model(CONTROLLERS[controller_name](goal))
+    VARIANTS[variant](model)
+    return model
+
+
+def _get_cases():  # (name, model, controller, variant)
+    for model_name in MODELS:
+        for controller_name in CONTROLLERS:
+            for variant in VARIANTS:
+                if variant == 'analytic' and controller_name != 'fixed_voltage':
+                    continue
+                name = '{}/{}'.format(model_name, controller_name)
+                if variant != 'heun':
+                    name += '/' + variant
+                yield name, model_name, controller_name, variant
+
+
+def bench_model(model_name, controller_name, repeat, variant='heun'):
+    model = _build(model_name, controller_name, variant)
+    times = []
+    for _ in range(repeat):
+        model.init_sim_vars()
+        start = time.perf_counter()
+        model.calc()
+        times.append(time.perf_counter() - start)
+    steps = model.integration_stats['steps']
+
+    # Separate run, tracemalloc slows the simulation down too much to time it at the same time
+    tracemalloc.start()
+    model.init_sim_vars()  # allocates the trace
+    model.calc()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    calc_time = min(times)
+    return {
+        'steps':             steps,
+        'calc_time':         calc_time,
+        'steps_per_sec':     steps / calc_time,
+        'peak_trace_memory': peak,
+    }
+
+
+def bench_batch(controller_name, repeat):
+    make_model, goal = MODELS['drivetrain']
+    models = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for gear_ratio in np.linspace(10, 40, BATCH_LANES):
+            model = make_model(CONTROLLERS[controller_name](goal))
+            model.gear_ratio = gear_ratio
+            models.append(model)
+    batch = BatchModel.from_models(models, auto_calc=False)
+    times = []
+    for _ in range(repeat):
+        batch.init_sim_vars()
+        start = time.perf_counter()
+        batch.calc()
+        times.append(time.perf_counter() - start)
+    lane_steps = int(batch.num_steps.sum())
+
+    calc_time = min(times)
+    return {
+        'lanes':              BATCH_LANES,
+        'lane_steps':         lane_steps,
+        'calc_time':          calc_time,
+        'lane_steps_per_sec': lane_steps / calc_time,
+    }
+
+
+def bench_optimizer(repeat):
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = DrivetrainModel(_775pro(8), gear_ratio=26, robot_mass=68, wheel_diameter=6 * 0.0254,
+                                motor_voltage_limit=12, motor_current_limit=30, max_dist=6, auto_calc=False)
+        times = []
+        for _ in range(repeat):
+            op = Optimizer(model, min_ratio=10, max_ratio=30, ratio_step=2, max_dist=6, distance_step=0.2)
+            start = time.perf_counter()
+            op.run()
+            times.append(time.perf_counter() - start)
+    run_time = min(times)
+    return {
+        'ratios':         len(op.ratios),
+        'run_time':       run_time,
+        'ratios_per_sec': len(op.ratios) / run_time,
+    }
+
+
+def run(repeat=3, only=None):
+    results = {}
+    for name, model_name, controller_name, variant in _get_cases():
+        if only and only not in name:
+            continue
+        results[name] = bench_model(model_name, controller_name, repeat, variant)
+        print("{:40s} {:8.1f} ms {:10.0f} steps/s {:8.1f} KiB".format(
+            name, results[name]['calc_time'] * 1e3, results[name]['steps_per_sec'],
+            results[name]['peak_trace_memory'] / 1024))
+    for controller_name in CONTROLLERS:
+        name = 'batch/{}'.format(controller_name)
+        if only and only not in name:
+            continue
+        results[name] = bench_batch(controller_name, repeat)
+        print("{:40s} {:8.1f} ms {:10.0f} lane steps/s".format(
+            name, results[name]['calc_time'] * 1e3, results[name]['lane_steps_per_sec']))
+    if not only or only in 'optimizer':
+        results['optimizer'] = bench_optimizer(repeat)
+        print("{:40s} {:8.1f} ms {:10.1f} ratios/s".format(
+            'optimizer', results['optimizer']['run_time'] * 1e3, results['optimizer']['ratios_per_sec']))
+    return {
+        'python':   platform.python_version(),
+        'numpy':    np.__version__,
+        'machine':  platform.machine(),
+        'repeat':   repeat,
+        'results':  results,
+    }
+
+
+def compare(report, baseline, threshold):
+    # Returns [(name, metric, baseline value, new value, relative change)] for metrics worse than threshold
+    regressions = []
+    for name, result in report['results'].items():
+        if name not in baseline['results']:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in result or metric not in baseline['results'][name]:
+                continue
+            old, new = baseline['results'][name][metric], result[metric]
+            change = (new - old) / old if old else 0.0
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append((name, metric, old, new, change))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulator performance benchmarks")
+    parser.add_argument('-o', '--output', help="write results to this JSON file")
+    parser.add_argument('-b', '--baseline', help="JSON file from an earlier run to compare against")
+    parser.add_argument('-t', '--threshold', type=float, default=0.1,
+                        help="relative slowdown or memory growth flagged as a regression (default 0.1)")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="timed runs per case, the best is kept")
+    parser.add_argument('-k', '--only', help="only run cases whose name contains this string")
+    args = parser.parse_args()
+
+    report = run(args.repeat, args.only)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        for name, metric, old, new, change in regressions:
+            print("REGRESSION {} {}: {:.6g} -> {:.6g} ({:+.1%})".format(name, metric, old, new, change))
+        if regressions:
+            sys.exit(1)
+        print("No regressions over {:.0%}".format(args.threshold))
@@ -1,2 +1,4 @@
 from controllers.bang_bang import BangBangController
+from controllers.batch import (BatchBangBangController, BatchControlLoop, BatchFixedVoltageController,
+                               BatchPidfController)
 from controllers.pidf import PidfController
@@ -0,0 +1,177 @@
+from abc import abstractmethod
+
+import numpy as np
+
+from controllers.bang_bang import BangBangController
+from controllers.control_loop import ControlLoop
+from controllers.fixed_voltage import FixedVoltageController
+from controllers.pidf import PidfController
+
+
+def _update_lanes(mask, new, old):  # lanes outside mask (finished runs) keep their old state
+    return new if mask is None else np.where(mask, new, old)
+
+
+class BatchControlLoop:
+    # Array counterpart of ControlLoop: every gain, the goal and the deadband can be scalars or one value per
+    # lane, and update() takes one position per lane. Lanes behave exactly like separate scalar controllers.
+    DATA_KEYS = ControlLoop.DATA_KEYS
+
+    def __init__(self, num_lanes=1):
+        self.num_lanes = num_lanes
+        self._goal = np.zeros(num_lanes)
+        self._deadband = np.zeros(num_lanes)
+        self.reset()
+
+    def _to_lanes(self, value):
+        return np.broadcast_to(np.asarray(value, dtype=float), (self.num_lanes,)).copy()
+
+    def reset(self):
+        self._last_error = np.zeros(self.num_lanes)
+        self._on_goal = np.zeros(self.num_lanes, dtype=bool)
+
+    def get_goal(self):
+        return self._goal
+
+    def get_error(self):
+        return self._last_error
+
+    def get_deadband(self):
+        return self._deadband
+
+    def set_deadband(self, deadband):
+        self._deadband = self._to_lanes(deadband)
+
+    def set_goal(self, goal):
+        self._goal = self._to_lanes(goal)
+
+    def is_done(self):
+        return self._on_goal
+
+    def set_gains(self, *args, **kwargs):
+        pass
+
+    def calc_voltage(self, position, mask=None):
+        return np.zeros(self.num_lanes)
+
+    def update(self, position, mask=None):  # mask selects the lanes that advance, all of them if None
+        self._error = self._goal - position
+        voltage = self.calc_voltage(position, mask)
+        self._last_error = _update_lanes(mask, self._error, self._last_error)
+        self._on_goal = _update_lanes(mask, np.abs(self._last_error) < self._deadband, self._on_goal)
+        return voltage
+
+    def get_data_values(self):  # arrays in DATA_KEYS order
+        return self._last_error, self._goal, self._on_goal.astype(float)
+
+    def _copy_targets(self, controllers):
+        self.set_goal([c.get_goal() for c in controllers])
+        self.set_deadband([c.get_deadband() for c in controllers])
+
+    @classmethod
+    @abstractmethod
+    def from_controllers(cls, controllers):
+        # One lane per scalar controller, with their gains, goals and deadbands. State starts reset.
+        pass
+
+
+class BatchFixedVoltageController(BatchControlLoop):
+    def __init__(self, num_lanes=1):
+        super().__init__(num_lanes)
+        self._voltage = np.zeros(num_lanes)
+
+    def set_gains(self, voltage):
+        self._voltage = self._to_lanes(voltage)
+
+    def calc_voltage(self, position, mask=None):
+        return self._voltage
+
+    @classmethod
+    def from_controllers(cls, controllers):
+        controller = cls(len(controllers))
+        controller._copy_targets(controllers)
+        controller.set_gains([c._voltage for c in controllers])
+        return controller
+
+
+class BatchBangBangController(BatchControlLoop):
+    def __init__(self, num_lanes=1):
+        super().__init__(num_lanes)
+        self.set_gains()
+
+    def set_gains(self, toggle_deadband=0, neutral_voltage=0, forward_voltage=12, reverse_voltage=-12):
+        self.toggle_deadband = self._to_lanes(toggle_deadband)
+        self.neutral_voltage = self._to_lanes(neutral_voltage)
+        self.forward_voltage = self._to_lanes(forward_voltage)
+        self.reverse_voltage = self._to_lanes(reverse_voltage)
+
+    def calc_voltage(self, position, mask=None):
+        return np.where(position < (self._goal - self.toggle_deadband), self.forward_voltage,
+                        np.where(position > (self._goal + self.toggle_deadband), self.reverse_voltage,
+                                 self.neutral_voltage))
+
+    @classmethod
+    def from_controllers(cls, controllers):
+        controller = cls(len(controllers))
+        controller._copy_targets(controllers)
+        controller.set_gains(**{key: [getattr(c, key) for c in controllers]
+                                for key in ('toggle_deadband', 'neutral_voltage', 'forward_voltage',
+                                            'reverse_voltage')})
+        return controller
+
+
+class BatchPidfController(BatchControlLoop):
+    def __init__(self, num_lanes=1):
+        super().__init__(num_lanes)
+        self.set_gains()
+
+    def reset(self):
+        super().reset()
+        self._error_sum = np.zeros(self.num_lanes)
+
+    def set_gains(self, k_f=0, k_p=0, k_i=0, k_d=0, min_i_error=0.1, reset_i_on_overshoot=False):
+        self.k_f = self._to_lanes(k_f)
+        self.k_p = self._to_lanes(k_p)
+        self.k_i = self._to_lanes(k_i)
+        self.k_d = self._to_lanes(k_d)
+        self._min_i_error = self._to_lanes(min_i_error)
+        self.reset_i_on_overshoot = self._to_lanes(reset_i_on_overshoot).astype(bool)
+
+    def calc_voltage(self, position, mask=None):
+        error_sum = np.where(np.abs(self._error) < self._min_i_error, self._error_sum + self._error,
+                             self._error_sum)
+
+        p = self.k_p * self._error
+        i = self.k_i * error_sum
+        d = self.k_d * (self._error - self._last_error)
+        f = self.k_f * self._goal
+
+        overshoot = self.reset_i_on_overshoot & (((self._error > 0) & (self._last_error < 0)) |
+                                                 ((self._error < 0) & (self._last_error > 0)))
+        i = np.where(overshoot, 0, i)
+        self._error_sum = _update_lanes(mask, np.where(overshoot, 0, error_sum), self._error_sum)
+        return p + i - d + f
+
+    @classmethod
+    def from_controllers(cls, controllers):
+        controller = cls(len(controllers))
+        controller._copy_targets(controllers)
+        controller.set_gains(**{key: [getattr(c, key) for c in controllers]
+                                for key in ('k_f', 'k_p', 'k_i', 'k_d', 'reset_i_on_overshoot')},
+                             min_i_error=[c._min_i_error for c in controllers])
+        return controller
+
+
+BATCH_CONTROLLERS = {  # scalar controller type: array counterpart
+    FixedVoltageController: BatchFixedVoltageController,
+    BangBangController:     BatchBangBangController,
+    PidfController:         BatchPidfController,
+}
+
+
+def batch_controllers(controllers):  # one batched controller for scalar controllers that all share a type
+    types = {type(c) for c in controllers}
+    if len(types) != 1 or next(iter(types)) not in BATCH_CONTROLLERS:
+        raise TypeError("Controllers must all be one of {}".format(
+            ", ".join(t.__name__ for t in BATCH_CONTROLLERS)))
+    return BATCH_CONTROLLERS[types.pop()].from_controllers(controllers)
@@ -2,6 +2,7 @@ from abc import abstractmethod
 
 
 class ControlLoop:
+    DATA_KEYS = ('error', 'goal', 'done')
 
     def __init__(self):
         self._goal = 0
@@ -19,6 +20,9 @@ class ControlLoop:
     def get_error(self):
         return self._last_error
 
+    def get_deadband(self):
+        return self._deadband
+
     def set_deadband(self, deadband):
         self._deadband = deadband
 
@@ -42,9 +46,8 @@ class ControlLoop:
         self._on_goal = abs(self._last_error) < self._deadband
         return voltage
 
+    def get_data_values(self):  # values in DATA_KEYS order
+        return self._last_error, self._goal, 1 if self._on_goal else 0
+
     def get_data_point(self):
-        return {
-            'error': self._last_error,
-            'goal': self._goal,
-            'done': 1 if self._on_goal else 0
-        }
+        return dict(zip(self.DATA_KEYS, self.get_data_values()))
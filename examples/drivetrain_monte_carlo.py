@@ -0,0 +1,20 @@
+from model import DrivetrainModel
+from model.motors import CIM
+from monte_carlo import MonteCarloAnalysis
+
+if __name__ == "__main__":
+    model = DrivetrainModel(CIM(4), gear_ratio=10, robot_mass=60, wheel_diameter=6 * 0.0254, max_dist=5,
+                            simulation_time=3, auto_calc=False)
+
+    mc = MonteCarloAnalysis(model, {
+        'effective_mass':         ('normal', 60, 2),
+        'battery_voltage':        ('uniform', 11.8, 12.8),
+        'resistance_com':         ('uniform', 0.010, 0.020),
+        'resistance_one':         ('uniform', 0.001, 0.003),
+        'k_gearbox_efficiency':   ('triangular', 0.6, 0.7, 0.8),
+        'coeff_kinetic_friction': ('normal', 0.8, 0.04),
+        'coeff_static_friction':  ('normal', 1.0, 0.05),
+    }, num_samples=2000, seed=254)
+    mc.run()
+    print(mc.summary())
+    mc.plot()
@@ -0,0 +1,17 @@
+from model import ElevatorModel, plot_models
+from model.motors import _775pro
+from tuner import PidfTuner
+
+if __name__ == "__main__":
+    model = ElevatorModel(motors=_775pro(4), gear_ratio=16, payload_mass=10, pulley_diameter=2 * 0.0254,
+                          max_dist=2, motor_current_limit=30, motor_voltage_limit=12, simulation_time=2,
+                          auto_calc=False)
+
+    tuner = PidfTuner(model, goal=1, cost={'settle_time': 1, 'overshoot': 10})
+    gains, cost = tuner.run(workers=None)
+    print(tuner.format_table())
+
+    model.controller = tuner.make_controller(gains)
+    model.init_sim_vars()
+    model.calc()
+    plot_models(model, elements_to_plot=('pos', 'vel', 'current', 'error'))
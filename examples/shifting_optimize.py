@@ -0,0 +1,17 @@
+import numpy as np
+
+from model import ShiftingDrivetrainModel
+from model.motors import CIM
+from shift_optimizer import ShiftOptimizer
+
+if __name__ == "__main__":
+    model = ShiftingDrivetrainModel(CIM(6), low_gear_ratio=15, high_gear_ratio=6, wheel_diameter=4 * 0.0254,
+                                    robot_mass=68, shift_velocity=2, low_gear_current_limit=40,
+                                    high_gear_current_limit=40, simulation_time=10, auto_calc=False)
+
+    op = ShiftOptimizer(model, low_ratios=np.arange(8, 22, 0.5), high_ratios=np.arange(3, 10, 0.25),
+                        shift_velocities=np.arange(1, 4.5, 0.25), target_distances=[3, 8])
+    op.run(workers=None, coarse=2)
+    print(op.format_table())
+    op.save_xlsx('/tmp/optimize_shifting.xlsx')
+    op.plot()
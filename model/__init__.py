@@ -2,19 +2,33 @@ import colorsys
 from random import randint
 
 import matplotlib.pyplot as plt
-import numpy as np
-from matplotlib import lines, patches
+from matplotlib import lines, patches, ticker
 
 from model._arm import ArmModel
+from model._batch import BatchModel
+from model._cache import SimulationCache
+from model._current_limit import CurrentLimitFilter, EmaCurrentFilter, MovingAverageCurrentFilter, \
+    PeakCurrentFilter
 from model._custom import CustomModel
+from model._downsample import lttb
 from model._drivetrain import DrivetrainModel
 from model._shifting_drivetrain import ShiftingDrivetrainModel
 from model._elevator import ElevatorModel
+from model._export import dump_model_csv, export_arrow, export_csv, export_models, export_npz
 from model._intake_shooter import IntakeShooterModel
+from model._profiler import SimulationProfiler
+from model._query import TraceQuery
+from model._recorder import TraceRecorder, DecimatingRecorder, FinalStateRecorder, FixedIntervalRecorder
 from model._shooter_spinup import ShooterSpinupModel
+from model._state import SimulationState
+from model._termination import ControllerDoneTermination, PredicateTermination, SteadyStateTermination, \
+    TerminationCriterion
 
 
-def plot_models(*models, elements_to_plot=('pos', 'vel', 'accel')):
+def plot_models(*models, elements_to_plot=('pos', 'vel', 'accel'), downsample=True, blit=True):
+    # downsample: reduce every line to about one point per horizontal pixel with LTTB, which keeps peaks and edges
+    # blit: on interactive backends, redraw only the lines and legend when toggling them from the legend. The lines
+    # are then animated artists, which savefig leaves out, so turn it off for figures that will be saved from the window
     fig, ax = plt.subplots()
 
     line_colours = []
@@ -29,25 +43,30 @@ def plot_models(*models, elements_to_plot=('pos', 'vel', 'accel')):
     for i in range(2, len(elements_to_plot)):
         line_types += [line_types[-1] + [1, 1]]
 
-    ax.set_yticks(np.arange(0, 1000, 1))
-    # ax.set_yticks(np.arange(0, 101, 1), minor=True)
-    ax.set_xticks(np.arange(0, 100, 0.5))
-    ax.set_xticks(np.arange(0, 100, 0.1), minor=True)
+    ax.xaxis.set_major_locator(ticker.MaxNLocator(steps=[1, 2, 2.5, 5, 10]))
+    ax.xaxis.set_minor_locator(ticker.AutoMinorLocator())
+    ax.yaxis.set_major_locator(ticker.MaxNLocator(steps=[1, 2, 2.5, 5, 10]))
+    ax.yaxis.set_minor_locator(ticker.AutoMinorLocator())
 
     ax.set(xlabel='time (s)', title='{} Acceleration Model'.format(models[0].get_type()))
     ax.grid(which='minor', alpha=0.2)
     ax.grid(which='major', alpha=0.5)
 
+    max_points = int(ax.bbox.width) if downsample else 0
+    animated = blit and fig.canvas.supports_blit and fig.canvas.required_interactive_framework is not None
+
     legend_handles = []
     handle_lines = []
     for i in range(len(models)):
         model = models[i]
-        t = [e['time'] for e in model.data_points]
+        t = model.trace['time']
         model_lines = []
         for j in range(len(elements_to_plot)):
             key = elements_to_plot[j]
-            model_lines += ax.plot(t, [(e[key] / model.PLOT_FACTORS[key]) for e in model.data_points], label=key,
-                                    color=line_colours[i], dashes=line_types[j])
+            y = model.trace[key] / model.PLOT_FACTORS[key]
+            index = lttb(t, y, max_points) if max_points else slice(None)
+            model_lines += ax.plot(t[index], y[index], label=key, animated=animated,
+                                   color=line_colours[i], dashes=line_types[j])
         handle_lines.append(model_lines)
         handle = patches.Patch(color=line_colours[i], label=models[i].to_str())
         legend_handles.append(handle)
@@ -60,11 +79,12 @@ def plot_models(*models, elements_to_plot=('pos', 'vel', 'accel')):
         handle_lines.append([e[i] for e in model_lines])
         legend_handles.append(handle)
     legend = ax.legend(handles=legend_handles, fancybox=True)
+    legend.set_animated(animated)
 
     line_handle_dict = dict()
     handle_visibility = dict()
     line_visibility = dict()
-    for handle, model_lines in zip(legend.legendHandles, handle_lines):
+    for handle, model_lines in zip(legend.legend_handles, handle_lines):
         handle.set_picker(5)  # 5 pts tolerance
         line_handle_dict[handle] = model_lines
         handle_visibility[handle] = True
@@ -73,6 +93,19 @@ def plot_models(*models, elements_to_plot=('pos', 'vel', 'accel')):
                 continue
             line_visibility[line] = 1
 
+    background = None
+
+    def draw_animated():
+        for line in line_visibility:
+            ax.draw_artist(line)
+        ax.draw_artist(legend)
+        fig.canvas.blit(fig.bbox)
+
+    def handle_draw_event(event):  # the axes without lines or legend, restored before every blit
+        nonlocal background
+        background = fig.canvas.copy_from_bbox(fig.bbox)
+        draw_animated()
+
     def handle_pick_event(event):
         handle = event.artist
         handle_lines = line_handle_dict[handle]
@@ -80,24 +113,19 @@ def plot_models(*models, elements_to_plot=('pos', 'vel', 'accel')):
         for line in handle_lines:
             line_visibility[line] += 1 if should_be_visible else -1
             line.set_visible(line_visibility[line] > 0)
-        if legend.legendHandles.index(handle) < len(models):
-            handle.set_color(list(line_colours[legend.legendHandles.index(handle)]) + [1.0 if should_be_visible else 0.2])
+        if legend.legend_handles.index(handle) < len(models):
+            handle.set_color(list(line_colours[legend.legend_handles.index(handle)]) +
+                             [1.0 if should_be_visible else 0.2])
         else:
             handle.set_color([0, 0, 0, 1.0 if should_be_visible else 0.2])
         handle_visibility[handle] = should_be_visible
-        fig.canvas.draw()
+        if animated and background is not None:
+            fig.canvas.restore_region(background)
+            draw_animated()
+        else:
+            fig.canvas.draw_idle()
 
+    if animated:
+        fig.canvas.mpl_connect('draw_event', handle_draw_event)
     fig.canvas.mpl_connect('pick_event', handle_pick_event)
     plt.show()
-
-
-def dump_model_csv(model, filename):
-    data_points = model.get_data_points()
-    headers = list(model.get_data_points()[0].keys()) + \
-              [(e + "=" + str(model.to_json()[e])) for e in list(model.to_json().keys())]
-
-    csv_lines = [list(e.values()) for e in data_points]
-    csv_lines = [[str(format(e, '.5f') if isinstance(e, float) else e) for e in line] for line in csv_lines]
-    csv_str = "\n".join(headers + [",".join(e) for e in csv_lines])
-
-    open(filename, "w+").write(csv_str)
@@ -5,6 +5,8 @@ from model.motors import Motor
 
 
 class ArmModel(CustomModel):
+    FILTERED_CURRENT_LIMIT = False  # the current is clamped directly, current_limit_filter is unused
+
     def __init__(self,
                  motors: Motor,
                  gear_ratio: float,
@@ -27,7 +29,13 @@ class ArmModel(CustomModel):
                  initial_acceleration=0,
                  controller=None,
                  auto_calc=True,
-                 name=None):
+                 name=None,
+                 integrator='heun',
+                 integrator_tolerance=1e-6,
+                 cache=None,
+                 recorder=None,
+                 profiler=None,
+                 termination=None):
 
         self.HEADERS.update({
             'pos':          'Position (rad)',
@@ -62,7 +70,16 @@ class ArmModel(CustomModel):
                          initial_acceleration=initial_acceleration,
                          controller=controller,
                          auto_calc=auto_calc,
-                        name=name)
+                        name=name,
+                        integrator=integrator,
+                        integrator_tolerance=integrator_tolerance,
+                        cache=cache,
+                        recorder=recorder,
+                        profiler=profiler,
+                        termination=termination)
+
+    def _can_solve_analytically(self):  # gravity torque depends on the angle, so the dynamics are never linear
+        return False
 
     def _get_gravity_force(self):
         return self.effective_weight * cos(self._position)
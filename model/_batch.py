@@ -0,0 +1,285 @@
+import numpy as np
+
+from controllers.batch import BatchFixedVoltageController, batch_controllers
+from model._current_limit import MovingAverageCurrentFilter
+from model._custom import CustomModel
+from model.motors import MOTOR_REGISTRY
+
+
+def _as_lane_array(value):
+    # None is used by the scalar models for "no limit"/"no cutoff", carried here as NaN
+    if value is None:
+        return np.array(np.nan)
+    return np.array(value, dtype=float)
+
+
+class BatchModel:
+    BROWNOUT_VOLTAGE = CustomModel.BROWNOUT_VOLTAGE
+
+    PARAMETERS = {
+        'k_r':                      None,  # Motor resistance constant, Ω
+        'k_v':                      None,  # Motor speed constant, rad/s/V
+        'k_t':                      None,  # Motor torque constant (all motors), N*m/A
+        'num_motors':               1,
+        'gear_ratio':               None,
+        'effective_radius':         None,  # m
+        'effective_mass':           None,  # kg
+        'gravity_force':            0,  # N
+        'normal_force':             None,  # N
+        'check_for_slip':           False,
+        'coeff_kinetic_friction':   1,
+        'coeff_static_friction':    1,
+        'motor_current_limit':      None,
+        'motor_peak_current_limit': None,
+        'motor_voltage_limit':      None,
+        'voltage_setpoint':         None,
+        'battery_voltage':          12.5,
+        'resistance_com':           0.013,
+        'resistance_one':           0.002,
+        'k_gearbox_efficiency':     0.7,
+        'k_resistance_s':           0,
+        'k_resistance_v':           0,
+        'time_step':                0.001,
+        'simulation_time':          120.0,
+        'max_dist':                 None,
+        'initial_position':         0,
+        'initial_velocity':         0,
+        'initial_acceleration':     0
+    }
+
+    CHANNELS = ('time', 'pos', 'vel', 'accel', 'voltage', 'current', 'total_current', 'sys_voltage', 'energy',
+                'total_energy', 'slipping', 'brownout', 'current_limited') + BatchFixedVoltageController.DATA_KEYS
+
+    def __init__(self, record=(), current_history_size=20, auto_calc=True,
+                 motor_type=None,  # MOTOR_REGISTRY keys or IDs per lane, in place of k_r, k_v and k_t
+                 controller=None,  # a BatchControlLoop, the default holds every lane at voltage_setpoint
+                 **params):
+        unknown = set(params) - set(self.PARAMETERS)
+        if unknown:
+            raise TypeError("Unknown batch parameters: {}".format(", ".join(sorted(unknown))))
+        if motor_type is not None:
+            if {'k_r', 'k_v', 'k_t'} & set(params):
+                raise TypeError("motor_type replaces k_r, k_v and k_t, they can't be given as well")
+            ids, num_motors = np.broadcast_arrays(MOTOR_REGISTRY.get_ids(motor_type),
+                                                  np.asarray(params.get('num_motors', 1), dtype=float))
+            params.update(MOTOR_REGISTRY.get_constants(ids, num_motors))
+        unknown = set(record) - set(self.CHANNELS)
+        if unknown:
+            raise ValueError("Cannot record channels: {}".format(", ".join(sorted(unknown))))
+
+        values = dict(self.PARAMETERS)
+        values.update(params)
+        if values['normal_force'] is None and values['effective_mass'] is not None:
+            values['normal_force'] = np.asarray(values['effective_mass'], dtype=float) * 9.80665
+        if values['voltage_setpoint'] is None:
+            values['voltage_setpoint'] = np.where(np.isnan(_as_lane_array(values['motor_voltage_limit'])),
+                                                  _as_lane_array(values['battery_voltage']),
+                                                  _as_lane_array(values['motor_voltage_limit']))
+        missing = [k for k, v in values.items() if v is None and k not in ('motor_current_limit',
+                                                                            'motor_peak_current_limit',
+                                                                            'motor_voltage_limit', 'max_dist')]
+        if missing:
+            raise TypeError("Missing batch parameters: {}".format(", ".join(missing)))
+
+        lanes = np.zeros(controller.num_lanes if controller is not None else 1)
+        arrays = np.broadcast_arrays(*[_as_lane_array(values[k]) for k in self.PARAMETERS], lanes)
+        for key, array in zip(self.PARAMETERS, arrays):
+            setattr(self, key, np.atleast_1d(array).astype(float))
+        self.check_for_slip = self.check_for_slip.astype(bool)
+        self.num_lanes = len(self.gear_ratio)
+
+        self.controller = controller
+        if self.controller is None:
+            self.controller = BatchFixedVoltageController(self.num_lanes)
+            self.controller.set_gains(self.voltage_setpoint)
+        elif self.controller.num_lanes != self.num_lanes:
+            raise ValueError("The controller has {} lanes but the parameters have {}".format(
+                self.controller.num_lanes, self.num_lanes))
+
+        self.record = tuple(record)
+        self.current_history_size = current_history_size
+
+        self.init_sim_vars()
+        if auto_calc:
+            self.calc()
+
+    @classmethod
+    def from_models(cls, models, **kwargs):  # kwargs can also override PARAMETERS, e.g. with per-lane arrays
+        params = {k: [] for k in cls.PARAMETERS}
+        windows = set()
+        for model in models:
+            if type(model)._calc_max_accel is not CustomModel._calc_max_accel or \
+                    type(model).update is not CustomModel.update:
+                raise TypeError("{} has custom dynamics and cannot be batched".format(model.__class__.__name__))
+            if type(model.current_limit_filter) is not MovingAverageCurrentFilter:
+                raise TypeError("Only MovingAverageCurrentFilter current limits can be batched")
+            windows.add(model.current_limit_filter.window)
+            params['k_r'].append(model.motors.k_r)
+            params['k_v'].append(model.motors.k_v)
+            params['k_t'].append(model.motors.k_t)
+            params['num_motors'].append(model.num_motors)
+            params['effective_radius'].append(model.effective_radius)
+            params['gravity_force'].append(model._get_gravity_force())
+            params['normal_force'].append(model._get_normal_force())
+            for key in ('gear_ratio', 'effective_mass', 'check_for_slip', 'coeff_kinetic_friction',
+                        'coeff_static_friction', 'motor_current_limit', 'motor_peak_current_limit',
+                        'motor_voltage_limit', 'battery_voltage', 'resistance_com', 'resistance_one',
+                        'k_gearbox_efficiency', 'k_resistance_s', 'k_resistance_v', 'time_step', 'simulation_time',
+                        'max_dist', 'initial_position', 'initial_velocity', 'initial_acceleration'):
+                params[key].append(getattr(model, key))
+        params = {k: np.array(v, dtype=float) for k, v in params.items() if k != 'voltage_setpoint'}
+        params['max_dist'] = np.where(params['max_dist'] == 0, np.nan, params['max_dist'])
+        if len(windows) > 1:
+            raise ValueError("All batched models must share one current limit filter window")
+        if windows:
+            kwargs.setdefault('current_history_size', windows.pop())
+        params.update((key, kwargs.pop(key)) for key in list(kwargs) if key in cls.PARAMETERS)
+        kwargs.setdefault('controller', batch_controllers([model.controller for model in models]))
+        return cls(**params, **kwargs)
+
+    def init_sim_vars(self):
+        n = self.num_lanes
+        self._time = np.zeros(n)
+        self._position = self.initial_position.copy()
+        self._velocity = self.initial_velocity.copy()
+        self._acceleration = self.initial_acceleration.copy()
+        self._voltage = self.battery_voltage.copy()
+        self._current_per_motor = np.zeros(n)
+        self._energy_per_motor = np.zeros(n)
+        self._cumulative_energy = np.zeros(n)
+        self._slipping = np.zeros(n, dtype=bool)
+        self._brownout = np.zeros(n, dtype=bool)
+        self._voltage_setpoint = np.zeros(n)
+
+        self._current_history = np.zeros((n, self.current_history_size))
+        self._current_history_sum = np.zeros(n)
+        self._current_history_index = 0
+        self._was_current_limited = np.zeros(n, dtype=bool)
+
+        self.controller.reset()
+        self._active = np.ones(n, dtype=bool)
+        self.num_steps = np.zeros(n, dtype=int)
+        self.data = {key: [] for key in self.record}
+
+    def update(self, mask=None):
+        voltage_setpoint = self.controller.update(self._position, mask)
+        self._voltage_setpoint = np.where(~np.isnan(self.motor_voltage_limit),
+                                          np.clip(voltage_setpoint, -self.motor_voltage_limit,
+                                                  self.motor_voltage_limit),
+                                          voltage_setpoint)
+
+    def _calc_max_accel(self, velocity, mask):
+        motor_speed = velocity / self.effective_radius * self.gear_ratio
+
+        available_voltage = self._voltage
+        has_voltage_limit = ~np.isnan(self.motor_voltage_limit) & (self.motor_voltage_limit != 0)
+        available_voltage = np.where(has_voltage_limit, np.fmin(self._voltage, self.motor_voltage_limit),
+                                     available_voltage)
+        applied_voltage = np.minimum(self._voltage_setpoint, available_voltage)
+
+        current = (applied_voltage - (motor_speed / self.k_v)) / self.k_r
+
+        average_current = self._current_history_sum / self.current_history_size
+        limit_check = (velocity > 0) & ~np.isnan(self.motor_current_limit)
+        limiting = limit_check & ((average_current > self.motor_current_limit) | self._was_current_limited)
+        self._was_current_limited = np.where(mask, self._was_current_limited | limiting, self._was_current_limited)
+        current = np.where(limiting, np.fmin(current, self.motor_current_limit), current)
+        current = np.fmin(current, self.motor_peak_current_limit)  # fmin ignores NaN (no limit)
+
+        max_torque_at_voltage = self.k_t * current
+
+        available_torque_at_axle = self.k_gearbox_efficiency * max_torque_at_voltage * self.gear_ratio
+        available_force_at_axle = available_torque_at_axle / self.effective_radius
+
+        static_force = self.normal_force * self.coeff_static_friction
+        kinetic_force = self.normal_force * self.coeff_kinetic_friction
+        slipping = np.where(available_force_at_axle > static_force, True,
+                            np.where(available_force_at_axle < kinetic_force, False, self._slipping))
+        slipping &= self.check_for_slip
+        self._slipping = np.where(mask, slipping, self._slipping)
+        available_force_at_axle = np.where(self._slipping, kinetic_force, available_force_at_axle)
+
+        voltage = self.battery_voltage - (current * self.resistance_one) - \
+                  (self.num_motors * current * self.resistance_com)
+        self._voltage = np.where(mask, voltage, self._voltage)
+        self._current_per_motor = np.where(mask, current, self._current_per_motor)
+
+        self._brownout = np.where(mask, self._voltage < self.BROWNOUT_VOLTAGE, self._brownout)
+
+        tuned_resistance = self.k_resistance_s + self.k_resistance_v * velocity  # rolling resistance, N
+        net_accel_force = available_force_at_axle - tuned_resistance - self.gravity_force  # Net force, N
+
+        net_accel_force = np.where((net_accel_force < 0) & (self._position <= 0), 0, net_accel_force)
+        return net_accel_force / self.effective_mass
+
+    def _update_active(self):
+        self._active &= self._time < self.simulation_time + self.time_step
+        self._active &= np.isnan(self.max_dist) | (self._position < self.max_dist)
+
+    def _integrate_with_heun(self):  # numerical integration using Heun's Method, all lanes in lockstep
+        self._time = np.where(self._active, self.time_step, self._time)
+        self._update_active()
+        while self._active.any():
+            mask = self._active
+            dt = self.time_step
+            self.update(mask)
+            v_temp = self._velocity + self._acceleration * dt  # kickstart with Euler step
+            a_temp = self._calc_max_accel(v_temp, mask)
+            v_temp = self._velocity + (self._acceleration + a_temp) / 2 * dt  # recalc v_temp trapezoidally
+            self._position = np.where(mask, self._position + (self._velocity + v_temp) / 2 * dt, self._position)
+            self._velocity = np.where(mask, v_temp, self._velocity)
+            self._acceleration = np.where(mask, self._calc_max_accel(self._velocity, mask), self._acceleration)
+
+            self._energy_per_motor = np.where(mask, self._current_per_motor * dt * 1000 / 60 / 60,
+                                              self._energy_per_motor)  # calc power usage in mAh
+            self._cumulative_energy += np.where(mask, self._energy_per_motor * self.num_motors, 0)
+
+            i = self._current_history_index
+            new_current = np.where(mask, self._current_per_motor, self._current_history[:, i])
+            self._current_history_sum += new_current - self._current_history[:, i]
+            self._current_history[:, i] = new_current
+            self._current_history_index = (i + 1) % self.current_history_size
+
+            self.num_steps += mask
+            self._add_data_point()
+            self._time = np.where(mask, self._time + dt, self._time)
+            self._update_active()
+
+    def _get_channel(self, key):
+        return {
+            'time':            lambda: self._time,
+            'pos':             lambda: self._position,
+            'vel':             lambda: self._velocity,
+            'accel':           lambda: self._acceleration,
+            'voltage':         lambda: self._voltage_setpoint,
+            'current':         lambda: self._current_per_motor,
+            'total_current':   lambda: self._current_per_motor * self.num_motors,
+            'sys_voltage':     lambda: self._voltage,
+            'energy':          lambda: self._energy_per_motor,
+            'total_energy':    lambda: self._cumulative_energy,
+            'slipping':        lambda: self._slipping.astype(float),
+            'brownout':        lambda: self._brownout.astype(float),
+            'current_limited': lambda: self._was_current_limited.astype(float),
+            'error':           lambda: self.controller.get_data_values()[0],
+            'goal':            lambda: self.controller.get_data_values()[1],
+            'done':            lambda: self.controller.get_data_values()[2]
+        }[key]()
+
+    def _add_data_point(self):
+        for key in self.record:
+            self.data[key].append(np.where(self._active, self._get_channel(key), np.nan))
+
+    def get_data(self, key):
+        return np.array(self.data[key])  # shape (steps, lanes), NaN once a lane has finished
+
+    def get_final(self, key):
+        if key == 'time':
+            return self._time - self.time_step  # the clock has already advanced past the last recorded step
+        return self._get_channel(key).copy()
+
+    def calc(self):
+        self.update()
+        self._acceleration = self._calc_max_accel(self._velocity, self._active)  # compute accel at t=0
+        self._add_data_point()  # output values at t=0
+
+        self._integrate_with_heun()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+_SCALAR_TYPES = (bool, int, float, str, type(None))
+
+
+def _to_json(value):  # numpy scalars, e.g. flags computed from numpy parameters
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+def _from_json(value):  # JSON turns tuples into lists
+    return tuple(_from_json(v) for v in value) if isinstance(value, list) else value
+
+
+def _scalar_attributes(obj, include_private=False):
+    return {k: v for k, v in sorted(vars(obj).items())
+            if isinstance(v, _SCALAR_TYPES) and (include_private or not k.startswith('_'))}
+
+
+class SimulationCache:
+    def __init__(self,
+                 directory=None,  # Defaults to ~/.cache/drivetrain_model
+                 max_size=512 * 1024 ** 2):  # Total size cap before least recently used entries are evicted, bytes
+        if directory is None:
+            directory = os.path.join(os.path.expanduser('~'), '.cache', 'drivetrain_model')
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_key(self, model):
+        model_class = type(model)
+        params = model.to_json()
+        params.update(_scalar_attributes(model))
+        params.pop('name', None)
+        content = {
+            'class':              model_class.__module__ + '.' + model_class.__qualname__,
+            'integrator_version': model.INTEGRATOR_VERSION,
+            'params':             params,
+            'controller':         [type(model.controller).__qualname__,
+                                   _scalar_attributes(model.controller, include_private=True)],
+            'current_filter':     [type(model.current_limit_filter).__qualname__,
+                                   _scalar_attributes(model.current_limit_filter)],
+            'recorder':           [type(model.recorder).__qualname__, _scalar_attributes(model.recorder)],
+            'termination':        [[type(criterion).__qualname__, _scalar_attributes(criterion)]
+                                   for criterion in model.termination or ()]
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=repr).encode()).hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, model, key):
+        path = self._get_path(key)
+        try:
+            with np.load(path) as data:
+                channels = tuple(data['__channels__'].tolist())
+                if channels != model.trace.channels:
+                    return False
+                columns = [data[channel] for channel in channels]
+                stats = json.loads(str(data['__stats__']))
+                state = json.loads(str(data['__state__']))
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return False  # missing, evicted mid-read or corrupt entries are just misses
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+
+        model.trace.clear()
+        model.trace.extend(np.column_stack(columns))
+        model.integration_stats = stats
+        for key, value in state['attributes'].items():  # the state the run ended in, which recorders may not keep
+            setattr(model, key, _from_json(value))
+        model.terminated_by = model.termination[state['terminated_by']] if state['terminated_by'] is not None \
+            else None
+        return True
+
+    def store(self, model, key):
+        columns = model.trace.columns()
+        state = {
+            'attributes':    {attribute: getattr(model, attribute) for attribute in model.STATE_ATTRIBUTES},
+            'terminated_by': model.termination.index(model.terminated_by) if model.terminated_by is not None
+            else None
+        }
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.savez_compressed(file, __channels__=np.array(model.trace.channels),
+                                    __stats__=np.array(json.dumps(model.integration_stats, default=_to_json)),
+                                    __state__=np.array(json.dumps(state, default=_to_json)), **columns)
+            os.replace(temp_path, self._get_path(key))  # atomic, so concurrent readers never see partial files
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # another process evicted it first
+            total_size -= size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
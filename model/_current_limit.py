@@ -0,0 +1,108 @@
+from copy import deepcopy
+from math import exp
+
+
+class CurrentLimitFilter:
+    time_weighted = True  # samples count by their time_step, so the filter behaves the same at any step size
+
+    def reset(self):
+        pass
+
+    def add_sample(self, current, time_step):
+        pass
+
+    def is_over_limit(self, current_limit):
+        return False
+
+    def is_over_limit_after(self, current, time_step, current_limit):  # is_over_limit once the sample is added
+        trial = deepcopy(self)
+        trial.add_sample(current, time_step)
+        return trial.is_over_limit(current_limit)
+
+    def is_settled(self, current, current_limit):  # True if samples no larger than current can't go over the limit
+        return False
+
+
+class MovingAverageCurrentFilter(CurrentLimitFilter):
+    time_weighted = False  # the window is a number of samples, so its length in time depends on the step size
+
+    def __init__(self, window=20):  # window size, samples
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self._history = [0.0] * self.window
+        self._index = 0
+        self._sum = 0.0
+
+    def add_sample(self, current, time_step):
+        self._sum += current - self._history[self._index]
+        self._history[self._index] = current
+        self._index += 1
+        if self._index == self.window:
+            self._index = 0
+            self._sum = sum(self._history)  # re-sum once per lap so rounding error can't accumulate
+
+    def get_value(self):
+        return self._sum / self.window
+
+    def is_over_limit(self, current_limit):
+        return self.get_value() > current_limit
+
+    def is_settled(self, current, current_limit):
+        return current <= current_limit and max(self._history) <= current_limit
+
+
+class EmaCurrentFilter(CurrentLimitFilter):
+    def __init__(self, time_constant=0.02):  # filter time constant, s
+        self.time_constant = time_constant
+        self.reset()
+
+    def reset(self):
+        self._value = 0.0
+
+    def add_sample(self, current, time_step):
+        alpha = 1 - exp(-time_step / self.time_constant)
+        self._value += alpha * (current - self._value)
+
+    def get_value(self):
+        return self._value
+
+    def is_over_limit(self, current_limit):
+        return self._value > current_limit
+
+    def is_over_limit_after(self, current, time_step, current_limit):
+        return self._value + (1 - exp(-time_step / self.time_constant)) * (current - self._value) > current_limit
+
+    def is_settled(self, current, current_limit):
+        return current <= current_limit and self._value <= current_limit
+
+
+class PeakCurrentFilter(CurrentLimitFilter):
+    # Motor controller style limit: once the current has stayed above peak_current_limit for
+    # peak_duration, it is held at the model's (continuous) motor_current_limit.
+    def __init__(self, peak_current_limit, peak_duration=0.0):  # A, s
+        self.peak_current_limit = peak_current_limit
+        self.peak_duration = peak_duration
+        self.reset()
+
+    def reset(self):
+        self._time_over_peak = 0.0
+        self._over_peak = False
+
+    def add_sample(self, current, time_step):
+        if current > self.peak_current_limit:
+            self._time_over_peak += time_step
+            self._over_peak = True
+        else:
+            self._time_over_peak = 0.0
+            self._over_peak = False
+
+    def is_over_limit(self, current_limit):
+        return self._over_peak and self._time_over_peak >= self.peak_duration
+
+    def is_over_limit_after(self, current, time_step, current_limit):
+        return current > self.peak_current_limit and self._time_over_peak + time_step >= self.peak_duration
+
+    def is_settled(self, current, current_limit):
+        return current <= self.peak_current_limit and not self.is_over_limit(current_limit)
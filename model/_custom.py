@@ -1,12 +1,33 @@
-from collections import OrderedDict
-from math import radians, sin, cos
+from math import floor, radians, sin, cos
+
+import numpy as np
 
 from controllers.fixed_voltage import FixedVoltageController
+from model._current_limit import MovingAverageCurrentFilter
+from model._recorder import TraceRecorder
+from model._state import SimulationState
+from model._termination import TerminationCriterion
+from model._trace import Trace
 
 
 class CustomModel:
     BROWNOUT_VOLTAGE = 7
 
+    INTEGRATORS = ('heun', 'rk23')
+    INTEGRATOR_VERSION = 4  # Bump whenever a change alters simulation output, invalidating cached results
+    ADAPTIVE_MAX_STEP_FACTOR = 100  # Largest adaptive step, in multiples of time_step
+    EVENT_TOLERANCE = 1e-9  # Width of the bracket an event is located to, s
+    FILTERED_CURRENT_LIMIT = True  # _calc_max_accel holds motor_current_limit once current_limit_filter is over it
+    VOLTAGE_TOLERANCE = 1e-9  # System voltage convergence for adaptive stages, V
+    VOLTAGE_ITERATIONS = 50
+    ANALYTIC_RETRY_STEPS = 64  # most steps between attempts to switch to the closed form
+    ANALYTIC_VOLTAGE_TOLERANCE = 1e-2  # V, how far the integrator's system voltage may be from the consistent one
+    # Attributes advanced by integration, captured by snapshot(). Subclasses extend it with anything their update()
+    # or _calc_max_accel() changes.
+    STATE_ATTRIBUTES = ('_time', '_position', '_velocity', '_acceleration', '_voltage', '_current_per_motor',
+                        '_energy_per_motor', '_cumulative_energy', '_slipping', '_brownout', '_voltage_setpoint',
+                        '_was_current_limited', '_linear_coefficients', '_analytic_retry', '_step_size')
+
     HEADERS = {
         'time':          'Time (s)',
         'pos':           'Position (m)',
@@ -45,6 +66,9 @@ class CustomModel:
         'done':          1
     }
 
+    CHANNELS = ('time', 'pos', 'vel', 'accel', 'voltage', 'current', 'total_current', 'sys_voltage', 'energy',
+                'total_energy', 'slipping', 'brownout', 'gravity')
+
     def __init__(self,
                  motors,  # Motor object
                  gear_ratio,  # Gear ratio, driven/driving
@@ -71,7 +95,15 @@ class CustomModel:
                  initial_acceleration=0,  # Initial acceleration to start simulation from, m/s/s
                  controller=None,
                  auto_calc=True,
-                 name=None):
+                 name=None,
+                 current_limit_filter=None,  # CurrentLimitFilter deciding when motor_current_limit engages
+                 integrator='heun',  # 'heun' (fixed step) or 'rk23' (adaptive step with event location)
+                 integrator_tolerance=1e-6,  # Local error tolerance for adaptive integration
+                 cache=None,  # SimulationCache to reuse results of identical simulations from
+                 recorder=None,  # TraceRecorder deciding which states are stored in the trace
+                 profiler=None,  # SimulationProfiler timing the phases of calc(), off by default
+                 analytic=False,  # Solve the linear tail of fixed voltage runs in closed form
+                 termination=None):  # TerminationCriterion, or a list of them, ending the run early when met
 
         self.motors = motors
         self.num_motors = self.motors.num_motors
@@ -98,11 +130,27 @@ class CustomModel:
         self.initial_velocity = initial_velocity
         self.initial_acceleration = initial_acceleration
         self.name = name
+        if integrator not in self.INTEGRATORS:
+            raise ValueError("Unknown integrator '{}', expected one of {}".format(integrator, self.INTEGRATORS))
+        self.integrator = integrator
+        self.integrator_tolerance = integrator_tolerance
+        self.cache = cache
+        self.recorder = recorder
+        if self.recorder is None:
+            self.recorder = TraceRecorder()
+        self.profiler = profiler
+        self.analytic = analytic
+        self.termination = termination
+        if isinstance(self.termination, TerminationCriterion):
+            self.termination = [self.termination]
         self.controller = controller
         if self.controller is None:
             self.controller = FixedVoltageController()
             self.controller.set_gains(
                     self.motor_voltage_limit if motor_voltage_limit is not None else self.battery_voltage)
+        self.current_limit_filter = current_limit_filter
+        if self.current_limit_filter is None:
+            self.current_limit_filter = MovingAverageCurrentFilter()
 
         # Calculate derived constants
         self.effective_radius = effective_diameter / 2
@@ -137,11 +185,28 @@ class CustomModel:
         self._brownout = False
         self._voltage_setpoint = 0
 
-        self._current_history_size = 20
-        self._current_history = [0 for _ in range(self._current_history_size)]
+        self.current_limit_filter.reset()
+        self.controller.reset()  # no integral or error left over from an earlier run
         self._was_current_limited = False
+        self._linear_coefficients = None
+        self._analytic_retry = None  # (mode, step, interval) the closed form is rejected in and until
+        self._step_size = self.time_step  # rk23's next step, kept so advance() resumes the same steps
+        self.terminated_by = None  # the TerminationCriterion that ended the last run, if any
+        for criterion in self.termination or ():
+            criterion.reset()
+
+        self.integration_stats = {
+            'steps':          0,
+            'rejected':       0,
+            'evaluations':    0,
+            'events':         0,
+            'max_error':      0.0,  # largest local velocity error estimate, m/s
+            'analytic_steps': 0,  # steps taken from the closed form solution
+            'extrapolated':   0  # steps filled in after a termination criterion was met
+        }
 
-        self.data_points = []
+        self.trace = Trace(self.get_channels(),
+                           min(int(self.simulation_time / self.time_step) + 2, Trace.INITIAL_CAPACITY))
 
     def _get_gravity_force(self):
         return self.effective_weight * sin(radians(self.incline_angle))
@@ -166,8 +231,7 @@ class CustomModel:
         self._current_per_motor = (applied_voltage - (motor_speed / self.motors.k_v)) / self.motors.k_r
 
         if velocity > 0 and self.motor_current_limit is not None:
-            if (sum(self._current_history) / len(self._current_history)) \
-                    > self.motor_current_limit or self._was_current_limited:
+            if self._was_current_limited or self.current_limit_filter.is_over_limit(self.motor_current_limit):
                 self._was_current_limited = True
                 self._current_per_motor = min(self._current_per_motor, self.motor_current_limit)
         if self.motor_peak_current_limit is not None:
@@ -199,13 +263,21 @@ class CustomModel:
             net_accel_force = 0
         return net_accel_force / self.effective_mass
 
-    def _integrate_with_heun(self):  # numerical integration using Heun's Method
-        self._time = self.time_step
-        while self._time < self.simulation_time + self.time_step and \
-                (self._position < self.max_dist or not self.max_dist):
+    def _get_mode(self):  # discrete state whose changes are located as events by the adaptive integrator
+        return self._slipping, self._was_current_limited
+
+    def _integrate_with_heun(self):  # numerical integration using Heun's Method, yields after every step
+        stats = self.integration_stats
+        while self._time + self.time_step < self.simulation_time + self.time_step and \
+                (not self.max_dist or self._position < self.max_dist) and \
+                not self._can_switch_to_closed_form():
+            self._time += self.time_step
             self.update()
             v_temp = self._velocity + self._acceleration * self.time_step  # kickstart with Euler step
             a_temp = self._calc_max_accel(v_temp)
+            error = abs(a_temp - self._acceleration) / 2 * self.time_step  # Heun-Euler embedded error estimate
+            if error > stats['max_error']:
+                stats['max_error'] = error
             v_temp = self._velocity + (self._acceleration + a_temp) / 2 * \
                                       self.time_step  # recalc v_temp trapezoidally
             self._position += (self._velocity + v_temp) / 2 * self.time_step  # update x trapezoidally
@@ -214,49 +286,492 @@ class CustomModel:
 
             self._energy_per_motor = self._current_per_motor * self.time_step * 1000 / 60 / 60  # calc power usage in mAh
             self._cumulative_energy += self._energy_per_motor * self.num_motors
-            self._current_history.append(self._current_per_motor)
-            if len(self._current_history) > self._current_history_size:
-                self._current_history = self._current_history[-self._current_history_size:]
-
-            self._add_data_point()
-            self._time += self.time_step
-
-    def _get_data_point(self):
-        point = OrderedDict({
-            'time':          self._time,
-            'pos':           self._position,
-            'vel':           self._velocity,
-            'accel':         self._acceleration,
-            'voltage':       self._voltage_setpoint,
-            'current':       self._current_per_motor,
-            'total_current': self._current_per_motor * self.num_motors,
-            'sys_voltage':   self._voltage,
-            'energy':        self._energy_per_motor,
-            'total_energy':  self._cumulative_energy,
-            'slipping':      1 if self._slipping else 0,
-            'brownout':      1 if self._brownout else 0,
-            'gravity':       self._get_gravity_force()
-        })
-        if self.controller is not None:
-            point.update(self.controller.get_data_point())
-        return point
-
-    def _add_data_point(self):
-        self.data_points.append(self._get_data_point())
+            self._add_current_sample(self._current_per_motor, self.time_step)
+
+            stats['steps'] += 1
+            stats['evaluations'] += 2
+            yield
+
+    def _add_current_sample(self, current, time_step):
+        # Goes through the model so SimulationProfiler can time it without patching the filter, whose copies
+        # (snapshots, is_over_limit_after trials) would take the patched method with them
+        self.current_limit_filter.add_sample(current, time_step)
+
+    def _save_step_state(self):
+        return (self._position, self._velocity, self._acceleration, self._voltage, self._current_per_motor,
+                self._slipping, self._was_current_limited, self._brownout)
+
+    def _restore_step_state(self, state):
+        (self._position, self._velocity, self._acceleration, self._voltage, self._current_per_motor,
+         self._slipping, self._was_current_limited, self._brownout) = state
+
+    def _calc_consistent_accel(self, velocity):
+        # _calc_max_accel feeds the system voltage from its previous call back in as the available voltage.
+        # Fixed-step Heun tolerates that lag, but error control needs a smooth derivative, so solve
+        # V = g(V) with bracketed false position (g is decreasing, so [V, g(V)] brackets the root).
+        # When resistance_one + num_motors * resistance_com exceeds motors.k_r the lagged iteration diverges
+        # and Heun alternates between two voltages on successive calls, so the two integrators disagree until
+        # a current limit holds the current.
+        voltage_lo = voltage_hi = self._voltage
+        accel = self._calc_max_accel(velocity)
+        residual = self._voltage - voltage_lo
+        if abs(residual) < self.VOLTAGE_TOLERANCE:
+            return accel
+        if residual > 0:
+            voltage_hi, residual_lo, residual_hi = self._voltage, residual, None
+        else:
+            voltage_lo, residual_lo, residual_hi = self._voltage, None, residual
+        for _ in range(self.VOLTAGE_ITERATIONS):
+            self._voltage = voltage_hi if residual_hi is None else voltage_lo if residual_lo is None else \
+                voltage_lo - residual_lo * (voltage_hi - voltage_lo) / (residual_hi - residual_lo)
+            trial = self._voltage
+            accel = self._calc_max_accel(velocity)
+            residual = self._voltage - trial
+            if abs(residual) < self.VOLTAGE_TOLERANCE:
+                break
+            if residual > 0:
+                voltage_lo, residual_lo = trial, residual
+                if residual_hi is not None:
+                    residual_hi /= 2  # Illinois modification keeps the far end from stalling
+            else:
+                voltage_hi, residual_hi = trial, residual
+                if residual_lo is not None:
+                    residual_lo /= 2
+        return accel
+
+    def _eval_stage(self, position, velocity, mode, start, offset):  # offset: time since the step start, s
+        self._position = position
+        self._velocity = velocity
+        self._voltage = start[3]
+        accel = self._calc_consistent_accel(velocity)
+        if self.FILTERED_CURRENT_LIMIT and self.motor_current_limit is not None and not start[6] and \
+                velocity > 0 and self.current_limit_filter.is_over_limit_after(
+                        (start[4] + self._current_per_motor) / 2, offset, self.motor_current_limit):
+            self._was_current_limited = True  # the filter would cross the limit within the step
+        changed = self._get_mode() != mode
+        if changed and self._event_mode is None:
+            self._event_mode = self._slipping, self._was_current_limited
+        self._slipping, self._was_current_limited = start[5], start[6]  # modes only change between steps
+        return accel, changed
+
+    def _try_rk23_step(self, start, mode, h):  # one Bogacki-Shampine 2(3) step from start, mode held fixed
+        x0, v0, a0 = start[0], start[1], start[2]
+        self._restore_step_state(start)
+        self._event_mode = None
+        a2, event2 = self._eval_stage(x0 + h / 2 * v0, v0 + h / 2 * a0, mode, start, h / 2)
+        v2 = v0 + h / 2 * a0
+        a3, event3 = self._eval_stage(x0 + 3 * h / 4 * v2, v0 + 3 * h / 4 * a2, mode, start, 3 * h / 4)
+        v3 = v0 + 3 * h / 4 * a2
+        x1 = x0 + h * (2 / 9 * v0 + 1 / 3 * v2 + 4 / 9 * v3)
+        v1 = v0 + h * (2 / 9 * a0 + 1 / 3 * a2 + 4 / 9 * a3)
+        a4, event4 = self._eval_stage(x1, v1, mode, start, h)
+
+        error_x = h * (-5 / 72 * v0 + 1 / 12 * v2 + 1 / 9 * v3 - 1 / 8 * v1)
+        error_v = h * (-5 / 72 * a0 + 1 / 12 * a2 + 1 / 9 * a3 - 1 / 8 * a4)
+        error = max(abs(error_x) / (1 + abs(x1)), abs(error_v) / (1 + abs(v1))) / self.integrator_tolerance
+        event = event2 or event3 or event4 or (self.max_dist and x1 >= self.max_dist)
+        return x1, v1, a4, error, abs(error_v), event
+
+    def _integrate_with_rk23(self):  # adaptive integration landing exactly on discontinuities, yields after every step
+        if self.FILTERED_CURRENT_LIMIT and self.motor_current_limit is not None and \
+                not self.current_limit_filter.time_weighted:
+            raise ValueError("The rk23 integrator needs a time weighted current_limit_filter such as "
+                             "EmaCurrentFilter, {} depends on the step size".format(
+                                     self.current_limit_filter.__class__.__name__))
+        stats = self.integration_stats
+        max_step = self.time_step * self.ADAPTIVE_MAX_STEP_FACTOR
+        # Closed loop controllers are discrete, their integral and derivative terms count calls. They're sampled
+        # every time_step as under Heun and hold their output in between, so steps never cross a sample time.
+        sampled = not isinstance(self.controller, FixedVoltageController)
+        next_sample_time = np.inf
+        h = self._step_size
+        while self.simulation_time - self._time > self.EVENT_TOLERANCE and \
+                (not self.max_dist or self._position < self.max_dist) and \
+                not self._can_switch_to_closed_form():
+            if sampled:
+                sample = floor((self._time + self.EVENT_TOLERANCE) / self.time_step)
+                if self._time - sample * self.time_step <= self.EVENT_TOLERANCE:
+                    self.update()
+                next_sample_time = (sample + 1) * self.time_step
+            else:
+                self.update()
+            self._acceleration = self._calc_consistent_accel(self._velocity)  # mode changes are committed here
+            start = self._save_step_state()
+            mode = self._get_mode()
+            h = min(h, max_step, self.simulation_time - self._time, next_sample_time - self._time)
+            while True:
+                x, v, a, error, abs_error, event = self._try_rk23_step(start, mode, h)
+                stats['evaluations'] += 3
+                if error <= 1:
+                    break
+                stats['rejected'] += 1
+                h *= max(0.2, 0.9 * error ** (-1 / 3))
+
+            if event:  # bisect for the first point where the mode flips or max_dist is crossed
+                h_lo, h_hi = 0, h
+                while h_hi - h_lo > self.EVENT_TOLERANCE:
+                    h_mid = (h_lo + h_hi) / 2
+                    stats['evaluations'] += 3
+                    if self._try_rk23_step(start, mode, h_mid)[5]:
+                        h_hi = h_mid
+                    else:
+                        h_lo = h_mid
+                if h_hi > 2 * self.EVENT_TOLERANCE:  # events right at the step start are already committed
+                    h = h_hi
+                    x, v, a, error, abs_error, event = self._try_rk23_step(start, mode, h)
+                    if self._event_mode is not None:
+                        self._slipping, self._was_current_limited = self._event_mode
+                    stats['events'] += 1
+                else:
+                    self._try_rk23_step(start, mode, h)
+
+            self._position = x
+            self._velocity = v
+            self._acceleration = a
+            self._time += h
+
+            self._energy_per_motor = self._current_per_motor * h * 1000 / 60 / 60  # calc power usage in mAh
+            self._cumulative_energy += self._energy_per_motor * self.num_motors
+            self._add_current_sample((start[4] + self._current_per_motor) / 2, h)  # mean over the step
+
+            stats['steps'] += 1
+            stats['evaluations'] += 1
+            if abs_error > stats['max_error']:
+                stats['max_error'] = abs_error
+            h *= min(5.0, 0.9 * error ** (-1 / 3)) if error > 0 else 5.0
+            self._step_size = h
+            yield
+
+    def _can_switch_to_closed_form(self):
+        # The closed form tail is one block, and termination criteria are checked after every step, so they would
+        # only see its end. Runs with criteria keep integrating, a met criterion can still extrapolate in closed form.
+        return self.analytic and not self.termination and self._can_solve_analytically()
+
+    def _can_solve_analytically(self):
+        # True once the rest of the run is linear, a = A - B * v, and can't leave that regime: fixed voltage, not
+        # slipping, under any current limit and accelerating. Current falls as speed rises, so none of those can
+        # change back. Also stores the coefficients. The closed form follows the consistent system voltage, which
+        # Heun lags by one evaluation, so the two drift apart in proportion to time_step.
+        if not isinstance(self.controller, FixedVoltageController) or self._acceleration < 0 or self._velocity < 0:
+            return False
+        if self.check_for_slip and self._slipping:
+            return False
+        if self.motor_peak_current_limit is not None and self._current_per_motor >= self.motor_peak_current_limit:
+            return False
+        if self.motor_current_limit is not None:
+            if self._current_per_motor >= self.motor_current_limit:
+                return False
+            if not self._was_current_limited and \
+                    not self.current_limit_filter.is_settled(self._current_per_motor, self.motor_current_limit):
+                return False
+        # Sampling the closed form takes a few dozen voltage solves, so after a rejection it's only tried again
+        # once the mode changes, or after a number of steps that doubles with every rejection in the same mode
+        mode = self._get_mode()
+        retry = self._analytic_retry
+        if retry is not None and retry[0] == mode and self.integration_stats['steps'] < retry[1]:
+            return False
+        self._linear_coefficients = self._get_linear_coefficients()
+        if self._linear_coefficients is None:
+            interval = min(retry[2] * 2, self.ANALYTIC_RETRY_STEPS) if retry is not None and retry[0] == mode else 1
+            self._analytic_retry = mode, self.integration_stats['steps'] + interval, interval
+        return self._linear_coefficients is not None
+
+    def _get_linear_coefficients(self):
+        # Samples the consistent accel, current and system voltage at two speeds, which are all linear in speed
+        # while the applied voltage is either the setpoint or the sagged system voltage throughout. A run that
+        # sags below the setpoint and recovers past it before top speed gets a second segment from there on.
+        # Returns segments (v, a, B, i, di/dv, V, dV/dv, end velocity) at reference speed v, or None.
+        state = self._save_step_state()
+        velocity = self._velocity
+        setpoint = self._voltage_setpoint
+        dv = 1e-2 * (1 + abs(velocity))
+
+        def sample(v):
+            self._voltage = state[3]
+            return self._calc_consistent_accel(v), self._current_per_motor, self._voltage
+
+        def fit(v, dv):  # (coefficients through speeds v and v + dv, accel and voltage at v + dv)
+            (a0, i0, v0), (a1, i1, v1) = sample(v), sample(v + dv)
+            return (v, a0, (a0 - a1) / dv, i0, (i1 - i0) / dv, v0, (v1 - v0) / dv), a1, v1
+
+        def holds(segment, a1, v1):  # has a terminal velocity, isn't clamped at the bottom and keeps one voltage
+            b, v0 = segment[2], segment[5]
+            return b > 0 and not (a1 <= 0 and self._position <= 0) and (v0 < setpoint) == (v1 < setpoint)
+
+        segment, a1, v1 = fit(velocity, dv)
+        if (segment[5] < setpoint) != (v1 < setpoint) and velocity >= dv:
+            # Sampled past terminal velocity, where the current reverses, so sample below it instead
+            segment, a1, v1 = fit(velocity, -dv)
+        segments = None
+        # Heun's lagged system voltage may still be settling, e.g. right after slip ends
+        if abs(state[3] - segment[5]) <= self.ANALYTIC_VOLTAGE_TOLERANCE and holds(segment, a1, v1):
+            segments = (segment + (np.inf,),)
+            _, a0, b, _, _, v0, voltage_slope = segment
+            if v0 < setpoint and v0 + voltage_slope * a0 / b > setpoint:  # recovers before top speed
+                switch_velocity = velocity + (setpoint - v0) / voltage_slope
+                recovered, a1, v1 = fit(switch_velocity + 1e-6 * dv, dv)
+                segments = (segment + (switch_velocity,), recovered + (np.inf,)) \
+                    if holds(recovered, a1, v1) and recovered[5] >= setpoint else None
+        self._restore_step_state(state)
+        return segments
+
+    def _integrate_analytically(self):  # yields the rest of the run as one block of rows on the time_step grid
+        t0, x0 = self._time, self._position
+
+        max_steps = max(int((self.simulation_time - t0) / self.time_step), 0) + 2
+        times = np.cumsum(np.concatenate(([t0], np.full(max_steps, self.time_step))))  # same rounding as Heun
+        tau = times - t0
+        positions, velocities, accels, currents, voltages = (np.empty_like(tau) for _ in range(5))
+        start_tau, start_position, start_velocity = 0.0, x0, self._velocity
+        for reference, a_reference, b, i_reference, di, v_reference, dvoltage, end_velocity in \
+                self._linear_coefficients:
+            terminal_velocity = reference + a_reference / b
+            end_tau = start_tau + np.log((terminal_velocity - start_velocity) / (terminal_velocity - end_velocity)) \
+                / b if end_velocity < np.inf else np.inf
+            segment = (tau >= start_tau) & (tau < end_tau)
+            local = tau[segment] - start_tau
+            a_start = a_reference - b * (start_velocity - reference)
+            decay = np.expm1(-b * local)  # e^(-B tau) - 1
+            positions[segment] = start_position + terminal_velocity * local + a_start / b ** 2 * decay
+            velocities[segment] = terminal_velocity + (start_velocity - terminal_velocity) * (decay + 1)
+            accels[segment] = a_reference - b * (velocities[segment] - reference)
+            currents[segment] = i_reference + di * (velocities[segment] - reference)
+            voltages[segment] = v_reference + dvoltage * (velocities[segment] - reference)
+            if end_tau < np.inf:
+                local = end_tau - start_tau
+                start_position += terminal_velocity * local + a_start / b ** 2 * np.expm1(-b * local)
+                start_tau, start_velocity = end_tau, end_velocity
+
+        steps = self._count_block_steps(times, positions)
+        if steps == 0:
+            return
+        times, positions = times[:steps + 1], positions[:steps + 1]
+
+        energies = currents[1:steps + 1] * self.time_step * 1000 / 60 / 60
+        self._time = times[1:]
+        self._position = positions[1:]
+        self._velocity = velocities[1:steps + 1]
+        self._acceleration = accels[1:steps + 1]
+        self._current_per_motor = currents[1:steps + 1]
+        self._voltage = voltages[1:steps + 1]
+        self._energy_per_motor = energies
+        self._cumulative_energy = self._cumulative_energy + np.cumsum(energies * self.num_motors)
+        block = self._get_block(positions[:-1])
+
+        self.integration_stats['steps'] += steps
+        self.integration_stats['analytic_steps'] += steps
+        yield block
+
+    def _extrapolate_steady_state(self):
+        # Holds the velocity, current and voltage for the rest of the run, on the time_step grid
+        t0, x0 = self._time, self._position
+        max_steps = max(int((self.simulation_time - t0) / self.time_step), 0) + 2
+        times = np.cumsum(np.concatenate(([t0], np.full(max_steps, self.time_step))))
+        positions = x0 + self._velocity * (times - t0)
+        steps = self._count_block_steps(times, positions)
+        if steps == 0:
+            return
+
+        self._time = times[1:steps + 1]
+        self._position = positions[1:steps + 1]
+        self._acceleration = 0.0
+        self._cumulative_energy = self._cumulative_energy + \
+            np.arange(1, steps + 1) * self._energy_per_motor * self.num_motors
+        block = self._get_block(positions[:steps])
+
+        self.integration_stats['steps'] += steps
+        yield block
+
+    def _count_block_steps(self, times, positions):  # steps a Heun run from times[0] would take before stopping
+        running = times[:-1] + self.time_step < self.simulation_time + self.time_step
+        if self.max_dist:
+            running &= positions[:-1] < self.max_dist
+        return int(np.argmin(running)) if not running.all() else len(running)
+
+    def _get_block(self, previous_positions):
+        # Turns the array valued state set up by a closed form solver into rows, then leaves the scalar state as
+        # the last row. previous_positions are the positions the controller saw at the start of every step.
+        self._brownout = False
+        block = np.column_stack(np.broadcast_arrays(*self._get_data_values()))
+
+        channels = self.get_channels()
+        block[:, channels.index('brownout')] = block[:, channels.index('sys_voltage')] < self.BROWNOUT_VOLTAGE
+        error = self.controller.get_goal() - previous_positions
+        block[:, channels.index('error')] = error
+        block[:, channels.index('done')] = np.abs(error) < self.controller.get_deadband()
+
+        for key, attribute in (('time', '_time'), ('pos', '_position'), ('vel', '_velocity'),
+                               ('accel', '_acceleration'), ('current', '_current_per_motor'),
+                               ('sys_voltage', '_voltage'), ('energy', '_energy_per_motor'),
+                               ('total_energy', '_cumulative_energy')):
+            setattr(self, attribute, float(block[-1, channels.index(key)]))
+        self._brownout = bool(block[-1, channels.index('brownout')])
+        self._position = float(previous_positions[-1])
+        self.update()  # leave the controller as the last step did
+        self._position = float(block[-1, channels.index('pos')])
+        return block
+
+    def get_channels(self):
+        return self.CHANNELS + self.controller.DATA_KEYS
+
+    def _get_data_values(self):  # values in get_channels() order
+        return (self._time,
+                self._position,
+                self._velocity,
+                self._acceleration,
+                self._voltage_setpoint,
+                self._current_per_motor,
+                self._current_per_motor * self.num_motors,
+                self._voltage,
+                self._energy_per_motor,
+                self._cumulative_energy,
+                1 if self._slipping else 0,
+                1 if self._brownout else 0,
+                self._get_gravity_force()) + self.controller.get_data_values()
+
+    @property
+    def data_points(self):
+        return self.trace.rows()
 
     def get_data_points(self):
         return self.data_points
 
     def get_final(self, key):
-        return self.data_points[-1][key]
+        return self.trace.final(key)
 
-    def calc(self):
+    def query(self):  # interpolated lookups and cached statistics on the trace, see TraceQuery
+        return self.trace.query()
+
+    def _steps(self):  # advances the simulation, pausing at t=0 and after every integration step
         self.update()
         self._acceleration = self._calc_max_accel(self._velocity)  # compute accel at t=0
-        self._add_data_point()  # output values at t=0
+        yield
+        yield from self._integrate()
 
+    def _integrate(self):  # advances the simulation from the current state, pausing after every integration step
         # self._integrate_with_euler()
-        self._integrate_with_heun()  # numerically integrate and output using Heun's method
+        if self.integrator == 'rk23':
+            steps = self._integrate_with_rk23()  # adaptive step, events located exactly
+        else:
+            steps = self._integrate_with_heun()  # numerically integrate using Heun's method
+        for block in steps:
+            yield block
+            self.terminated_by = self._get_met_termination()
+            if self.terminated_by is not None:
+                steps.close()
+                if self.terminated_by.extrapolate:
+                    yield from self._extrapolate()
+                return
+        if self._linear_coefficients is not None:
+            yield from self._integrate_analytically()  # the integrator stopped where the closed form takes over
+
+    def _get_met_termination(self):
+        for criterion in self.termination or ():
+            if criterion.is_met(self):
+                return criterion
+        return None
+
+    def _extrapolate(self):
+        # Holds the mechanism where it is if the criterion means it's at rest. Otherwise uses the closed form tail
+        # where the run is linear, or holds the current velocity.
+        if self.terminated_by.at_rest:
+            self._velocity = 0.0
+            blocks = self._extrapolate_steady_state()
+        elif self._can_solve_analytically():
+            blocks = self._integrate_analytically()
+        else:
+            blocks = self._extrapolate_steady_state()
+        for block in blocks:
+            self.integration_stats['extrapolated'] += len(block)
+            yield block
+
+    def iter_steps(self):
+        # Resets the simulation, then lazily yields every state as a tuple in get_channels() order, starting at
+        # t=0. Nothing is recorded, and the simulation stops wherever the caller stops iterating.
+        self.init_sim_vars()
+        for block in self._steps():
+            if block is None:
+                yield self._get_data_values()
+            else:
+                yield from map(tuple, block.tolist())
+
+    def calc(self):
+        # Profiled runs, and recorders or termination criteria the cache can't capture, always integrate. A cache
+        # hit only restores the trace and the final state.
+        use_cache = self.cache is not None and self.profiler is None and self.recorder.cacheable and \
+            all(criterion.cacheable for criterion in self.termination or ())
+        if use_cache:
+            cache_key = self.cache.get_key(self)
+            if self.cache.load(self, cache_key):
+                return
+
+        steps = self._steps()
+        if self.profiler is not None:
+            steps = self.profiler.profile(self, steps)
+        next(steps)
+        self.recorder.start(self)  # output values at t=0
+        self._record_steps(steps)
+        self.recorder.finish(self)
+
+        if use_cache:
+            self.cache.store(self, cache_key)
+
+    def _record_steps(self, steps, until=None):  # False if stopped at until before the run ended
+        for block in steps:  # integrators yield None after a step, or a block of rows computed at once
+            if block is None:
+                self.recorder.record(self)
+            else:
+                self.recorder.record_block(self, block)
+            if until is not None and self._time >= until:
+                steps.close()
+                return False
+        return True
+
+    def start(self):  # computes and records the t=0 state, for runs driven step by step with advance()
+        steps = self._steps()
+        next(steps)
+        steps.close()
+        self.recorder.start(self)
+
+    def advance(self, until=None):
+        # Integrates and records from the current state, after start() or restore(), until the time reaches until
+        # or the run ends. Returns True once the run has ended.
+        steps = self._integrate()
+        if self.profiler is not None:
+            steps = self.profiler.profile(self, steps, initial=False)
+        if not self._record_steps(steps, until):
+            return False
+        self.recorder.finish(self)
+        return True
+
+    def snapshot(self):  # SimulationState of the model as it is now, between steps
+        terminated_by = self.termination.index(self.terminated_by) if self.terminated_by is not None else None
+        return SimulationState({key: getattr(self, key) for key in self.STATE_ATTRIBUTES}, self.integration_stats,
+                               {'controller':           self.controller,
+                                'current_limit_filter': self.current_limit_filter,
+                                'recorder':             self.recorder,
+                                'termination':          self.termination},
+                               terminated_by, len(self.trace))
+
+    def restore(self, state):
+        # Puts the model back to a snapshot() of this model, dropping trace rows recorded since. The controller,
+        # filter, recorder and termination criteria are replaced by copies of the saved ones, so change goals or
+        # gains on the restored model.controller before advance().
+        if len(self.trace) < state.trace_length:
+            raise ValueError("The trace no longer holds the {} rows recorded before the snapshot, it was reset since"
+                             .format(state.trace_length))
+        for key, value in state.attributes.items():
+            setattr(self, key, value)
+        self.integration_stats = dict(state.integration_stats)
+        self.controller = state.get_object('controller')
+        self.current_limit_filter = state.get_object('current_limit_filter')
+        self.recorder = state.get_object('recorder')
+        self.termination = state.get_object('termination')
+        self.terminated_by = self.termination[state._terminated_by] if state._terminated_by is not None else None
+        self.trace.truncate(state.trace_length)
+
+    def get_profile(self):  # phase timings and event counts of the last calc(), if profiling
+        return self.profiler.get_stats() if self.profiler is not None else None
 
     def get_type(self):
         return self.__class__.__name__[:-5]
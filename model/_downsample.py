@@ -0,0 +1,29 @@
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: indices of threshold points that keep the visual shape of y(x).
+    # The first and last points are always kept, every bucket in between contributes the point making the
+    # largest triangle with the previously kept point and the average of the next bucket.
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)  # threshold - 2 buckets between the end points
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y)))
+    next_edges = np.append(edges[2:], n)  # the average of bucket i + 1, or the last point for the final bucket
+    next_starts = np.append(edges[1:-1], n - 1)
+    counts = next_edges - next_starts
+    x_avg = (x_sums[next_edges] - x_sums[next_starts]) / counts
+    y_avg = (y_sums[next_edges] - y_sums[next_starts]) / counts
+
+    indices = np.empty(threshold, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        area = np.abs((x[a] - x_avg[i]) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (y_avg[i] - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
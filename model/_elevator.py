@@ -26,7 +26,15 @@ class ElevatorModel(CustomModel):
                  initial_acceleration=0,
                  controller=None,
                  auto_calc=True,
-                 name=None):
+                 name=None,
+                 current_limit_filter=None,
+                 integrator='heun',
+                 integrator_tolerance=1e-6,
+                 cache=None,
+                 recorder=None,
+                 profiler=None,
+                 analytic=False,
+                 termination=None):
         super().__init__(motors=motors,
                          k_resistance_s=k_resistance_s,
                          k_resistance_v=k_resistance_v,
@@ -52,4 +60,12 @@ class ElevatorModel(CustomModel):
                          initial_acceleration=initial_acceleration,
                          controller=controller,
                          auto_calc=auto_calc,
-                         name=name)
+                         name=name,
+                         current_limit_filter=current_limit_filter,
+                         integrator=integrator,
+                         integrator_tolerance=integrator_tolerance,
+                         cache=cache,
+                         recorder=recorder,
+                         profiler=profiler,
+                         analytic=analytic,
+                         termination=termination)
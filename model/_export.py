@@ -0,0 +1,104 @@
+import json
+import os
+
+import numpy as np
+
+from model._trace import Trace
+
+CHUNK_SIZE = 8192  # rows formatted and written at a time
+
+
+def _get_metadata(model, index):
+    return {
+        'model':  index,
+        'type':   model.__class__.__name__,
+        'name':   model.get_info(),
+        'params': model.to_json()
+    }
+
+
+def _get_channels(models):  # union of every model's channels, in first seen order
+    channels = []
+    for model in models:
+        channels += [key for key in model.trace.channels if key not in channels]
+    return channels
+
+
+def export_csv(models, filename, chunk_size=CHUNK_SIZE, precision=5):
+    # One row per state, the first column is the model's index in models and channels a model doesn't
+    # have are left empty. Flags (slipping, brownout, done) are written as 0/1 like the original data points.
+    # Every model's parameters are written first as '#' comment lines.
+    channels = _get_channels(models)
+    with open(filename, 'w') as file:
+        for i, model in enumerate(models):
+            file.write('# ' + json.dumps(_get_metadata(model, i), default=repr) + '\n')
+        file.write(','.join(['model'] + channels) + '\n')
+        for i, model in enumerate(models):
+            trace = model.trace
+            row_format = ','.join(['{}'.format(i)] + [('%d' if key in Trace.DISCRETE_CHANNELS else
+                                                        '%.{}f'.format(precision)) if key in trace else ''
+                                                       for key in channels])
+            columns = [trace[key] for key in channels if key in trace]
+            for start in range(0, len(trace), chunk_size):
+                stop = min(start + chunk_size, len(trace))
+                np.savetxt(file, np.column_stack([column[start:stop] for column in columns]), fmt=row_format)
+
+
+def export_npz(models, filename, compressed=True):
+    # Arrays are stored as 'model<i>/<channel>', with each model's parameters in 'model<i>/__metadata__'
+    # and the list of models in '__metadata__', all as JSON strings.
+    arrays = {}
+    metadata = []
+    for i, model in enumerate(models):
+        prefix = 'model{}/'.format(i)
+        metadata.append(_get_metadata(model, i))
+        arrays[prefix + '__metadata__'] = np.array(json.dumps(metadata[-1], default=repr))
+        arrays.update((prefix + key, column) for key, column in model.trace.columns().items())
+    arrays['__metadata__'] = np.array(json.dumps(metadata, default=repr))
+    (np.savez_compressed if compressed else np.savez)(filename, **arrays)
+
+
+def export_arrow(models, filename, chunk_size=CHUNK_SIZE):
+    # Same long layout as export_csv with missing channels as nulls, written as Parquet, or as an Arrow IPC
+    # file for .arrow and .feather names. Parameters go into the schema metadata. Needs pyarrow.
+    import pyarrow as pa
+
+    channels = _get_channels(models)
+    schema = pa.schema([('model', pa.int32())] + [(key, pa.float64()) for key in channels],
+                       metadata={'models': json.dumps([_get_metadata(model, i) for i, model in enumerate(models)],
+                                                      default=repr)})
+    if os.path.splitext(filename)[1].lower() in ('.arrow', '.feather'):
+        writer = pa.ipc.new_file(filename, schema)
+    else:
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(filename, schema)
+    with writer:
+        for i, model in enumerate(models):
+            trace = model.trace
+            for start in range(0, len(trace), chunk_size):
+                stop = min(start + chunk_size, len(trace))
+                columns = [pa.array(np.full(stop - start, i, dtype=np.int32))]
+                columns += [pa.array(trace[key][start:stop]) if key in trace else pa.nulls(stop - start, pa.float64())
+                            for key in channels]
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+
+
+_EXPORTERS = {
+    '.csv':     export_csv,
+    '.npz':     export_npz,
+    '.parquet': export_arrow,
+    '.arrow':   export_arrow,
+    '.feather': export_arrow,
+}
+
+
+def export_models(models, filename, **kwargs):  # picks the format from the file extension
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in _EXPORTERS:
+        raise ValueError("Unknown export format '{}', expected one of {}".format(
+            extension, ", ".join(sorted(_EXPORTERS))))
+    _EXPORTERS[extension](models, filename, **kwargs)
+
+
+def dump_model_csv(model, filename):
+    export_csv([model], filename)
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from functools import wraps
+from time import perf_counter
+
+
+class SimulationProfiler:
+    # Times and counts the phases of a run. The phase methods are only wrapped on the model instance while
+    # calc() runs, so models without a profiler run exactly the same code as before.
+    PHASES = OrderedDict([  # phase: method on the model
+        ('update',          'update'),
+        ('calc_max_accel',  '_calc_max_accel'),
+        ('data_values',     '_get_data_values'),
+        ('current_history', '_add_current_sample'),
+    ])
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = OrderedDict((phase, 0) for phase in self.PHASES)
+        self.times = OrderedDict((phase, 0.0) for phase in self.PHASES)
+        self.steps = 0
+        self.total_time = 0.0
+        self.slip_transitions = 0
+        self.current_limit_activations = 0
+        self.brownout_steps = 0
+
+    def _wrap(self, phase, method):
+        calls, times = self.calls, self.times
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                times[phase] += perf_counter() - start
+                calls[phase] += 1
+        return timed
+
+    def profile(self, model, steps, initial=True):
+        # Passes steps through, counting events between steps, with the phase methods wrapped until it's exhausted.
+        # initial: steps starts with the t=0 state, as from calc(), rather than resuming a run
+        self.reset()
+        for phase, attribute in self.PHASES.items():
+            setattr(model, attribute, self._wrap(phase, getattr(model, attribute)))
+        start = perf_counter()
+        try:
+            slipping, current_limited = model._slipping, model._was_current_limited
+            self.steps = -1 if initial else 0  # the first pass is the t=0 state, not a step
+            for block in steps:
+                if block is not None:  # closed form rows, see CustomModel._integrate_analytically
+                    self.steps += len(block)
+                    self.brownout_steps += int(block[:, model.get_channels().index('brownout')].sum())
+                    yield block
+                    continue
+                self.steps += 1
+                if model._slipping != slipping:
+                    self.slip_transitions += 1
+                    slipping = model._slipping
+                if model._was_current_limited and not current_limited:
+                    self.current_limit_activations += 1
+                current_limited = model._was_current_limited
+                if model._brownout:
+                    self.brownout_steps += 1
+                yield block
+        finally:
+            self.total_time += perf_counter() - start
+            for attribute in self.PHASES.values():
+                del model.__dict__[attribute]  # back to the class method
+
+    def get_stats(self):
+        return {
+            'steps':      self.steps,
+            'total_time': self.total_time,
+            'phases':     {phase: {'calls': self.calls[phase], 'time': self.times[phase]} for phase in self.PHASES},
+            'events':     {
+                'slip_transitions':          self.slip_transitions,
+                'current_limit_activations': self.current_limit_activations,
+                'brownout_steps':            self.brownout_steps
+            }
+        }
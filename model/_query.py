@@ -0,0 +1,122 @@
+import numpy as np
+
+
+class TraceQuery:
+    # Interpolated lookups and summary statistics on a finished trace. Whatever a lookup needs from a channel
+    # (running extrema, cumulative integral, crossings) is built on first use and kept, and Trace.query() hands
+    # out the same instance until the trace changes, so repeated lookups are binary searches.
+    DIRECTIONS = ('rising', 'falling', 'both')
+
+    def __init__(self, trace, time_key='time'):
+        self.trace = trace
+        self.time_key = time_key
+        self._times = trace[time_key]
+        self._cache = {}
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def _interpolate_index(self, column, values, index):
+        # Time where column passes values, between samples index - 1 and index
+        after = np.clip(index, 1, len(column) - 1)
+        before = after - 1
+        span = column[after] - column[before]
+        fraction = np.divide(values - column[before], span, out=np.ones_like(span), where=span != 0)
+        times = self._times[before] + np.clip(fraction, 0, 1) * (self._times[after] - self._times[before])
+        times = np.where(index == 0, self._times[0], times)
+        return np.where(index < len(column), times, np.nan)
+
+    def time_at(self, **kwargs):
+        # First time a channel reaches a value, e.g. time_at(pos=5). Values above the first sample are reached
+        # rising, values below it falling. NaN if never reached. Accepts arrays of values.
+        if len(kwargs) != 1:
+            raise TypeError("time_at() takes exactly one channel=value argument")
+        (key, values), = kwargs.items()
+        column = self.trace[key]
+        values = np.asarray(values, dtype=float)
+        highest = self._cached(('highest', key), lambda: np.maximum.accumulate(column))
+        lowest = self._cached(('lowest', key), lambda: -np.minimum.accumulate(column))  # ascending
+        rising = values >= column[0]
+        index = np.where(rising, np.searchsorted(highest, values, side='left'),
+                         np.searchsorted(lowest, -values, side='left'))
+        times = self._interpolate_index(column, values, index)
+        return float(times) if times.ndim == 0 else times
+
+    def value_at(self, t, key=None):
+        # Channels linearly interpolated at time t, all of them as a dict or just key. NaN outside the trace.
+        t = np.asarray(t, dtype=float)
+        index = np.searchsorted(self._times, t, side='right')
+        after = np.clip(index, 1, len(self._times) - 1)
+        before = after - 1
+        span = self._times[after] - self._times[before]
+        fraction = np.divide(t - self._times[before], span, out=np.zeros_like(span), where=span > 0)
+        outside = (t < self._times[0]) | (t > self._times[-1])
+
+        def interpolate(column):
+            values = column[before] + np.clip(fraction, 0, 1) * (column[after] - column[before])
+            values = np.where(outside, np.nan, values)
+            return float(values) if values.ndim == 0 else values
+
+        if key is not None:
+            return interpolate(self.trace[key])
+        return {k: interpolate(column) for k, column in self.trace.columns().items()}
+
+    def peak(self, key):
+        return self._cached(('peak', key), lambda: float(self.trace[key].max()))
+
+    def trough(self, key):
+        return self._cached(('trough', key), lambda: float(self.trace[key].min()))
+
+    def argmax(self, key):  # index of the first peak sample
+        return self._cached(('argmax', key), lambda: int(np.argmax(self.trace[key])))
+
+    def time_of_peak(self, key):
+        return float(self._times[self.argmax(key)])
+
+    def crossings(self, key, threshold, direction='both'):
+        # Interpolated times the channel crosses threshold, e.g. crossings('brownout', 0.5, 'rising')
+        if direction not in self.DIRECTIONS:
+            raise ValueError("Unknown direction '{}', expected one of {}".format(direction, self.DIRECTIONS))
+
+        def compute():
+            column = self.trace[key]
+            above = column >= threshold
+            index = np.flatnonzero(above[1:] != above[:-1]) + 1
+            if direction != 'both':
+                index = index[above[index] == (direction == 'rising')]
+            return self._interpolate_index(column, threshold, index)
+        return self._cached(('crossings', key, threshold, direction), compute)
+
+    def first_crossing(self, key, threshold, direction='rising'):
+        times = self.crossings(key, threshold, direction)
+        return float(times[0]) if len(times) else np.nan
+
+    def _cumulative_integral(self, key):
+        def compute():
+            column = self.trace[key]
+            areas = (column[1:] + column[:-1]) / 2 * np.diff(self._times)
+            return np.concatenate(([0.0], np.cumsum(areas)))
+        return self._cached(('integral', key), compute)
+
+    def integral(self, key, t=None):  # trapezoidal integral over time, up to t or over the whole trace
+        cumulative = self._cumulative_integral(key)
+        if t is None:
+            return float(cumulative[-1])
+        values = np.interp(t, self._times, cumulative)
+        return float(values) if np.ndim(values) == 0 else values
+
+    def mean(self, key):  # time weighted
+        duration = self._times[-1] - self._times[0]
+        return float(self.integral(key) / duration) if duration > 0 else float(self.trace[key][0])
+
+    def summary(self, key):
+        return {
+            'peak':         self.peak(key),
+            'time_of_peak': self.time_of_peak(key),
+            'trough':       self.trough(key),
+            'mean':         self.mean(key),
+            'integral':     self.integral(key),
+            'final':        float(self.trace[key][-1])
+        }
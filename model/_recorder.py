@@ -0,0 +1,129 @@
+import numpy as np
+
+from model._trace import Trace
+
+
+class TraceRecorder:
+    # Records every integration step
+    cacheable = True  # only writes to the trace, so a cached trace can stand in for a run. Subclasses with other
+    # side effects set it to False
+    def start(self, model):  # called with the initial state
+        model.trace.append(model._get_data_values())
+
+    def record(self, model):  # called after every integration step
+        model.trace.append(model._get_data_values())
+
+    def record_block(self, model, block):  # called with many steps' rows at once, the model is at the last one
+        model.trace.extend(block)
+
+    def finish(self, model):  # called once integration has stopped
+        pass
+
+
+class DecimatingRecorder(TraceRecorder):
+    # Records the initial state, every n-th step and the final state
+    def __init__(self, every=10):
+        self.every = every
+        self._step = 0
+        self._pending = False
+
+    def start(self, model):
+        self._step = 0
+        self._pending = False
+        super().start(model)
+
+    def record(self, model):
+        self._step += 1
+        self._pending = self._step % self.every != 0
+        if not self._pending:
+            model.trace.append(model._get_data_values())
+
+    def record_block(self, model, block):
+        model.trace.extend(block[(-self._step - 1) % self.every::self.every])  # rows landing on every n-th step
+        self._step += len(block)
+        self._pending = self._step % self.every != 0
+
+    def finish(self, model):
+        if self._pending:
+            model.trace.append(model._get_data_values())
+
+
+class FinalStateRecorder(TraceRecorder):
+    # Records only the state integration stopped at, for sweeps that only need end results
+    def start(self, model):
+        pass
+
+    def record(self, model):
+        pass
+
+    def record_block(self, model, block):
+        pass
+
+    def finish(self, model):
+        model.trace.append(model._get_data_values())
+
+
+class FixedIntervalRecorder(TraceRecorder):
+    # Records at a fixed output interval independent of the integration step, interpolating between steps.
+    # Position and velocity use cubic Hermite interpolation from the integrator state, discrete channels
+    # hold the value of the step that ends after the output time and everything else is linear.
+    DISCRETE_CHANNELS = Trace.DISCRETE_CHANNELS
+    TIME_TOLERANCE = 1e-9  # s, steps this close to an output time are taken as landing on it
+
+    def __init__(self, interval=0.01):  # s
+        self.interval = interval
+        self._previous = None
+        self._next_time = 0
+
+    def start(self, model):
+        channels = model.trace.channels
+        self._index = {key: channels.index(key) for key in ('time', 'pos', 'vel', 'accel')}
+        self._discrete = [channels.index(key) for key in self.DISCRETE_CHANNELS if key in channels]
+        # Fixed steps only need the state just before an output time, adaptive steps could be any length
+        self._lookahead = model.time_step if model.integrator == 'heun' else float('inf')
+        self._previous = np.array(model._get_data_values(), dtype=float)
+        model.trace.append(self._previous)
+        # Output times are start_time + n * interval rather than a running sum, which would drift
+        self._start_time = self._previous[self._index['time']]
+        self._samples = 1
+        self._next_time = self._start_time + self.interval
+        self._pending = False
+
+    def record(self, model):
+        self._record_values(model, model._time, model._get_data_values)
+
+    def record_block(self, model, block):
+        i_time = self._index['time']
+        for row in block:
+            self._record_values(model, row[i_time], lambda: row)
+
+    def _record_values(self, model, time, get_values):
+        if time >= self._next_time - self.TIME_TOLERANCE:
+            current = np.array(get_values(), dtype=float)
+            while self._next_time <= time + self.TIME_TOLERANCE:
+                model.trace.append(self._interpolate(self._previous, current, self._next_time))
+                self._samples += 1
+                self._next_time = self._start_time + self._samples * self.interval
+            self._previous = current
+            self._pending = time > self._next_time - self.interval + self.TIME_TOLERANCE
+        else:
+            if time + self._lookahead >= self._next_time:
+                self._previous = np.array(get_values(), dtype=float)
+            self._pending = True
+
+    def _interpolate(self, previous, current, time):
+        t0, t1 = previous[self._index['time']], current[self._index['time']]
+        h = t1 - t0
+        s = (time - t0) / h if h > 0 else 1.0
+        row = previous + s * (current - previous)
+        row[self._index['time']] = time
+        h00, h10, h01, h11 = 2 * s ** 3 - 3 * s ** 2 + 1, s ** 3 - 2 * s ** 2 + s, -2 * s ** 3 + 3 * s ** 2, s ** 3 - s ** 2
+        for key, derivative in (('pos', 'vel'), ('vel', 'accel')):
+            i, j = self._index[key], self._index[derivative]
+            row[i] = h00 * previous[i] + h10 * h * previous[j] + h01 * current[i] + h11 * h * current[j]
+        row[self._discrete] = current[self._discrete]
+        return row
+
+    def finish(self, model):
+        if self._pending:
+            model.trace.append(model._get_data_values())
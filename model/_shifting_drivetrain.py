@@ -3,6 +3,8 @@ from model.motors import Motor
 
 
 class ShiftingDrivetrainModel(CustomModel):
+    STATE_ATTRIBUTES = CustomModel.STATE_ATTRIBUTES + ('gear_ratio', 'motor_current_limit')  # set by update()
+
     def __init__(self,
                  motors: Motor,
                  low_gear_ratio: float,
@@ -31,7 +33,15 @@ class ShiftingDrivetrainModel(CustomModel):
                  initial_acceleration=0,
                  controller=None,
                  auto_calc=True,
-                 name=None):
+                 name=None,
+                 current_limit_filter=None,
+                 integrator='heun',
+                 integrator_tolerance=1e-6,
+                 cache=None,
+                 recorder=None,
+                 profiler=None,
+                 analytic=False,
+                 termination=None):
 
         self.high_gear_current_limit = high_gear_current_limit
         self.low_gear_current_limit = low_gear_current_limit
@@ -55,7 +65,7 @@ class ShiftingDrivetrainModel(CustomModel):
                          simulation_time=simulation_time,
                          max_dist=max_dist,
                          incline_angle=incline_angle,
-                         motor_current_limit=low_gear_ratio,
+                         motor_current_limit=low_gear_current_limit,
                          motor_peak_current_limit=motor_peak_current_limit,
                          motor_voltage_limit=motor_voltage_limit,
                          initial_position=initial_position,
@@ -63,7 +73,15 @@ class ShiftingDrivetrainModel(CustomModel):
                          initial_acceleration=initial_acceleration,
                          controller=controller,
                          auto_calc=auto_calc,
-                         name=name)
+                         name=name,
+                         current_limit_filter=current_limit_filter,
+                         integrator=integrator,
+                         integrator_tolerance=integrator_tolerance,
+                         cache=cache,
+                         recorder=recorder,
+                         profiler=profiler,
+                         analytic=analytic,
+                         termination=termination)
 
     def get_info(self):
         return ("{0}x{1}".format(self.motors.__class__.__name__, self.num_motors) if self.name is None else self.name) + \
@@ -76,6 +94,13 @@ class ShiftingDrivetrainModel(CustomModel):
                 if self.low_gear_current_limit or self.high_gear_current_limit else "") + \
                (" <{}V".format(self.motor_voltage_limit) if self.motor_voltage_limit else "")
 
+    def _can_solve_analytically(self):  # only once in high gear, which it won't shift out of while accelerating
+        return self.gear_ratio == self.high_gear_ratio and self._velocity > self.shift_velocity and \
+               super()._can_solve_analytically()
+
+    def _get_mode(self):
+        return super()._get_mode() + (self._velocity > self.shift_velocity,)
+
     def update(self):
         if self._velocity > self.shift_velocity:
             if self.gear_ratio is not self.high_gear_ratio:
@@ -3,6 +3,8 @@ from model.motors import Motor
 
 
 class ShooterSpinupModel(CustomModel):
+    FILTERED_CURRENT_LIMIT = False  # the current is clamped directly, current_limit_filter is unused
+
     def __init__(self,
                  motors: Motor,
                  gear_ratio: float,
@@ -25,7 +27,14 @@ class ShooterSpinupModel(CustomModel):
                  initial_acceleration=0,
                  controller=None,
                  auto_calc=True,
-                 name=None):
+                 name=None,
+                 integrator='heun',
+                 integrator_tolerance=1e-6,
+                 cache=None,
+                 recorder=None,
+                 profiler=None,
+                 analytic=False,
+                 termination=None):
 
         self.PLOT_FACTORS.update({
             'surface_vel':  1
@@ -63,7 +72,14 @@ class ShooterSpinupModel(CustomModel):
                          initial_acceleration=initial_acceleration,
                          controller=controller,
                          auto_calc=auto_calc,
-                         name=name)
+                         name=name,
+                         integrator=integrator,
+                         integrator_tolerance=integrator_tolerance,
+                         cache=cache,
+                         recorder=recorder,
+                         profiler=profiler,
+                         analytic=analytic,
+                         termination=termination)
 
     def _calc_max_accel(self, velocity):
         motor_speed = velocity * self.gear_ratio
@@ -94,9 +110,8 @@ class ShooterSpinupModel(CustomModel):
         return "{0}x{1} @ {2}:1 - {3}m".format(self.motors.__class__.__name__, self.num_motors, self.gear_ratio,
                                                 round(self.effective_diameter, 2))
 
-    def _get_data_point(self):
-        point = super()._get_data_point()
-        point.update({
-            'surface_vel':   self._voltage * self.effective_radius
-        })
-        return point
\ No newline at end of file
+    def get_channels(self):
+        return super().get_channels() + ('surface_vel',)
+
+    def _get_data_values(self):
+        return super()._get_data_values() + (self._voltage * self.effective_radius,)
\ No newline at end of file
@@ -0,0 +1,54 @@
+from copy import deepcopy
+from types import MappingProxyType
+
+
+class SimulationState:
+    # Immutable snapshot of a model between integration steps, see CustomModel.snapshot() and restore().
+    # Holds the model's state attributes, integration_stats, private copies of the controller, current limit
+    # filter, recorder and termination criteria, and how many trace rows had been recorded. Restoring hands out
+    # fresh copies, so one snapshot can be restored any number of times.
+    __slots__ = ('_attributes', '_integration_stats', '_objects', '_terminated_by', '_trace_length')
+
+    def __init__(self, attributes, integration_stats, objects, terminated_by, trace_length):
+        object.__setattr__(self, '_attributes', MappingProxyType(dict(attributes)))
+        object.__setattr__(self, '_integration_stats', MappingProxyType(dict(integration_stats)))
+        object.__setattr__(self, '_objects', MappingProxyType({k: deepcopy(v) for k, v in objects.items()}))
+        object.__setattr__(self, '_terminated_by', terminated_by)  # index into the termination criteria, or None
+        object.__setattr__(self, '_trace_length', trace_length)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("SimulationState is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("SimulationState is immutable")
+
+    @property
+    def attributes(self):  # model attribute: value
+        return self._attributes
+
+    @property
+    def integration_stats(self):
+        return self._integration_stats
+
+    @property
+    def trace_length(self):
+        return self._trace_length
+
+    @property
+    def time(self):
+        return self._attributes['_time']
+
+    @property
+    def position(self):
+        return self._attributes['_position']
+
+    @property
+    def velocity(self):
+        return self._attributes['_velocity']
+
+    @property
+    def acceleration(self):
+        return self._attributes['_acceleration']
+
+    def get_object(self, key):  # a fresh copy of the saved controller, current_limit_filter, recorder or termination
+        return deepcopy(self._objects[key])
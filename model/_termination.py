@@ -0,0 +1,77 @@
+class TerminationCriterion:
+    # Checked after every integration step, a met criterion ends the run early. With extrapolate set, the rest
+    # of the run up to simulation_time or max_dist is filled in without integrating, see
+    # CustomModel._extrapolate. at_rest means the mechanism is held still once the criterion is met.
+    at_rest = False
+    cacheable = True  # SimulationCache keys criteria by their scalar attributes, which must decide the result
+
+    def __init__(self, extrapolate=False):
+        self.extrapolate = extrapolate
+
+    def reset(self):
+        pass
+
+    def is_met(self, model):
+        return False
+
+
+class _HeldTermination(TerminationCriterion):
+    # Met once _holds(model) has been true for hold_time without a break
+    def __init__(self, hold_time=0.1, extrapolate=False):
+        super().__init__(extrapolate)
+        self.hold_time = hold_time
+        self._held_since = None
+
+    def reset(self):
+        self._held_since = None
+
+    def _holds(self, model):
+        return False
+
+    def is_met(self, model):
+        if not self._holds(model):
+            self._held_since = None
+            return False
+        if self._held_since is None:
+            self._held_since = model._time
+        return model._time - self._held_since >= self.hold_time
+
+
+class SteadyStateTermination(_HeldTermination):
+    # Acceleration below accel_tolerance, i.e. the velocity has saturated. With velocity_tolerance the
+    # mechanism also has to have come to rest.
+    def __init__(self, accel_tolerance=0.01, velocity_tolerance=None, hold_time=0.1, extrapolate=False):
+        super().__init__(hold_time, extrapolate)
+        self.accel_tolerance = accel_tolerance
+        self.velocity_tolerance = velocity_tolerance
+        self.at_rest = velocity_tolerance is not None
+
+    def _holds(self, model):
+        if abs(model._acceleration) >= self.accel_tolerance:
+            return False
+        return self.velocity_tolerance is None or abs(model._velocity) < self.velocity_tolerance
+
+
+class ControllerDoneTermination(_HeldTermination):
+    # The controller is within its deadband of the goal, which it may still be moving through. With
+    # velocity_tolerance the mechanism also has to have come to rest, and is then held at rest when extrapolating.
+    def __init__(self, hold_time=0.1, velocity_tolerance=None, extrapolate=False):
+        super().__init__(hold_time, extrapolate)
+        self.velocity_tolerance = velocity_tolerance
+        self.at_rest = velocity_tolerance is not None
+
+    def _holds(self, model):
+        if not model.controller.is_done():
+            return False
+        return self.velocity_tolerance is None or abs(model._velocity) < self.velocity_tolerance
+
+
+class PredicateTermination(TerminationCriterion):
+    cacheable = False  # the predicate can't be hashed, it may read anything
+
+    def __init__(self, predicate, extrapolate=False):  # predicate(model) -> True to stop
+        super().__init__(extrapolate)
+        self.predicate = predicate
+
+    def is_met(self, model):
+        return bool(self.predicate(model))
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from collections.abc import Sequence
+
+import numpy as np
+
+from model._query import TraceQuery
+
+
+class Trace:
+    INITIAL_CAPACITY = 1024  # rows preallocated at most, the trace doubles as it fills
+    DISCRETE_CHANNELS = ('slipping', 'brownout', 'done')  # 0/1 flags stored as floats
+
+    def __init__(self, channels, capacity=INITIAL_CAPACITY):
+        self.channels = tuple(channels)
+        self._channel_index = {key: i for i, key in enumerate(self.channels)}
+        # Column-major so every channel is one contiguous float64 array
+        self._data = np.empty((max(int(capacity), 1), len(self.channels)), order='F')
+        self._size = 0
+        self._query = None
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return key in self._channel_index
+
+    def __getitem__(self, key):
+        return self.column(key)
+
+    def keys(self):
+        return self.channels
+
+    def _reserve(self, size):
+        if size <= len(self._data):
+            return
+        capacity = len(self._data)
+        while capacity < size:
+            capacity *= 2
+        data = np.empty((capacity, len(self.channels)), order='F')
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+
+    def append(self, values):
+        if self._size == len(self._data):
+            self._reserve(self._size + 1)
+        self._data[self._size] = values
+        self._size += 1
+        self._query = None
+
+    def extend(self, block):
+        block = np.asarray(block, dtype=float).reshape(-1, len(self.channels))
+        self._reserve(self._size + len(block))
+        self._data[self._size:self._size + len(block)] = block
+        self._size += len(block)
+        self._query = None
+
+    def truncate(self, size):
+        self._size = min(self._size, size)
+        self._query = None
+
+    def clear(self):
+        self._size = 0
+        self._query = None
+
+    def column(self, key):
+        return self._data[:self._size, self._channel_index[key]]
+
+    def columns(self):
+        return OrderedDict((key, self.column(key)) for key in self.channels)
+
+    def row(self, index):
+        return OrderedDict(zip(self.channels, self._data[:self._size][index].tolist()))
+
+    def final(self, key):
+        return self._data[self._size - 1, self._channel_index[key]]
+
+    def rows(self):
+        return TraceRows(self)
+
+    def query(self):  # TraceQuery over the current contents, reused until the trace changes
+        if self._query is None:
+            self._query = TraceQuery(self)
+        return self._query
+
+
+class TraceRows(Sequence):
+    # Lazy list-of-dicts view kept for code written against the old data_points list
+
+    def __init__(self, trace):
+        self._trace = trace
+
+    def __len__(self):
+        return len(self._trace)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._trace.row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("trace row index out of range")
+        return self._trace.row(index)
@@ -1,5 +1,12 @@
+import csv
+import json
+import os
+from collections import OrderedDict
+from collections.abc import Mapping
 from math import pi
 
+import numpy as np
+
 
 class Motor(object):
     max_voltage = 12   # Volts
@@ -8,11 +15,19 @@ class Motor(object):
     stall_current = 1  # Amps
     free_current = 1   # Amps
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._calc_constants()
+
+    @classmethod
+    def _calc_constants(cls):  # derived constants are shared by every instance of a motor type
+        cls.free_speed = cls.free_rpm * 2 * pi / 60  # convert RPM to rad/sec
+        cls.k_r = cls.max_voltage / cls.stall_current
+        back_emf = cls.max_voltage - cls.k_r * cls.free_current  # at free speed, zero for Motor's placeholder specs
+        cls.k_v = cls.free_speed / back_emf if back_emf else float('inf')
+
     def __init__(self, num_motors=1):
         self.num_motors = num_motors
-        self.free_speed = self.free_rpm * 2 * pi / 60  # convert RPM to rad/sec
-        self.k_r = self.max_voltage / self.stall_current
-        self.k_v = self.free_speed / (self.max_voltage - self.k_r * self.free_current)
         self.k_t = self.num_motors * self.stall_torque / self.stall_current
 
     def to_json(self):
@@ -25,6 +40,9 @@ class Motor(object):
         }
 
 
+Motor._calc_constants()  # __init_subclass__ only covers subclasses
+
+
 class CIM(Motor):
     max_voltage = 12
     free_rpm = 5330
@@ -96,14 +114,89 @@ class BB_RS_550(Motor):
     stall_current = 84
     free_current = 0.4
 
-MOTOR_LOOKUP = {
-    'cim': CIM,
-    'minicim': MiniCIM,
-    'bag': BAG,
-    '775pro': _775pro,
-    'am9015': AM_9015,
-    'amneverrest': AM_NeveRest,
-    'amrs775125': AM_RS775_125,
-    'bbrs77518v': BB_RS_775_18V,
-    'bbrs550': BB_RS_550
-}
\ No newline at end of file
+
+class MotorRegistry(Mapping):
+    # Motor types by key, with their specs and derived constants kept as numpy arrays indexed by motor ID
+    # (registration order) so batches can gather constants without creating Motor objects.
+    FIELDS = ('max_voltage', 'free_rpm', 'stall_torque', 'stall_current', 'free_current')
+
+    def __init__(self):
+        self._classes = OrderedDict()
+        self._ids = {}
+        self._build_arrays()
+
+    def __getitem__(self, key):
+        return self._classes[key]
+
+    def __iter__(self):
+        return iter(self._classes)
+
+    def __len__(self):
+        return len(self._classes)
+
+    def register(self, key, motor_class=None, name=None, **spec):
+        # Registers a Motor subclass, or creates one called name (defaults to key) from the FIELDS in spec
+        if motor_class is None:
+            missing = [field for field in self.FIELDS if field not in spec]
+            if missing:
+                raise ValueError("Motor {} is missing {}".format(key, ", ".join(missing)))
+            motor_class = type(str(name or key), (Motor,), {field: float(spec[field]) for field in self.FIELDS})
+        if key not in self._ids:
+            self._ids[key] = len(self._classes)
+        self._classes[key] = motor_class
+        self._build_arrays()
+        return motor_class
+
+    def load(self, filename):
+        # Registers every motor in a .json ({key: {field: value}} or [{'key': ..., field: value}]) or .csv file
+        # with a key column, an optional name column and a column per field. Returns the registered keys.
+        if os.path.splitext(filename)[1].lower() == '.csv':
+            with open(filename, newline='') as file:
+                entries = list(csv.DictReader(file))
+        else:
+            with open(filename) as file:
+                entries = json.load(file)
+            if isinstance(entries, dict):
+                entries = [dict(spec, key=key) for key, spec in entries.items()]
+        keys = []
+        for entry in entries:
+            entry = dict(entry)
+            key = entry.pop('key')
+            self.register(key, **entry)
+            keys.append(key)
+        return keys
+
+    def _build_arrays(self):
+        classes = list(self._classes.values())
+        for field in self.FIELDS + ('free_speed', 'k_r', 'k_v'):
+            setattr(self, field, np.array([getattr(c, field) for c in classes], dtype=float))
+        self.names = [c.__name__ for c in classes]
+
+    def get_id(self, key):
+        return self._ids[key]
+
+    def get_ids(self, keys):  # motor IDs for a key, an ID or a list mixing both, IDs are passed through
+        if isinstance(keys, (str, int, np.integer)):
+            keys = [keys]
+        elif isinstance(keys, np.ndarray):
+            keys = keys.ravel().tolist()
+        return np.array([key if isinstance(key, (int, np.integer)) else self._ids[key] for key in keys], dtype=int)
+
+    def get_constants(self, ids, num_motors=1):
+        # k_r, k_v and k_t (for num_motors motors) gathered for every ID, computed like Motor does
+        ids = np.asarray(ids, dtype=int)
+        num_motors = np.asarray(num_motors, dtype=float)
+        return {
+            'k_r': self.k_r[ids],
+            'k_v': self.k_v[ids],
+            'k_t': num_motors * self.stall_torque[ids] / self.stall_current[ids]
+        }
+
+
+MOTOR_REGISTRY = MotorRegistry()
+for _key, _motor_class in (('cim', CIM), ('minicim', MiniCIM), ('bag', BAG), ('775pro', _775pro),
+                           ('am9015', AM_9015), ('amneverrest', AM_NeveRest), ('amrs775125', AM_RS775_125),
+                           ('bbrs77518v', BB_RS_775_18V), ('bbrs550', BB_RS_550)):
+    MOTOR_REGISTRY.register(_key, _motor_class)
+
+MOTOR_LOOKUP = MOTOR_REGISTRY  # key: Motor subclass, kept for code written against the old dict
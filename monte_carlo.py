@@ -0,0 +1,137 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from controllers.batch import batch_controllers
+from controllers.fixed_voltage import FixedVoltageController
+from model import BatchModel
+
+
+class MonteCarloAnalysis:
+    # Runs num_samples copies of a model at once as one BatchModel, with parameters drawn from distributions.
+    # Each distribution is keyed by a BatchModel parameter (effective_mass, battery_voltage, resistance_com,
+    # resistance_one, k_gearbox_efficiency, coeff_kinetic_friction, coeff_static_friction, ...) and is either
+    # ('<numpy Generator method>', *args), e.g. ('normal', 68, 2) or ('uniform', 12.0, 12.8), or a function
+    # f(rng, size) returning the samples. Sampling effective_mass scales the normal and gravity forces with it.
+    # Every lane runs for the full duration, ignoring max_dist, so all of them share one time grid.
+    def __init__(self, model, distributions,
+                 num_samples=1000,
+                 seed=None,  # RNG seed, the same seed draws the same samples
+                 duration=None,  # s, defaults to the model's simulation_time
+                 target_distances=None,  # m, defaults to the model's max_dist
+                 channels=('pos', 'vel', 'current'),
+                 percentiles=(5, 25, 50, 75, 95)):
+        unknown = set(distributions) - set(BatchModel.PARAMETERS)
+        if unknown:
+            raise ValueError("Unknown parameters: {}".format(", ".join(sorted(unknown))))
+        self.model = model
+        self.distributions = OrderedDict(distributions)
+        self.num_samples = num_samples
+        self.seed = seed
+        self.duration = duration if duration is not None else model.simulation_time
+        if target_distances is None:
+            target_distances = [model.max_dist] if model.max_dist else []
+        self.target_distances = np.atleast_1d(np.asarray(target_distances, dtype=float))
+        self.channels = tuple(channels)
+        self.percentiles = tuple(percentiles)
+
+        self.samples = OrderedDict()
+        self.times = None
+        self.bands = OrderedDict()  # channel: array (len(percentiles), steps)
+        self.time_to_distance = None  # array (num_samples, len(target_distances)), NaN if never reached
+
+    def _sample(self, rng):
+        samples = OrderedDict()
+        for key, distribution in self.distributions.items():
+            if callable(distribution):
+                values = distribution(rng, self.num_samples)
+            else:
+                values = getattr(rng, distribution[0])(*distribution[1:], size=self.num_samples)
+            samples[key] = np.asarray(values, dtype=float)
+        return samples
+
+    def run(self):
+        rng = np.random.default_rng(self.seed)
+        self.samples = self._sample(rng)
+        params = OrderedDict(self.samples)
+        if 'effective_mass' in params:
+            scale = params['effective_mass'] / self.model.effective_mass
+            params.setdefault('normal_force', self.model._get_normal_force() * scale)
+            params.setdefault('gravity_force', self.model._get_gravity_force() * scale)
+
+        controller = batch_controllers([self.model.controller] * self.num_samples)
+        if 'battery_voltage' in params and isinstance(self.model.controller, FixedVoltageController) and \
+                self.model.motor_voltage_limit is None and \
+                self.model.controller._voltage == self.model.battery_voltage:
+            controller.set_gains(params['battery_voltage'])  # the default controller applies the full battery
+
+        record = tuple(dict.fromkeys(('time', 'pos') + self.channels))
+        batch = BatchModel.from_models([self.model], record=record, auto_calc=False, controller=controller,
+                                       max_dist=np.nan, simulation_time=self.duration, **params)
+        batch.calc()
+
+        self.times = batch.get_data('time')[:, 0]
+        self.bands = OrderedDict((key, np.percentile(batch.get_data(key), self.percentiles, axis=1))
+                                 for key in self.channels)
+        self.time_to_distance = self._get_time_to_distance(batch.get_data('pos'))
+        return self
+
+    def _get_time_to_distance(self, positions):
+        # First crossing of each target per lane, interpolated between the samples either side of it
+        highest = np.maximum.accumulate(positions, axis=0)
+        lanes = np.arange(positions.shape[1])
+        result = np.full((positions.shape[1], len(self.target_distances)), np.nan)
+        for j, distance in enumerate(self.target_distances):
+            reached = highest[-1] >= distance
+            after = np.argmax(highest >= distance, axis=0)
+            before = np.maximum(after - 1, 0)
+            span = positions[after, lanes] - positions[before, lanes]
+            fraction = np.divide(distance - positions[before, lanes], span, out=np.zeros_like(span),
+                                 where=span > 0)
+            times = self.times[before] + np.clip(fraction, 0, 1) * (self.times[after] - self.times[before])
+            result[:, j] = np.where(reached, times, np.nan)
+        return result
+
+    def get_band(self, key, percentile):
+        return self.bands[key][self.percentiles.index(percentile)]
+
+    def get_time_to_distance_percentiles(self):  # array (len(percentiles), len(target_distances))
+        return np.nanpercentile(self.time_to_distance, self.percentiles, axis=0)
+
+    def summary(self):
+        result = OrderedDict()
+        percentiles = self.get_time_to_distance_percentiles()
+        for j, distance in enumerate(self.target_distances):
+            times = self.time_to_distance[:, j]
+            result[float(distance)] = OrderedDict([('mean', float(np.nanmean(times))),
+                                                   ('std', float(np.nanstd(times))),
+                                                   ('reached', float(np.mean(~np.isnan(times))))])
+            result[float(distance)].update(('p{:g}'.format(p), float(value)) for p, value in
+                                           zip(self.percentiles, percentiles[:, j]))
+        return result
+
+    def plot(self):
+        import matplotlib.pyplot as plt
+
+        rows = len(self.channels) + (1 if len(self.target_distances) else 0)
+        fig, axes = plt.subplots(rows, 1, figsize=(8, 3 * rows), squeeze=False)
+        axes = axes[:, 0]
+        outer = len(self.percentiles) // 2
+        for ax, key in zip(axes, self.channels):
+            band = self.bands[key] / self.model.PLOT_FACTORS[key]
+            for i in range(outer):  # nested bands, darker towards the middle
+                ax.fill_between(self.times, band[i], band[-i - 1], alpha=0.2 + 0.2 * i, color='C0', linewidth=0,
+                                label="p{:g}-p{:g}".format(self.percentiles[i], self.percentiles[-i - 1]))
+            if len(self.percentiles) % 2:
+                ax.plot(self.times, band[outer], color='C0', label="p{:g}".format(self.percentiles[outer]))
+            ax.set(xlabel='time (s)', ylabel=self.model.HEADERS.get(key, key))
+            ax.legend(loc='best')
+        if len(self.target_distances):
+            ax = axes[-1]
+            for j, distance in enumerate(self.target_distances):
+                times = self.time_to_distance[:, j]
+                ax.hist(times[~np.isnan(times)], bins=50, alpha=0.6, label="{:g} m".format(distance))
+            ax.set(xlabel='time to distance (s)', ylabel='samples')
+            ax.legend(loc='best')
+        fig.tight_layout()
+        plt.show()
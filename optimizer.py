@@ -1,3 +1,26 @@
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+
+import numpy as np
+
+from search import brent_minimize
+from workbook import open_workbook, write_grid, write_metadata
+
+_worker_optimizer = None
+
+
+def _init_worker(optimizer):
+    # Each worker process simulates on its own unpickled copy of the optimizer's template model. It isn't rebuilt
+    # from to_json(), which leaves out the controller, current limit filter and integrator settings and uses
+    # CustomModel's parameter names rather than the subclass constructor's (effective_diameter, not wheel_diameter).
+    global _worker_optimizer
+    _worker_optimizer = optimizer
+
+
+def _simulate_worker_ratio(ratio):
+    return _worker_optimizer._simulate_ratio(_worker_optimizer.model, ratio)
+
+
 class Optimizer:
     def __init__(self, model,
                  min_ratio=2, max_ratio=20, ratio_step=0.5,
@@ -6,6 +29,9 @@ class Optimizer:
         self.model = model
         model.max_dist = max_dist
 
+        self.min_ratio = min_ratio
+        self.max_ratio = max_ratio
+
         self.min_distance = min_distance
         self.max_dist = max_dist
         self.distance_step = distance_step
@@ -25,32 +51,102 @@ class Optimizer:
         self.times = [min_time]
         while self.times[-1] <= max_time:
             self.times.append(time_step * len(self.times))
+        self.times = np.array(self.times)  # grid distance_at_time is resampled onto
 
         self.time_to_dist_data = []
         self.distance_at_time = []
-
-    def run(self):
-        for ratio in self.ratios:
-            distance_step_deltas = [self.max_dist for _ in self.distance_steps]
-            self.model.gear_ratio = ratio
-            self.model.init_sim_vars()
-            self.model.calc()
-
-            time_to_dist_row = [int(0)] * len(self.distance_steps)
-            for point in self.model.data_points:
-                dist_steps = point['pos'] / self.distance_step
-                closest_index = round(dist_steps)
-                dist_step_diff = abs(dist_steps - closest_index)
-                if closest_index in self.distance_steps and dist_step_diff < distance_step_deltas[closest_index]:
-                    distance_step_deltas[closest_index] = dist_step_diff
-                    time_to_dist_row[self.distance_steps.index(closest_index)] = point['time']
-            self.time_to_dist_data.append(time_to_dist_row)
-
-            self.distance_at_time += [[e['pos'] for e in self.model.data_points]]
+        self.num_simulations = 0
+
+    def run(self, workers=1, chunksize=None):
+        if workers == 1:
+            for ratio in self.ratios:
+                self._add_result(*self._simulate_ratio(self.model, ratio))
+            return
+
+        workers = workers or cpu_count()
+        if chunksize is None:
+            chunksize = max(1, len(self.ratios) // (workers * 4))
+        self.model.init_sim_vars()  # ship an empty trace with the template model
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+            for result in executor.map(_simulate_worker_ratio, self.ratios, chunksize=chunksize):
+                self._add_result(*result)
+
+    def search(self, target_distance=None, target_time=None, tolerance=0.01, max_simulations=50):
+        # Finds the ratio in [min_ratio, max_ratio] that reaches target_distance soonest, or that covers the most
+        # distance by target_time, with Brent's method instead of the full ratio grid. The objective has to be
+        # unimodal over the ratio range, which holds for the usual too-slow / too-weak trade-off.
+        # Every simulated ratio replaces the grid in ratios, time_to_dist_data and distance_at_time so plot() and
+        # save_xlsx() show the evaluated points. Returns (best ratio, time to distance or distance at time).
+        if (target_distance is None) == (target_time is None):
+            raise ValueError("Exactly one of target_distance and target_time must be given")
+        if target_time is not None and target_time > self.model.simulation_time:
+            raise ValueError("target_time {} is past the model's simulation_time {}".format(
+                target_time, self.model.simulation_time))
+
+        results = {}
+
+        def objective(ratio):
+            times, positions = self._run_ratio(self.model, ratio)
+            results[ratio] = self._summarize(times, positions)
+            if target_time is not None:
+                return -np.interp(target_time, times, positions)
+            time_to_dist = self._time_to_distances(times, positions, [target_distance])[0]
+            if positions.max() >= target_distance:
+                return time_to_dist
+            # Never got there: rank by shortfall past the end of the run, so Brent still has a slope to follow
+            return times[-1] * (2 - positions.max() / target_distance)
+
+        max_dist = self.model.max_dist
+        if target_time is not None:
+            self.model.max_dist = None  # a distance cutoff would tie every ratio that gets there in time
+        try:
+            ratio, value, self.num_simulations = brent_minimize(objective, self.min_ratio, self.max_ratio,
+                                                                tolerance, max_simulations)
+        finally:
+            self.model.max_dist = max_dist
+
+        self.ratios = sorted(results)
+        self.time_to_dist_data = []
+        self.distance_at_time = []
+        for r in self.ratios:
+            self._add_result(*results[r])
+        return ratio, -value if target_time is not None else value
+
+    def _add_result(self, time_to_dist_row, positions):
+        self.time_to_dist_data.append(time_to_dist_row)
+        self.distance_at_time.append(positions)
+
+    def _simulate_ratio(self, model, ratio):
+        return self._summarize(*self._run_ratio(model, ratio))
+
+    def _run_ratio(self, model, ratio):
+        model.gear_ratio = ratio
+        model.init_sim_vars()
+        model.calc()
+        return model.trace['time'], model.trace['pos']
+
+    def _summarize(self, times, positions):
+        return self._time_to_distances(times, positions).tolist(), np.interp(self.times, times, positions)
+
+    def _time_to_distances(self, times, positions, distances=None):
+        # First crossing of each distance step, linearly interpolated between the samples either side of it.
+        # Searching the running maximum keeps the lookup monotonic even if the mechanism rolls back.
+        if distances is None:
+            distances = np.array(self.distance_steps) * self.distance_step
+        distances = np.asarray(distances, dtype=float)
+        index = np.searchsorted(np.maximum.accumulate(positions), distances, side='left')
+        reached = index < len(positions)
+        after = np.clip(index, 1, len(positions) - 1)
+        before = after - 1
+        span = positions[after] - positions[before]
+        fraction = np.divide(distances - positions[before], span, out=np.ones_like(span), where=span > 0)
+        time_to_dist = times[before] + np.clip(fraction, 0, 1) * (times[after] - times[before])
+        time_to_dist[index == 0] = times[0]
+        time_to_dist[~reached] = 0  # distances never reached keep the old 0 placeholder
+        return time_to_dist
 
     def plot(self):
         import matplotlib.pyplot as plt
-        import numpy as np
 
         fig = plt.figure()
         ax = fig.gca(projection='3d')
@@ -71,50 +167,17 @@ class Optimizer:
         plt.show()
 
     def save_xlsx(self, filename):
-        import xlsxwriter
-
-        workbook = xlsxwriter.Workbook(filename)
-        worksheet = workbook.add_worksheet()
-        worksheet.freeze_panes(2, 2)
-        worksheet.set_row(0, 50)
-        worksheet.set_column(0, 0, 10)
-        worksheet.set_column(1, len(self.distance_steps) + 1, 5)
-        top_header_format = workbook.add_format({
-            'align':     'center',
-            'valign':    'vcenter',
-            'font_size': 28
-        })
-        side_header_format = workbook.add_format({
-            'align':     'center',
-            'valign':    'vcenter',
-            'font_size': 28,
-            'rotation':  90
-        })
-        worksheet.merge_range(0, 0, 1, 1, self.model.HEADERS['time'], top_header_format)
-        worksheet.merge_range(0, 2, 0, len(self.distance_steps) + 1, self.model.HEADERS['pos'], top_header_format)
-        worksheet.merge_range(2, 0, len(self.ratios) + 1, 0, "Ratio (n:1)", side_header_format)
-
-        for col in range(len(self.distance_steps)):
-            worksheet.write(1, col + 2, self.distance_steps[col] * self.distance_step)
-
-        for row in range(len(self.ratios)):
-            worksheet.write(row + 2, 1, self.ratios[row])
-
-        test_data = dict()
-        test_data.update(self.model.to_json())
-        test_data.update(self.model.motors.to_json())
-        for i in range(len(self.model.to_json())):
-            key = list(test_data.keys())[i]
-            worksheet.write(0, len(self.distance_steps) + 2 + i, "{0}= {1}".format(key, test_data[key]))
-
-        for col in range(len(self.distance_steps)):
-            worksheet.conditional_format(2, col + 2, len(self.ratios) + 1, col + 2, {
-                'type':      '3_color_scale',
-                'min_color': '#00ee00',
-                'mid_color': '#ffffff',
-                'max_color': '#ee0000'
-            })
-            for row in range(len(self.ratios)):
-                worksheet.write(row + 2, col + 2, self.time_to_dist_data[row][col])
-
+        workbook = open_workbook(filename)
+        write_grid(workbook, 'Time to Distance', self.model.HEADERS['time'],
+                   "Ratio (n:1)", self.ratios,
+                   self.model.HEADERS['pos'], [i * self.distance_step for i in self.distance_steps],
+                   self.time_to_dist_data)
+        write_metadata(workbook, [('model', self.model.get_type()),
+                                  ('min_ratio', self.min_ratio),
+                                  ('max_ratio', self.max_ratio),
+                                  ('ratios', len(self.ratios)),
+                                  ('simulations', self.num_simulations or len(self.ratios)),
+                                  ('min_distance', self.min_distance),
+                                  ('max_dist', self.max_dist),
+                                  ('distance_step', self.distance_step)] + list(self.model.to_json().items()))
         workbook.close()
@@ -0,0 +1,106 @@
+from math import sqrt
+
+import numpy as np
+
+_GOLDEN = (3 - sqrt(5)) / 2
+
+
+def brent_minimize(f, lo, hi, tolerance=1e-3, max_evals=100):
+    # Bounded Brent minimization (golden section with parabolic interpolation) of a unimodal f on [lo, hi].
+    # Returns (x, f(x), number of evaluations).
+    a, b = lo, hi
+    x = w = v = a + _GOLDEN * (b - a)
+    fx = fw = fv = f(x)
+    evals = 1
+    d = e = 0.0
+    while evals < max_evals:
+        m = (a + b) / 2
+        tol1 = tolerance / 3
+        tol2 = 2 * tol1
+        if abs(x - m) <= tol2 - (b - a) / 2:
+            break
+        parabolic = False
+        if abs(e) > tol1:
+            r = (x - w) * (fx - fv)
+            q = (x - v) * (fx - fw)
+            p = (x - v) * q - (x - w) * r
+            q = 2 * (q - r)
+            if q > 0:
+                p = -p
+            q = abs(q)
+            if abs(p) < abs(q * e / 2) and q * (a - x) < p < q * (b - x):
+                e, d = d, p / q
+                parabolic = True
+                if (x + d) - a < tol2 or b - (x + d) < tol2:
+                    d = tol1 if x < m else -tol1
+        if not parabolic:
+            e = (b - x) if x < m else (a - x)
+            d = _GOLDEN * e
+        u = x + (d if abs(d) >= tol1 else (tol1 if d > 0 else -tol1))
+        fu = f(u)
+        evals += 1
+        if fu <= fx:
+            if u < x:
+                b = x
+            else:
+                a = x
+            v, fv, w, fw, x, fx = w, fw, x, fx, u, fu
+        else:
+            if u < x:
+                a = u
+            else:
+                b = u
+            if fu <= fw or w == x:
+                v, fv, w, fw = w, fw, u, fu
+            elif fu <= fv or v == x or v == w:
+                v, fv = u, fu
+    return x, fx, evals
+
+
+def nelder_mead(f, x0, steps, bounds=None, tolerance=1e-3, max_evals=200):
+    # Nelder-Mead simplex minimization of f over len(x0) dimensions, clipped to bounds [(lo, hi), ...].
+    # Stops once every simplex edge is within tolerance (relative to steps). Returns (x, f(x), evaluations).
+    x0 = np.asarray(x0, dtype=float)
+    steps = np.asarray(steps, dtype=float)
+    lo, hi = (np.array(bounds, dtype=float).T if bounds is not None
+              else (np.full(len(x0), -np.inf), np.full(len(x0), np.inf)))
+
+    def evaluate(x):
+        x = np.clip(x, lo, hi)
+        return x, f(x)
+
+    simplex = [evaluate(x0)]
+    for i in range(len(x0)):
+        x = x0.copy()
+        x[i] += steps[i]
+        if x[i] > hi[i]:
+            x[i] = x0[i] - steps[i]
+        simplex.append(evaluate(x))
+    evals = len(simplex)
+
+    while evals < max_evals:
+        simplex.sort(key=lambda e: e[1])
+        points = np.array([e[0] for e in simplex])
+        if np.all(np.abs(points[1:] - points[0]) <= tolerance * np.abs(steps)):
+            break
+        centroid = points[:-1].mean(axis=0)
+        worst, f_worst = simplex[-1]
+        reflected = evaluate(centroid + (centroid - worst))
+        evals += 1
+        if reflected[1] < simplex[0][1]:
+            expanded = evaluate(centroid + 2 * (centroid - worst))
+            evals += 1
+            simplex[-1] = expanded if expanded[1] < reflected[1] else reflected
+        elif reflected[1] < simplex[-2][1]:
+            simplex[-1] = reflected
+        else:
+            contracted = evaluate(centroid + 0.5 * (worst - centroid))
+            evals += 1
+            if contracted[1] < f_worst:
+                simplex[-1] = contracted
+            else:  # shrink towards the best point
+                best = simplex[0][0]
+                simplex = [simplex[0]] + [evaluate(best + 0.5 * (e[0] - best)) for e in simplex[1:]]
+                evals += len(simplex) - 1
+    simplex.sort(key=lambda e: e[1])
+    return simplex[0][0], simplex[0][1], evals
@@ -0,0 +1,216 @@
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from os import cpu_count
+
+import numpy as np
+
+from workbook import open_workbook, write_grid, write_metadata, write_table
+
+_worker_optimizer = None
+
+
+def _init_worker(optimizer):
+    global _worker_optimizer
+    _worker_optimizer = optimizer
+
+
+def _simulate_worker_point(args):
+    return _worker_optimizer._simulate(_worker_optimizer.model, *args)
+
+
+class ShiftOptimizer:
+    # Searches low gear ratio x high gear ratio x shift velocity of a ShiftingDrivetrainModel for the shortest
+    # (weighted) total time to target_distances. Regions are pruned three ways:
+    # - points whose high gear isn't taller than their low gear are skipped
+    # - every low ratio is first run without shifting, and points whose shift velocity that run never passes
+    #   share its result
+    # - with coarse > 1 every coarse'th value of each axis is run first, and the full grid only around the best
+    #   keep of those, every run stopping as soon as it can't beat the best time found so far.
+    def __init__(self, model, low_ratios, high_ratios, shift_velocities,
+                 target_distances,  # m, one or more
+                 weights=None):  # per target distance, defaults to 1 each
+        self.model = model
+        self.low_ratios = np.asarray(low_ratios, dtype=float)
+        self.high_ratios = np.asarray(high_ratios, dtype=float)
+        self.shift_velocities = np.asarray(shift_velocities, dtype=float)
+        self.target_distances = np.atleast_1d(np.asarray(target_distances, dtype=float))
+        self.weights = np.ones(len(self.target_distances)) if weights is None else np.asarray(weights, dtype=float)
+        if len(self.weights) != len(self.target_distances):
+            raise ValueError("Expected one weight per target distance")
+
+        self.shape = (len(self.low_ratios), len(self.high_ratios), len(self.shift_velocities))
+        self.costs = np.full(self.shape, np.nan)  # NaN where pruned
+        self.times = np.full(self.shape + (len(self.target_distances),), np.nan)  # time to each target distance
+        self.num_simulations = 0
+        self._results = {}  # simulation key: (times, cost, aborted, top speed)
+
+    def _get_key(self, index):  # points that simulate identically share a key
+        low, high, shift = self.low_ratios[index[0]], self.high_ratios[index[1]], self.shift_velocities[index[2]]
+        if high >= low:
+            return None
+        if shift >= self._results[(low, None, None)][3]:
+            return low, None, None  # never goes faster than the shift velocity, so never shifts
+        return low, high, shift
+
+    def _simulate(self, model, low, high, shift, cutoff=np.inf):
+        # Returns (times to each target, cost, aborted, top speed). An aborted run passed cutoff before reaching
+        # every target, its cost is then a lower bound. The model's gearing and max_dist are left as they were.
+        saved = model.low_gear_ratio, model.high_gear_ratio, model.shift_velocity, model.max_dist
+        try:
+            model.low_gear_ratio = low
+            model.high_gear_ratio = high if high is not None else low
+            model.shift_velocity = shift if shift is not None else np.inf
+            model.max_dist = self.target_distances.max()
+            return self._run_model(model, cutoff)
+        finally:
+            model.low_gear_ratio, model.high_gear_ratio, model.shift_velocity, model.max_dist = saved
+
+    def _run_model(self, model, cutoff):
+        channels = model.get_channels()
+        i_time, i_pos, i_vel = channels.index('time'), channels.index('pos'), channels.index('vel')
+
+        times = np.full(len(self.target_distances), np.nan)
+        last_time = last_pos = None
+        cost = 0.0
+        top_speed = -np.inf
+        for values in model.iter_steps():
+            time, pos = values[i_time], values[i_pos]
+            top_speed = max(top_speed, values[i_vel])
+            reached = np.isnan(times) & (self.target_distances <= pos)
+            if reached.any():
+                if last_pos is None or pos == last_pos:
+                    times[reached] = time
+                else:
+                    times[reached] = last_time + (self.target_distances[reached] - last_pos) * \
+                                     (time - last_time) / (pos - last_pos)
+            last_time, last_pos = time, pos
+            cost = float(np.dot(self.weights, np.where(np.isnan(times), time, times)))
+            if cost > cutoff and np.isnan(times).any():
+                return times, cost, True, top_speed
+        if np.isnan(times).any():
+            cost = np.inf  # ran out of simulation_time
+        return times, cost, False, top_speed
+
+    def _run_keys(self, keys, executor, chunksize):
+        # Runs without a shift are never cut off, their top speed decides which points share them
+        best = min((r[1] for r in self._results.values() if not r[2]), default=np.inf)
+        keys = [key for key in dict.fromkeys(keys) if key is not None and key not in self._results]
+        if executor is None:
+            for key in keys:
+                self._results[key] = self._simulate(self.model, *key, cutoff=best if key[1] is not None else np.inf)
+                if not self._results[key][2]:
+                    best = min(best, self._results[key][1])
+        else:
+            # Each chunk is pruned against the best time from the chunks before it
+            for start in range(0, len(keys), chunksize):
+                chunk = keys[start:start + chunksize]
+                args = [key + (best if key[1] is not None else np.inf,) for key in chunk]
+                for key, result in zip(chunk, executor.map(_simulate_worker_point, args)):
+                    self._results[key] = result
+                    if not result[2]:
+                        best = min(best, result[1])
+        self.num_simulations += len(keys)
+
+    def run(self, workers=1, coarse=1, keep=5, chunksize=None):
+        # Returns (low ratio, high ratio, shift velocity, cost) of the best point
+        self._results = {}
+        self.num_simulations = 0
+        executor = None
+        if workers != 1:
+            workers = workers or cpu_count()
+            if chunksize is None:
+                chunksize = workers * 4
+            self.model.init_sim_vars()  # ship an empty trace with the template model
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,))
+        try:
+            self._run_keys([(low, None, None) for low in self.low_ratios], executor, chunksize)
+            indices = list(np.ndindex(*self.shape))
+            if coarse > 1:
+                coarse_indices = [index for index in indices if all(i % coarse == 0 for i in index)]
+                self._run_keys([self._get_key(index) for index in coarse_indices], executor, chunksize)
+                self._store()
+                ranked = sorted((index for index in coarse_indices if not np.isnan(self.costs[index])),
+                                key=lambda index: self.costs[index])
+                refine = set()
+                for index in ranked[:keep]:
+                    refine.update(product(*[range(max(i - coarse + 1, 0), min(i + coarse, n))
+                                            for i, n in zip(index, self.shape)]))
+                indices = sorted(refine)
+            self._run_keys([self._get_key(index) for index in indices], executor, chunksize)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        self._store()
+        best = self.get_ranked()[0]
+        return best['low_gear_ratio'], best['high_gear_ratio'], best['shift_velocity'], best['cost']
+
+    def _store(self):  # fills costs and times from the simulated keys, aborted runs stay NaN
+        self.costs[:] = np.nan
+        self.times[:] = np.nan
+        for index in np.ndindex(*self.shape):
+            result = self._results.get(self._get_key(index))
+            if result is not None and not result[2]:
+                self.times[index], self.costs[index] = result[0], result[1]
+
+    def get_ranked(self):  # every fully simulated point, best first
+        rows = []
+        for index in np.ndindex(*self.shape):
+            if np.isnan(self.costs[index]):
+                continue
+            row = OrderedDict([('low_gear_ratio', float(self.low_ratios[index[0]])),
+                               ('high_gear_ratio', float(self.high_ratios[index[1]])),
+                               ('shift_velocity', float(self.shift_velocities[index[2]])),
+                               ('cost', float(self.costs[index]))])
+            row.update(('time_to_{:g}'.format(d), float(t)) for d, t in zip(self.target_distances, self.times[index]))
+            rows.append(row)
+        return sorted(rows, key=lambda row: row['cost'])
+
+    def format_table(self, count=10):
+        ranked = self.get_ranked()[:count]
+        if not ranked:
+            return ""
+        lines = [" ".join("{:>16s}".format(column) for column in ranked[0])]
+        lines += [" ".join("{:16.6g}".format(value) for value in row.values()) for row in ranked]
+        return "\n".join(lines)
+
+    def _get_projections(self):  # best cost over the third axis for each pair of axes
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN slices stay NaN
+            return [
+                ('Low x High', 'Low ratio (n:1)', self.low_ratios, 'High ratio (n:1)', self.high_ratios,
+                 np.nanmin(self.costs, axis=2)),
+                ('Low x Shift', 'Low ratio (n:1)', self.low_ratios, 'Shift velocity (m/s)',
+                 self.shift_velocities, np.nanmin(self.costs, axis=1)),
+                ('High x Shift', 'High ratio (n:1)', self.high_ratios, 'Shift velocity (m/s)',
+                 self.shift_velocities, np.nanmin(self.costs, axis=0)),
+            ]
+
+    def plot(self):
+        import matplotlib.pyplot as plt
+
+        projections = self._get_projections()
+        fig, axes = plt.subplots(1, len(projections), figsize=(5 * len(projections), 4))
+        for ax, (title, row_label, row_values, column_label, column_values, data) in zip(axes, projections):
+            mesh = ax.pcolormesh(column_values, row_values, data, cmap=plt.get_cmap('RdYlGn_r'), shading='nearest')
+            ax.set(title=title, xlabel=column_label, ylabel=row_label)
+            fig.colorbar(mesh, ax=ax, label='Time (s)')
+        fig.tight_layout()
+        plt.show()
+
+    def save_xlsx(self, filename, count=100):
+        workbook = open_workbook(filename)
+        ranked = self.get_ranked()[:count]
+        write_table(workbook, 'Ranking', list(ranked[0]) if ranked else [], [list(row.values()) for row in ranked])
+        for title, row_label, row_values, column_label, column_values, data in self._get_projections():
+            write_grid(workbook, title, 'Best time (s)', row_label, row_values, column_label, column_values, data)
+        write_metadata(workbook, [('model', self.model.get_type()),
+                                  ('target_distances', self.target_distances),
+                                  ('weights', self.weights),
+                                  ('low_ratios', self.low_ratios),
+                                  ('high_ratios', self.high_ratios),
+                                  ('shift_velocities', self.shift_velocities),
+                                  ('points', int(np.prod(self.shape))),
+                                  ('simulations', self.num_simulations)] + list(self.model.to_json().items()))
+        workbook.close()
@@ -0,0 +1,196 @@
+import contextlib
+import io
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+
+import numpy as np
+
+from model import FinalStateRecorder
+from model.motors import MOTOR_LOOKUP, Motor
+from search import nelder_mead
+from workbook import get_sheet_name, open_workbook, write_grid, write_metadata
+
+_worker_sweep = None
+
+
+def _init_worker(sweep):
+    global _worker_sweep
+    _worker_sweep = sweep
+
+
+def _simulate_worker_point(flat_index):
+    return _worker_sweep._simulate_point(flat_index)
+
+
+class ParameterSweep:
+    METRICS = ('time_to_dist', 'peak_current', 'energy', 'brownout_time', 'final_pos', 'final_vel')
+
+    def __init__(self, model_class,
+                 axes,  # {constructor parameter: values}, plus 'motor_type' (MOTOR_LOOKUP key) and 'num_motors'
+                 metrics=('time_to_dist',),
+                 target_distance=None,  # Distance time_to_dist is measured to, defaults to max_dist
+                 dtype=np.float32,
+                 **fixed_params):  # Constructor parameters shared by every point
+        unknown = set(metrics) - set(self.METRICS)
+        if unknown:
+            raise ValueError("Unknown metrics: {}".format(", ".join(sorted(unknown))))
+        self.model_class = model_class
+        self.axes = OrderedDict((key, list(values)) for key, values in axes.items())
+        self.metrics = tuple(metrics)
+        self.fixed_params = fixed_params
+        self.target_distance = target_distance if target_distance is not None else fixed_params.get('max_dist')
+        if 'time_to_dist' in self.metrics and not self.target_distance:
+            raise ValueError("time_to_dist needs a target_distance or max_dist")
+
+        self.shape = tuple(len(values) for values in self.axes.values())
+        self.results = OrderedDict((metric, np.full(self.shape, np.nan, dtype=dtype)) for metric in self.metrics)
+        self.num_simulations = 0
+
+    def __len__(self):
+        return int(np.prod(self.shape))
+
+    def get_params(self, index):  # constructor arguments for one grid point, index is an N-D tuple
+        return self._get_params([values[i] for values, i in zip(self.axes.values(), index)])
+
+    def _get_params(self, axis_values):
+        params = dict(self.fixed_params)
+        params.update(zip(self.axes, axis_values))
+        if 'motor_type' in params or 'num_motors' in params:
+            motors = params.get('motors')
+            motor_class = MOTOR_LOOKUP[params.pop('motor_type')] if 'motor_type' in params else type(motors)
+            num_motors = params.pop('num_motors') if 'num_motors' in params else motors.num_motors
+            params['motors'] = motor_class(num_motors)
+        return params
+
+    def _simulate_point(self, flat_index):
+        return flat_index, self._simulate(self.get_params(np.unravel_index(flat_index, self.shape)), self.metrics)
+
+    def _simulate(self, params, metrics):
+        with contextlib.redirect_stdout(io.StringIO()):  # constructors print traction info, once per point
+            model = self.model_class(auto_calc=False, recorder=FinalStateRecorder(), **params)
+        channels = model.get_channels()
+        i_time, i_pos, i_vel = channels.index('time'), channels.index('pos'), channels.index('vel')
+        i_current, i_energy = channels.index('total_current'), channels.index('total_energy')
+        i_brownout = channels.index('brownout')
+        only_time_to_dist = tuple(metrics) == ('time_to_dist',)
+
+        time_to_dist = np.nan
+        peak_current = 0.0
+        brownout_time = 0.0
+        last_time = last_pos = None
+        values = None
+        for values in model.iter_steps():  # reduce on the fly, no trace is kept
+            time, pos = values[i_time], values[i_pos]
+            if np.isnan(time_to_dist) and pos >= self.target_distance:
+                if last_pos is None or pos == last_pos:
+                    time_to_dist = time
+                else:
+                    time_to_dist = last_time + (self.target_distance - last_pos) * (time - last_time) / (pos - last_pos)
+                if only_time_to_dist:
+                    break
+            if values[i_current] > peak_current:
+                peak_current = values[i_current]
+            if values[i_brownout] and last_time is not None:
+                brownout_time += time - last_time
+            last_time, last_pos = time, pos
+
+        result = {
+            'time_to_dist':  time_to_dist,
+            'peak_current':  peak_current,
+            'energy':        values[i_energy],
+            'brownout_time': brownout_time,
+            'final_pos':     values[i_pos],
+            'final_vel':     values[i_vel]
+        }
+        return [result[metric] for metric in metrics]
+
+    def run(self, workers=1, chunksize=None):
+        flat_results = [self.results[metric].reshape(-1) for metric in self.metrics]
+        if workers == 1:
+            results = map(self._simulate_point, range(len(self)))
+            self._store(results, flat_results)
+            return
+
+        workers = workers or cpu_count()
+        if chunksize is None:
+            chunksize = max(1, len(self) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+            self._store(executor.map(_simulate_worker_point, range(len(self)), chunksize=chunksize), flat_results)
+
+    def _store(self, results, flat_results):
+        for flat_index, values in results:
+            for flat_result, value in zip(flat_results, values):
+                flat_result[flat_index] = value
+
+    def best(self, metric='time_to_dist', maximize=False):  # parameters and value of the best grid point
+        data = self.results[metric]
+        flat_index = np.nanargmax(data) if maximize else np.nanargmin(data)
+        index = np.unravel_index(flat_index, self.shape)
+        return OrderedDict((key, values[i]) for (key, values), i in zip(self.axes.items(), index)), data[index]
+
+    def search(self, metric='time_to_dist', maximize=False, start=None, tolerance=1e-3, max_simulations=200):
+        # Nelder-Mead over the numeric axes treated as continuous ranges between their smallest and largest
+        # values, for finding an optimum to a tolerance without filling the grid. Starts from the middle of each
+        # range unless start ({axis: value}) is given, tolerance is relative to each range.
+        # Returns (OrderedDict of axis values, metric value), num_simulations holds the simulation count.
+        if metric not in self.METRICS:
+            raise ValueError("Unknown metric: {}".format(metric))
+        if metric == 'time_to_dist' and not self.target_distance:
+            raise ValueError("time_to_dist needs a target_distance or max_dist")
+        for key, values in self.axes.items():
+            if key == 'motor_type' or not all(isinstance(v, (int, float, np.number)) for v in values):
+                raise ValueError("Axis {} is not numeric and can't be searched".format(key))
+
+        bounds = [(min(values), max(values)) for values in self.axes.values()]
+        x0 = [(lo + hi) / 2 for lo, hi in bounds]
+        if start is not None:
+            x0 = [start.get(key, x) for key, x in zip(self.axes, x0)]
+        steps = [(hi - lo) / 4 or 1 for lo, hi in bounds]
+        integer_axes = [all(isinstance(v, (int, np.integer)) for v in values) for values in self.axes.values()]
+        sign = -1 if maximize else 1
+
+        def axis_values(x):
+            return [int(round(v)) if integer else float(v) for v, integer in zip(x, integer_axes)]
+
+        def objective(x):
+            value = self._simulate(self._get_params(axis_values(x)), (metric,))[0]
+            return np.inf if np.isnan(value) else sign * value  # e.g. target distance never reached
+
+        x, value, self.num_simulations = nelder_mead(objective, x0, steps, bounds, tolerance, max_simulations)
+        return OrderedDict(zip(self.axes, axis_values(x))), sign * value
+
+    def save(self, filename):
+        np.savez_compressed(filename,
+                            **{'axis_' + key: np.array(values) for key, values in self.axes.items()},
+                            **{'metric_' + metric: data for metric, data in self.results.items()})
+
+    def save_xlsx(self, filename):
+        # One sheet per metric with the last two axes as rows and columns. Sweeps with more axes get a sheet
+        # per combination of the leading axes, listed on the Parameters sheet.
+        workbook = open_workbook(filename)
+        keys = list(self.axes)
+        sheets = []
+        for metric, data in self.results.items():
+            if data.ndim == 1:
+                data = data.reshape(-1, 1)
+                row_key, column_key, column_values = keys[0], metric, [metric]
+            else:
+                row_key, column_key = keys[-2], keys[-1]
+                column_values = self.axes[column_key]
+            leading = list(np.ndindex(*data.shape[:-2]))
+            for n, index in enumerate(leading):
+                leading_values = ", ".join("{}={}".format(key, self.axes[key][i]) for key, i in zip(keys, index))
+                sheet_name = get_sheet_name(metric if len(leading) == 1 else "{} {}".format(metric, n + 1))
+                write_grid(workbook, sheet_name, leading_values or metric, row_key, self.axes[row_key],
+                           column_key, column_values, data[index])
+                if leading_values:
+                    sheets.append(("sheet " + sheet_name, leading_values))
+
+        write_metadata(workbook, [('model', self.model_class.__name__),
+                                  ('target_distance', self.target_distance),
+                                  ('points', len(self))] +
+                       [('axis ' + key, values) for key, values in self.axes.items()] +
+                       [(key, "{}x{}".format(type(value).__name__, value.num_motors) if isinstance(value, Motor)
+                         else value) for key, value in sorted(self.fixed_params.items())] + sheets)
+        workbook.close()
@@ -0,0 +1,22 @@
+# Small models shared by the tests, quick enough to run at fine time steps
+import numpy as np
+
+from model import DrivetrainModel, EmaCurrentFilter
+from model.motors import CIM
+
+
+def make_drivetrain(motors=None, **kwargs):
+    params = dict(gear_ratio=10, wheel_diameter=0.15, robot_mass=60, simulation_time=1.5, max_dist=None,
+                  auto_calc=False, current_limit_filter=EmaCurrentFilter())
+    params.update(kwargs)
+    return DrivetrainModel(motors or CIM(4), **params)
+
+
+def run(model):
+    model.calc()
+    return model
+
+
+def max_difference(reference, model, key):  # against reference interpolated at model's sample times
+    return np.abs(np.interp(model.trace['time'], reference.trace['time'], reference.trace[key]) -
+                  model.trace[key]).max()
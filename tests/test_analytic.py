@@ -0,0 +1,55 @@
+import pytest
+
+from controllers.pidf import PidfController
+from model import ShiftingDrivetrainModel, ShooterSpinupModel
+from model.motors import CIM, _775pro
+from tests._models import make_drivetrain, max_difference, run
+
+
+@pytest.mark.parametrize('current_limit', [None, 30])
+def test_analytic_matches_heun(current_limit):
+    # The closed form follows the consistent system voltage, Heun lags it, so they differ in proportion to time_step
+    reference = run(make_drivetrain(motor_current_limit=current_limit, time_step=1e-4))
+    model = run(make_drivetrain(motor_current_limit=current_limit, time_step=1e-4, analytic=True))
+    assert model.integration_stats['analytic_steps'] > 0
+    assert max_difference(reference, model, 'pos') < 2e-4
+    assert max_difference(reference, model, 'vel') < 2e-4
+
+
+def test_analytic_waits_for_high_gear():
+    model = run(ShiftingDrivetrainModel(CIM(4), low_gear_ratio=15, high_gear_ratio=7, shift_velocity=2,
+                                        wheel_diameter=0.15, robot_mass=60, max_dist=None, simulation_time=3,
+                                        analytic=True, auto_calc=False))
+    assert model.integration_stats['analytic_steps'] > 0
+    assert model.trace['vel'][model.integration_stats['steps']] > model.shift_velocity
+
+
+def test_analytic_needs_a_fixed_voltage():
+    controller = PidfController()
+    controller.set_gains(k_p=10)
+    controller.set_goal(1)
+    model = run(make_drivetrain(analytic=True, controller=controller))
+    assert model.integration_stats['analytic_steps'] == 0
+
+
+def _make_shooter(**kwargs):
+    return ShooterSpinupModel(_775pro(2), gear_ratio=2, wheel_diameter=0.05, wheel_inertia=0.0005,
+                              motor_voltage_limit=12, max_dist=0, simulation_time=2, auto_calc=False, **kwargs)
+
+
+def _make_limited_drivetrain(**kwargs):
+    return make_drivetrain(motor_voltage_limit=11.5, simulation_time=3, **kwargs)
+
+
+@pytest.mark.parametrize('make_model', [_make_shooter, _make_limited_drivetrain])
+def test_analytic_crosses_from_battery_sag_to_the_voltage_limit(make_model):
+    # The system voltage sags below motor_voltage_limit at first and recovers past it, two linear segments
+    reference = run(make_model(time_step=1e-4))
+    model = run(make_model(time_step=1e-4, analytic=True))
+    stats = model.integration_stats
+    start = stats['steps'] - stats['analytic_steps']  # trace row the closed form takes over from
+    assert model.trace['sys_voltage'][start] < model.motor_voltage_limit
+    assert model.trace['sys_voltage'][-1] > model.motor_voltage_limit
+    scale = reference.trace['vel'].max()
+    assert max_difference(reference, model, 'vel') < 1e-4 * scale
+    assert max_difference(reference, model, 'pos') < 1e-4 * reference.trace['pos'][-1]
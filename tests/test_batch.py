@@ -0,0 +1,18 @@
+import numpy as np
+
+from model import BatchModel, MovingAverageCurrentFilter
+from model.motors import CIM, MiniCIM
+from tests._models import make_drivetrain, run
+
+
+def test_batch_matches_scalar_runs():
+    models = [make_drivetrain(CIM(4), motor_current_limit=40, current_limit_filter=MovingAverageCurrentFilter()),
+              make_drivetrain(MiniCIM(6), current_limit_filter=MovingAverageCurrentFilter()),
+              make_drivetrain(CIM(2), battery_voltage=11.5, motor_current_limit=25,
+                              current_limit_filter=MovingAverageCurrentFilter())]
+    batch = BatchModel.from_models(models, record=('pos', 'vel', 'current'))
+    for i, model in enumerate(models):
+        run(model)
+        for key in ('pos', 'vel', 'current'):
+            np.testing.assert_allclose(batch.get_data(key)[:len(model.trace), i], model.trace[key],
+                                       rtol=1e-12, atol=1e-12)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from controllers import BangBangController, PidfController
+from model import BatchModel, ElevatorModel, MovingAverageCurrentFilter
+from model.motors import _775pro
+from tests._models import make_drivetrain, run
+
+KEYS = ('pos', 'vel', 'current', 'error', 'done')
+
+
+def _make_elevator(controller, **kwargs):
+    return ElevatorModel(motors=_775pro(4), gear_ratio=16, payload_mass=10, pulley_diameter=2 * 0.0254,
+                         simulation_time=1.5, controller=controller, current_limit_filter=MovingAverageCurrentFilter(),
+                         auto_calc=False, **kwargs)
+
+
+def _make_pidf(goal, **gains):
+    controller = PidfController()
+    controller.set_deadband(0.01)
+    controller.set_gains(**gains)
+    controller.set_goal(goal)
+    return controller
+
+
+def _check_lanes(models):
+    batch = BatchModel.from_models(models, record=KEYS)
+    for i, model in enumerate(models):
+        run(model)
+        for key in KEYS:
+            np.testing.assert_allclose(batch.get_data(key)[:len(model.trace), i], model.trace[key],
+                                       rtol=1e-12, atol=1e-12)
+
+
+def test_batch_pidf_lanes_match_scalar_controllers():
+    _check_lanes([_make_elevator(_make_pidf(1, k_p=12, k_i=0.1, k_f=1.5), max_dist=2),
+                  _make_elevator(_make_pidf(0.5, k_p=30, k_d=40, reset_i_on_overshoot=True, k_i=0.5), max_dist=2),
+                  _make_elevator(_make_pidf(1, k_p=20, min_i_error=0.5, k_i=0.2), motor_current_limit=30,
+                                 max_dist=0.6)])  # stops early, the other lanes carry on
+
+
+def test_batch_bang_bang_lanes_match_scalar_controllers():
+    controllers = [BangBangController(), BangBangController()]
+    for controller, goal, toggle_deadband in zip(controllers, (1, 2), (0, 0.2)):
+        controller.set_gains(toggle_deadband=toggle_deadband, forward_voltage=10, reverse_voltage=-10)
+        controller.set_goal(goal)
+    _check_lanes([make_drivetrain(controller=controller, current_limit_filter=MovingAverageCurrentFilter())
+                  for controller in controllers])
+
+
+def test_mixed_controller_types_are_rejected():
+    with pytest.raises(TypeError):
+        BatchModel.from_models([_make_elevator(_make_pidf(1, k_p=12)), _make_elevator(BangBangController())])
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+
+from model import PredicateTermination, SimulationCache, SteadyStateTermination
+from tests._models import make_drivetrain
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SimulationCache(str(tmp_path))
+
+
+def _entries(cache):
+    return [name for name in os.listdir(cache.directory) if name.endswith('.npz')]
+
+
+def _make_cached(cache, **kwargs):
+    return make_drivetrain(cache=cache, **kwargs)
+
+
+def test_a_hit_restores_the_trace_and_final_state(cache):
+    first = _make_cached(cache, simulation_time=5, termination=SteadyStateTermination(extrapolate=True))
+    first.calc()
+    assert first.terminated_by is first.termination[0]
+    assert len(_entries(cache)) == 1
+
+    second = _make_cached(cache, simulation_time=5, termination=SteadyStateTermination(extrapolate=True))
+    second._integrate = None  # a hit must not integrate
+    second.calc()
+    for key in first.trace.channels:
+        np.testing.assert_array_equal(second.trace[key], first.trace[key])
+    assert second.integration_stats == first.integration_stats
+    assert second.terminated_by is second.termination[0]
+    for attribute in first.STATE_ATTRIBUTES:
+        assert getattr(second, attribute) == getattr(first, attribute), attribute
+
+
+def test_numpy_parameters_round_trip(cache):
+    # Sweeps pass numpy scalars, which make flags such as _brownout numpy bools
+    first = _make_cached(cache, gear_ratio=np.float64(10), battery_voltage=np.float64(12.5))
+    first.calc()
+    assert isinstance(first._brownout, np.bool_)
+    second = _make_cached(cache, gear_ratio=np.float64(10), battery_voltage=np.float64(12.5))
+    second._integrate = None
+    second.calc()
+    np.testing.assert_array_equal(second.trace['pos'], first.trace['pos'])
+    assert second._brownout == first._brownout
+
+
+def test_different_parameters_miss(cache):
+    _make_cached(cache).calc()
+    _make_cached(cache, battery_voltage=12).calc()
+    assert len(_entries(cache)) == 2
+
+
+def test_predicates_are_never_cached(cache):
+    model = _make_cached(cache, termination=PredicateTermination(lambda model: model._position > 1))
+    model.calc()
+    assert _entries(cache) == []
+
+
+def test_eviction_keeps_the_size_cap(cache):
+    cache.max_size = 1
+    _make_cached(cache).calc()
+    _make_cached(cache, battery_voltage=12).calc()
+    assert len(_entries(cache)) <= 1
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from model import CurrentLimitFilter, EmaCurrentFilter, MovingAverageCurrentFilter, PeakCurrentFilter
+
+
+def _make_filters():
+    return [MovingAverageCurrentFilter(window=5), EmaCurrentFilter(), PeakCurrentFilter(60, peak_duration=0.003)]
+
+
+@pytest.mark.parametrize('index', range(3))
+def test_is_over_limit_after_matches_adding_the_sample(index):
+    current_filter = _make_filters()[index]
+    currents = np.random.RandomState(index).uniform(0, 100, 200)
+    for current in currents:
+        expected = CurrentLimitFilter.is_over_limit_after(current_filter, current, 0.001, 40)
+        assert current_filter.is_over_limit_after(current, 0.001, 40) == expected
+        current_filter.add_sample(current, 0.001)
+
+
+def test_moving_average_is_the_mean_of_the_window():
+    current_filter = MovingAverageCurrentFilter(window=7)
+    currents = np.random.RandomState(0).uniform(0, 100, 50)
+    for n, current in enumerate(currents):
+        current_filter.add_sample(current, 0.001)
+        window = currents[max(0, n - 6):n + 1]
+        assert current_filter.get_value() == pytest.approx(window.sum() / 7, rel=1e-12)
+    assert not current_filter.is_settled(0, 60)  # samples over the limit are still in the window
+    for _ in range(7):
+        current_filter.add_sample(0, 0.001)
+    assert current_filter.is_settled(0, 60)
+
+
+def test_ema_is_time_weighted():
+    one_step, two_steps = EmaCurrentFilter(), EmaCurrentFilter()
+    one_step.add_sample(50, 0.002)
+    two_steps.add_sample(50, 0.001)
+    two_steps.add_sample(50, 0.001)
+    assert one_step.get_value() == pytest.approx(two_steps.get_value(), rel=1e-12)
+    assert EmaCurrentFilter.time_weighted and not MovingAverageCurrentFilter.time_weighted
+
+
+def test_peak_filter_limits_after_peak_duration():
+    current_filter = PeakCurrentFilter(60, peak_duration=0.0025)
+    over = []
+    for current in (70, 70, 70, 50, 70):
+        current_filter.add_sample(current, 0.001)
+        over.append(current_filter.is_over_limit(40))
+    assert over == [False, False, True, False, False]
+    assert current_filter.is_settled(50, 40) and not current_filter.is_settled(70, 40)
@@ -0,0 +1,42 @@
+import matplotlib
+import numpy as np
+
+from model import lttb, plot_models
+from tests._models import make_drivetrain, run
+
+matplotlib.use('Agg')
+
+
+def reference_lttb(x, y, threshold):  # the textbook loop, one bucket at a time
+    n = len(x)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    indices = [0]
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        x_avg, y_avg = x[next_start:next_stop].mean(), y[next_start:next_stop].mean()
+        a = indices[-1]
+        areas = [abs((x[a] - x_avg) * (y[j] - y[a]) - (x[a] - x[j]) * (y_avg - y[a])) for j in range(start, stop)]
+        indices.append(start + int(np.argmax(areas)))
+    return np.array(indices + [n - 1])
+
+
+def test_lttb_matches_the_reference_and_keeps_peaks():
+    x = np.linspace(0, 10, 5001)
+    y = np.sin(3 * x) + np.random.RandomState(0).normal(0, 0.1, len(x))
+    y[1234] = 5
+    for threshold in (3, 50, 333):
+        np.testing.assert_array_equal(lttb(x, y, threshold), reference_lttb(x, y, threshold))
+    assert 1234 in lttb(x, y, 100)
+    np.testing.assert_array_equal(lttb(x, y, len(x)), np.arange(len(x)))
+
+
+def test_plot_models_draws_about_one_point_per_pixel():
+    import matplotlib.pyplot as plt
+
+    model = run(make_drivetrain(simulation_time=5))
+    plot_models(model)
+    ax = plt.gcf().axes[0]
+    for line in ax.get_lines():
+        assert len(line.get_xdata()) <= ax.bbox.width < len(model.trace)
+    plt.close('all')
@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from model import export_csv, export_models, export_npz
+from tests._models import make_drivetrain, run
+
+
+def make_models():
+    return [run(make_drivetrain(simulation_time=0.5)), run(make_drivetrain(gear_ratio=8, simulation_time=0.3))]
+
+
+def test_csv_has_every_model_and_its_parameters(tmp_path):
+    models = make_models()
+    filename = str(tmp_path / 'models.csv')
+    export_csv(models, filename, chunk_size=100)  # several chunks per model
+
+    with open(filename) as file:
+        comments = [json.loads(line[2:]) for line in file if line.startswith('# ')]
+    assert [c['params']['gear_ratio'] for c in comments] == [10, 8]
+
+    with open(filename) as file:
+        lines = [line for line in file if not line.startswith('#')]
+    data = np.genfromtxt(lines, delimiter=',', names=True)
+    for i, model in enumerate(models):
+        rows = data[data['model'] == i]
+        assert len(rows) == len(model.trace)
+        np.testing.assert_allclose(rows['pos'], model.trace['pos'], atol=1e-5)
+        np.testing.assert_array_equal(rows['slipping'], model.trace['slipping'])
+    slipping = lines[0].strip().split(',').index('slipping')
+    assert {line.split(',')[slipping] for line in lines[1:]} <= {'0', '1'}  # flags as 0/1
+
+
+@pytest.mark.parametrize('compressed', [True, False])
+def test_npz_round_trips_the_traces(tmp_path, compressed):
+    models = make_models()
+    filename = str(tmp_path / 'models.npz')
+    export_npz(models, filename, compressed=compressed)
+
+    with np.load(filename) as data:
+        assert [m['model'] for m in json.loads(str(data['__metadata__']))] == [0, 1]
+        for i, model in enumerate(models):
+            assert json.loads(str(data['model{}/__metadata__'.format(i)]))['params']['gear_ratio'] == model.gear_ratio
+            for key in model.trace.channels:
+                np.testing.assert_array_equal(data['model{}/{}'.format(i, key)], model.trace[key])
+
+
+def test_arrow_round_trips_the_traces(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    models = make_models()
+    filename = str(tmp_path / 'models.parquet')
+    export_models(models, filename)
+
+    table = pq.read_table(filename)
+    model_index = table.column('model').to_numpy()
+    for i, model in enumerate(models):
+        np.testing.assert_array_equal(table.column('pos').to_numpy()[model_index == i], model.trace['pos'])
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        export_models(make_models(), str(tmp_path / 'models.txt'))
@@ -0,0 +1,15 @@
+import numpy as np
+
+from tests._models import make_drivetrain, run
+
+
+def test_iter_steps_yields_the_calc_trace_lazily():
+    model = run(make_drivetrain(simulation_time=0.5))
+    expected = np.column_stack([model.trace[key] for key in model.get_channels()])
+
+    steps = model.iter_steps()
+    np.testing.assert_array_equal(np.array(list(steps)), expected)
+    for i, values in enumerate(model.iter_steps()):  # restarts, and stops wherever the caller does
+        if i == 10:
+            break
+    assert values == tuple(expected[10]) and model._time == expected[10][0]
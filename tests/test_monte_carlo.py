@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from model import MovingAverageCurrentFilter
+from monte_carlo import MonteCarloAnalysis
+from tests._models import make_drivetrain, run
+
+
+def _make_model(**kwargs):
+    params = dict(max_dist=3, simulation_time=2, current_limit_filter=MovingAverageCurrentFilter())
+    params.update(kwargs)
+    return make_drivetrain(**params)
+
+
+def _make_analysis(seed=1):
+    return MonteCarloAnalysis(_make_model(motor_current_limit=40),
+                              {'battery_voltage': ('uniform', 11.5, 12.8), 'resistance_com': ('normal', 0.013, 0.002)},
+                              num_samples=20, seed=seed).run()
+
+
+def test_lanes_match_scalar_runs_with_the_sampled_parameters():
+    analysis = _make_analysis()
+    for i in range(3):
+        model = run(_make_model(motor_current_limit=40, max_dist=None,
+                                battery_voltage=analysis.samples['battery_voltage'][i],
+                                resistance_com=analysis.samples['resistance_com'][i]))
+        assert model.controller.calc_voltage(0) == analysis.samples['battery_voltage'][i]
+        assert analysis.time_to_distance[i, 0] == pytest.approx(model.query().time_at(pos=3), rel=1e-9)
+
+
+def test_bands_and_summary():
+    analysis = _make_analysis()
+    assert analysis.bands['pos'].shape == (5, len(analysis.times))
+    assert np.all(np.diff(analysis.bands['vel'], axis=0) >= 0)  # percentiles in order
+    assert analysis.get_band('pos', 50)[-1] == pytest.approx(np.median(analysis.bands['pos'][:, -1]))
+    summary = analysis.summary()[3.0]
+    assert summary['reached'] == 1
+    assert summary['p50'] == pytest.approx(np.percentile(analysis.time_to_distance[:, 0], 50))
+    assert summary['p5'] < summary['p50'] < summary['p95']
+    assert summary['mean'] == pytest.approx(analysis.time_to_distance[:, 0].mean())
+
+
+def test_seed_repeats_the_samples():
+    np.testing.assert_array_equal(_make_analysis(seed=3).time_to_distance, _make_analysis(seed=3).time_to_distance)
+    with pytest.raises(ValueError):
+        MonteCarloAnalysis(_make_model(), {'robot_colour': ('uniform', 0, 1)})
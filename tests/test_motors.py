@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pytest
+
+from model.motors import CIM, MOTOR_LOOKUP, MOTOR_REGISTRY, Motor, MotorRegistry
+
+FALCON = dict(max_voltage=12, free_rpm=6380, stall_torque=4.69 * 141.6, stall_current=257, free_current=1.5)
+
+
+def test_registered_constants_match_motor_instances():
+    keys = list(MOTOR_REGISTRY)
+    constants = MOTOR_REGISTRY.get_constants(MOTOR_REGISTRY.get_ids(keys), num_motors=np.arange(1, len(keys) + 1))
+    for i, key in enumerate(keys):
+        motor = MOTOR_REGISTRY[key](i + 1)
+        assert constants['k_r'][i] == motor.k_r
+        assert constants['k_v'][i] == motor.k_v
+        assert constants['k_t'][i] == pytest.approx(motor.k_t, rel=1e-15)
+    assert MOTOR_LOOKUP['cim'] is CIM
+    assert MOTOR_REGISTRY.get_ids(['minicim', 0]).tolist() == [MOTOR_REGISTRY.get_id('minicim'), 0]
+
+
+def test_register_builds_a_motor_class_from_a_spec():
+    registry = MotorRegistry()
+    registry.register('cim', CIM)
+    falcon = registry.register('falcon', name='Falcon500', **FALCON)
+    assert issubclass(falcon, Motor) and falcon.__name__ == 'Falcon500'
+    assert falcon(2).k_t == pytest.approx(2 * FALCON['stall_torque'] / FALCON['stall_current'])
+    assert registry.get_id('falcon') == 1 and registry.names == ['CIM', 'Falcon500']
+    assert registry.k_r[1] == falcon.k_r
+
+    registry.register('cim', name='CIM2', **FALCON)  # re-registering keeps the ID
+    assert registry.get_id('cim') == 0 and registry.k_r[0] == falcon.k_r
+    with pytest.raises(ValueError):
+        registry.register('broken', max_voltage=12)
+
+
+@pytest.mark.parametrize('extension', ['json', 'csv'])
+def test_load_registers_every_motor(tmp_path, extension):
+    filename = str(tmp_path / 'motors.{}'.format(extension))
+    with open(filename, 'w') as file:
+        if extension == 'json':
+            json.dump({'falcon': FALCON, 'neo': dict(FALCON, free_rpm=5676)}, file)
+        else:
+            file.write('key,name,' + ','.join(MotorRegistry.FIELDS) + '\n')
+            for key, spec in (('falcon', FALCON), ('neo', dict(FALCON, free_rpm=5676))):
+                file.write('{},{},'.format(key, key.title()) + ','.join(str(spec[f]) for f in MotorRegistry.FIELDS) +
+                           '\n')
+    registry = MotorRegistry()
+    assert registry.load(filename) == ['falcon', 'neo']
+    np.testing.assert_array_equal(registry.free_rpm, [6380, 5676])
@@ -0,0 +1,36 @@
+import numpy as np
+
+from model import EmaCurrentFilter
+from optimizer import Optimizer
+from tests._models import make_drivetrain, run
+
+
+def _make_optimizer(**kwargs):
+    model = make_drivetrain(simulation_time=3, motor_current_limit=40, current_limit_filter=EmaCurrentFilter(),
+                            integrator='rk23', **kwargs)
+    return Optimizer(model, min_ratio=6, max_ratio=10, ratio_step=1, max_dist=3, distance_step=0.5, max_time=3,
+                     time_step=0.01)
+
+
+def test_workers_match_a_single_process():
+    # Workers simulate on pickled copies, which keep the filter and integrator to_json() leaves out
+    single = _make_optimizer()
+    single.run()
+    pooled = _make_optimizer()
+    pooled.run(workers=2, chunksize=2)
+    assert len(pooled.time_to_dist_data) == len(pooled.ratios)
+    np.testing.assert_array_equal(pooled.time_to_dist_data, single.time_to_dist_data)
+    np.testing.assert_array_equal(pooled.distance_at_time, single.distance_at_time)
+
+
+def test_time_to_distance_is_interpolated_from_the_trace():
+    model = make_drivetrain(simulation_time=1.5)
+    optimizer = Optimizer(model, min_ratio=8, max_ratio=8, max_dist=6, distance_step=0.5, max_time=1, time_step=0.01)
+    optimizer.run()
+    assert len(optimizer.ratios) == 2  # the grid runs one step past max_ratio
+    distances = np.array(optimizer.distance_steps) * optimizer.distance_step
+    run(model)  # left at the last ratio
+    expected = np.nan_to_num(model.query().time_at(pos=distances))  # distances never reached are 0
+    np.testing.assert_allclose(optimizer.time_to_dist_data[-1], expected, rtol=1e-12)
+    assert expected[-1] == 0 and expected[1] > 0
+    np.testing.assert_allclose(optimizer.distance_at_time[-1], model.query().value_at(optimizer.times, 'pos'))
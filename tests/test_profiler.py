@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from model import CurrentLimitFilter, EmaCurrentFilter, SimulationProfiler
+from tests._models import make_drivetrain, run
+
+KEYS = ('time', 'pos', 'vel', 'current')
+
+
+class TrialCopyFilter(EmaCurrentFilter):
+    is_over_limit_after = CurrentLimitFilter.is_over_limit_after  # adds the sample to a deepcopy
+
+
+@pytest.mark.parametrize('integrator', ['heun', 'rk23'])
+def test_profiling_leaves_the_run_unchanged(integrator):
+    reference = run(make_drivetrain(motor_current_limit=30, integrator=integrator,
+                                    current_limit_filter=TrialCopyFilter()))
+    model = run(make_drivetrain(motor_current_limit=30, integrator=integrator, current_limit_filter=TrialCopyFilter(),
+                                profiler=SimulationProfiler()))
+    for key in KEYS:
+        np.testing.assert_array_equal(model.trace[key], reference.trace[key])
+
+    stats = model.get_profile()
+    assert stats['steps'] == len(model.trace['time']) - 1
+    assert stats['phases']['current_history']['calls'] == stats['steps']
+    assert stats['events']['current_limit_activations'] >= 1
+
+
+def test_profiled_methods_are_restored_after_calc():
+    model = run(make_drivetrain(motor_current_limit=30, profiler=SimulationProfiler()))
+    for attribute in SimulationProfiler.PHASES.values():
+        assert attribute not in model.__dict__
+        assert attribute not in model.current_limit_filter.__dict__
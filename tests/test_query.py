@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from model._trace import Trace
+
+
+def make_trace():
+    trace = Trace(('time', 'pos', 'current', 'brownout'))
+    times = np.linspace(0, 2, 201)
+    trace.extend(np.column_stack((times, times ** 2, np.sin(np.pi * times), np.sin(np.pi * times) < 0)))
+    return trace
+
+
+def test_time_at_interpolates_first_reach():
+    query = make_trace().query()
+    assert query.time_at(pos=1) == pytest.approx(1, abs=1e-4)
+    np.testing.assert_allclose(query.time_at(pos=[0.25, 2.25]), [0.5, 1.5], atol=1e-4)
+    assert np.isnan(query.time_at(pos=5))
+    assert query.time_at(current=-1) == pytest.approx(1.5, abs=1e-3)  # below the first sample, reached falling
+    with pytest.raises(TypeError):
+        query.time_at(pos=1, current=0)
+
+
+def test_value_at_interpolates_every_channel():
+    query = make_trace().query()
+    assert query.value_at(1.005, 'pos') == pytest.approx((1 + 1.01 ** 2) / 2)
+    values = query.value_at(0.5)
+    assert values['time'] == pytest.approx(0.5)
+    assert values['current'] == pytest.approx(1)
+    assert np.isnan(query.value_at(3, 'pos'))
+
+
+def test_statistics():
+    query = make_trace().query()
+    assert query.peak('current') == pytest.approx(1)
+    assert query.trough('current') == pytest.approx(-1)
+    assert query.time_of_peak('current') == pytest.approx(0.5)
+    assert query.integral('pos') == pytest.approx(8 / 3, rel=1e-4)
+    assert query.integral('pos', 1) == pytest.approx(1 / 3, rel=1e-3)
+    assert query.mean('current') == pytest.approx(0, abs=1e-9)
+    assert query.summary('pos')['final'] == 4
+
+
+def test_crossings():
+    query = make_trace().query()
+    np.testing.assert_allclose(query.crossings('current', 0.5), [1 / 6, 5 / 6], atol=1e-3)
+    np.testing.assert_allclose(query.crossings('current', 0.5, 'falling'), [5 / 6], atol=1e-3)
+    assert query.first_crossing('brownout', 0.5) == pytest.approx(1.005)
+    assert np.isnan(query.first_crossing('pos', 10))
+    with pytest.raises(ValueError):
+        query.crossings('current', 0, 'up')
+
+
+def test_query_is_reused_until_the_trace_changes():
+    trace = make_trace()
+    query = trace.query()
+    assert trace.query() is query
+    trace.append([2.01, 5, 0, 0])
+    assert trace.query() is not query
+    assert trace.query().peak('pos') == 5
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from model import DecimatingRecorder, FinalStateRecorder, FixedIntervalRecorder
+from tests._models import make_drivetrain, max_difference, run
+
+
+@pytest.mark.parametrize('integrator', ['heun', 'rk23'])
+def test_fixed_interval_times_stay_on_the_grid(integrator):
+    reference = run(make_drivetrain(simulation_time=3, integrator=integrator))
+    model = run(make_drivetrain(simulation_time=3, integrator=integrator, recorder=FixedIntervalRecorder(0.01)))
+    time = model.trace['time']
+    np.testing.assert_allclose(time[:301], np.arange(301) * 0.01, atol=1e-9)
+    assert np.diff(time).min() > 1e-6  # the final state isn't written again
+    assert time[-1] == reference.trace['time'][-1]  # Heun's last step ends past simulation_time, rk23's on it
+    assert len(time) == (301 if integrator == 'rk23' else 302)
+
+
+@pytest.mark.parametrize('integrator', ['heun', 'rk23'])
+def test_fixed_interval_keeps_the_final_state_off_the_grid(integrator):
+    reference = run(make_drivetrain(max_dist=1, integrator=integrator))
+    model = run(make_drivetrain(max_dist=1, integrator=integrator, recorder=FixedIntervalRecorder(0.1)))
+    assert model.trace['time'][-1] % 0.1 > 1e-6
+    assert model.trace['pos'][-1] == reference.trace['pos'][-1]
+
+
+def test_fixed_interval_interpolates_the_full_trace():
+    reference = run(make_drivetrain(motor_current_limit=30))
+    model = run(make_drivetrain(motor_current_limit=30, recorder=FixedIntervalRecorder(0.0125)))
+    assert max_difference(reference, model, 'pos') < 1e-6
+    assert max_difference(reference, model, 'vel') < 1e-4
+
+
+def test_decimating_keeps_every_nth_step_and_the_end():
+    reference = run(make_drivetrain(simulation_time=0.1055))
+    model = run(make_drivetrain(simulation_time=0.1055, recorder=DecimatingRecorder(10)))
+    np.testing.assert_array_equal(model.trace['time'][:-1], reference.trace['time'][:-1:10])
+    assert model.trace['time'][-1] == reference.trace['time'][-1]
+
+
+def test_final_state_records_one_row():
+    reference = run(make_drivetrain())
+    model = run(make_drivetrain(recorder=FinalStateRecorder()))
+    assert len(model.trace) == 1
+    np.testing.assert_array_equal(model.trace['pos'], reference.trace['pos'][-1:])
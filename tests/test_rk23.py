@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from controllers.pidf import PidfController
+from model import ArmModel, ElevatorModel, EmaCurrentFilter, MovingAverageCurrentFilter, ShiftingDrivetrainModel, \
+    ShooterSpinupModel
+from model.motors import CIM, _775pro
+from tests._models import make_drivetrain, max_difference, run
+
+
+@pytest.mark.parametrize('current_limit', [None, 30])
+def test_rk23_matches_small_step_heun(current_limit):
+    # Heun converges on rk23's solution as its step shrinks, 1e-4 m and m/s apart at a 10 us step
+    reference = run(make_drivetrain(motor_current_limit=current_limit, time_step=1e-5))
+    model = run(make_drivetrain(motor_current_limit=current_limit, integrator='rk23'))
+    assert model.integration_stats['steps'] < 200
+    assert max_difference(reference, model, 'pos') < 1e-4
+    assert max_difference(reference, model, 'vel') < 1e-4
+
+
+def test_rk23_ends_on_simulation_time():
+    model = run(make_drivetrain(integrator='rk23'))
+    assert model.trace['time'][-1] == pytest.approx(model.simulation_time, abs=model.EVENT_TOLERANCE)
+    assert np.all(np.diff(model.trace['time']) > 0)
+
+
+def test_rk23_locates_the_shift():
+    model = run(ShiftingDrivetrainModel(CIM(4), low_gear_ratio=15, high_gear_ratio=7, shift_velocity=2,
+                                        wheel_diameter=0.15, robot_mass=60, max_dist=10, simulation_time=5,
+                                        integrator='rk23', auto_calc=False))
+    assert model.integration_stats['events'] >= 1
+    assert np.abs(model.trace['vel'] - model.shift_velocity).min() < 1e-6  # a step ends on the shift
+
+
+def test_rk23_rejects_step_count_filters():
+    model = make_drivetrain(motor_current_limit=30, current_limit_filter=MovingAverageCurrentFilter(),
+                            integrator='rk23')
+    with pytest.raises(ValueError):
+        model.calc()
+
+
+def _make_arm(**kwargs):
+    return ArmModel(_775pro(2), gear_ratio=200, arm_cg_distance=0.5, arm_mass=5, motor_current_limit=20,
+                    max_dist=1.5, simulation_time=2, auto_calc=False, **kwargs)
+
+
+def _make_shooter(**kwargs):
+    return ShooterSpinupModel(CIM(2), gear_ratio=1, wheel_diameter=0.1, wheel_inertia=0.002, motor_current_limit=40,
+                              max_dist=None, simulation_time=1, auto_calc=False, **kwargs)
+
+
+@pytest.mark.parametrize('make_model', [_make_arm, _make_shooter])
+def test_rk23_runs_models_that_clamp_the_current_directly(make_model):
+    # Neither model reads current_limit_filter, so the default step-count filter doesn't stop rk23
+    reference = run(make_model(time_step=1e-5))
+    model = run(make_model(integrator='rk23'))
+    scale = np.abs(reference.trace['vel']).max()
+    assert max_difference(reference, model, 'pos') < 1e-3 * scale
+    assert max_difference(reference, model, 'vel') < 1e-3 * scale
+
+
+def _make_elevator(integrator):
+    controller = PidfController()
+    controller.set_deadband(0.01)
+    controller.set_gains(k_p=12, k_i=0.1)
+    controller.set_goal(1)
+    return ElevatorModel(motors=_775pro(4), gear_ratio=16, payload_mass=10, pulley_diameter=2 * 0.0254, max_dist=2,
+                         motor_current_limit=30, motor_voltage_limit=12, simulation_time=2, controller=controller,
+                         current_limit_filter=EmaCurrentFilter(), integrator=integrator, auto_calc=False)
+
+
+def test_rk23_samples_closed_loop_controllers_like_heun():
+    # The controller's integral counts calls, so it has to run on Heun's time_step grid to follow the same path
+    reference = run(_make_elevator('heun'))
+    model = run(_make_elevator('rk23'))
+    assert max_difference(reference, model, 'pos') < 1e-2
+    assert model.trace['pos'][-1] == pytest.approx(reference.trace['pos'][-1], abs=1e-3)
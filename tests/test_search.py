@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from model import DrivetrainModel
+from model.motors import CIM
+from optimizer import Optimizer
+from search import brent_minimize, nelder_mead
+from sweep import ParameterSweep
+from tests._models import make_drivetrain
+
+
+def test_brent_finds_a_bounded_minimum():
+    x, value, evals = brent_minimize(lambda x: (x - 2.3) ** 2 + 1, 0, 5, tolerance=1e-4)
+    assert x == pytest.approx(2.3, abs=1e-4)
+    assert value == pytest.approx(1)
+    assert evals < 20
+    x, _, _ = brent_minimize(lambda x: x, 1, 2, tolerance=1e-4)  # minimum on the bound
+    assert x == pytest.approx(1, abs=1e-3)
+
+
+def test_nelder_mead_stays_within_bounds():
+    def f(x):
+        return (x[0] - 1) ** 2 + 10 * (x[1] + 2) ** 2
+
+    x, value, evals = nelder_mead(f, [0, 0], [1, 1], tolerance=1e-6)
+    np.testing.assert_allclose(x, [1, -2], atol=1e-4)
+    assert evals <= 200
+    x, _, _ = nelder_mead(f, [0, 0], [1, 1], bounds=[(-5, 5), (-1, 1)], tolerance=1e-6)
+    np.testing.assert_allclose(x, [1, -1], atol=1e-4)
+
+
+def _make_optimizer(**kwargs):
+    return Optimizer(make_drivetrain(simulation_time=5), min_ratio=4, max_ratio=16, max_dist=3, **kwargs)
+
+
+def test_optimizer_search_matches_a_fine_grid():
+    grid = _make_optimizer(ratio_step=0.05, distance_step=3)
+    grid.run()
+    times = [row[-1] for row in grid.time_to_dist_data]
+    best = int(np.argmin(times))
+
+    optimizer = _make_optimizer()
+    ratio, time = optimizer.search(target_distance=3)
+    assert ratio == pytest.approx(grid.ratios[best], abs=0.1)
+    assert time <= times[best] + 1e-6
+    assert optimizer.num_simulations < 20
+    assert len(optimizer.ratios) == len(optimizer.time_to_dist_data) == len(optimizer.distance_at_time)
+    assert optimizer.ratios == sorted(optimizer.ratios)
+    assert optimizer.model.max_dist == 3
+
+
+def test_optimizer_search_needs_one_target():
+    with pytest.raises(ValueError):
+        _make_optimizer().search()
+    with pytest.raises(ValueError):
+        _make_optimizer().search(target_distance=3, target_time=1)
+    with pytest.raises(ValueError):
+        _make_optimizer().search(target_time=10)  # past simulation_time
+
+
+def test_sweep_search_rounds_integer_axes():
+    sweep = ParameterSweep(DrivetrainModel, {'gear_ratio': [4, 16]}, motors=CIM(4), wheel_diameter=0.15,
+                           robot_mass=60, max_dist=3, simulation_time=5)
+    params, time = sweep.search()
+    assert params == {'gear_ratio': 9}
+    model = DrivetrainModel(CIM(4), 9, 0.15, 60, max_dist=3, simulation_time=5, auto_calc=False)
+    model.calc()
+    assert time == pytest.approx(model.query().time_at(pos=3), rel=1e-6)
+    with pytest.raises(ValueError):
+        ParameterSweep(DrivetrainModel, {'motor_type': ['cim', 'minicim']}, max_dist=3).search()
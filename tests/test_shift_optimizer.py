@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from model import ShiftingDrivetrainModel
+from model.motors import CIM
+from shift_optimizer import ShiftOptimizer
+from tests._models import run
+
+LOW, HIGH, SHIFT = [12, 15, 18], [6, 8, 13], [1.5, 2.5, 8]
+DISTANCES, WEIGHTS = [3, 8], [2, 1]
+
+
+def _make_model(**kwargs):
+    params = dict(low_gear_ratio=15, high_gear_ratio=7, shift_velocity=2, wheel_diameter=0.15, robot_mass=60,
+                  max_dist=None, simulation_time=5, auto_calc=False)
+    params.update(kwargs)
+    return ShiftingDrivetrainModel(CIM(4), **params)
+
+
+def _make_optimizer():
+    return ShiftOptimizer(_make_model(), LOW, HIGH, SHIFT, DISTANCES, weights=WEIGHTS)
+
+
+def _direct_cost(low, high, shift):
+    model = run(_make_model(low_gear_ratio=low, high_gear_ratio=high, shift_velocity=shift, max_dist=max(DISTANCES)))
+    return float(np.dot(WEIGHTS, model.query().time_at(pos=DISTANCES)))
+
+
+def test_best_point_matches_a_brute_force_search():
+    costs = {(low, high, shift): _direct_cost(low, high, shift)
+             for low in LOW for high in HIGH for shift in SHIFT if high < low}
+    best = min(costs, key=costs.get)
+
+    optimizer = _make_optimizer()
+    low, high, shift, cost = optimizer.run()
+    assert (low, high, shift) == best
+    assert cost == pytest.approx(costs[best], rel=1e-9)
+    assert optimizer.num_simulations < len(costs)  # shared and pruned runs
+    ranked = optimizer.get_ranked()
+    assert [row['cost'] for row in ranked] == sorted(row['cost'] for row in ranked)
+    assert np.isnan(optimizer.costs[0, 2]).all()  # high gear 13 isn't taller than low gear 12
+    assert optimizer.model.low_gear_ratio == 15 and optimizer.model.max_dist is None
+
+
+def test_coarse_pass_and_workers_find_the_same_point():
+    best = _make_optimizer().run()
+    assert _make_optimizer().run(coarse=2, keep=3) == best
+    assert _make_optimizer().run(workers=2) == best
+
+
+def test_one_weight_per_distance():
+    with pytest.raises(ValueError):
+        ShiftOptimizer(_make_model(), LOW, HIGH, SHIFT, DISTANCES, weights=[1])
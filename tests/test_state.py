@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from controllers.pidf import PidfController
+from tests._models import make_drivetrain, run
+
+KEYS = ('time', 'pos', 'vel', 'current')
+
+
+@pytest.mark.parametrize('integrator', ['heun', 'rk23'])
+def test_snapshot_restore_advance_match_a_straight_run(integrator):
+    reference = run(make_drivetrain(motor_current_limit=30, integrator=integrator))
+    model = make_drivetrain(motor_current_limit=30, integrator=integrator)
+    model.init_sim_vars()
+    model.start()
+    assert model.advance(until=0.3) is False
+    state = model.snapshot()
+    assert model.advance(until=0.8) is False
+    assert model.advance() is True
+    for key in KEYS:
+        np.testing.assert_array_equal(model.trace[key], reference.trace[key])
+
+    model.restore(state)
+    assert model.advance() is True
+    for key in KEYS:
+        np.testing.assert_array_equal(model.trace[key], reference.trace[key])
+
+
+def test_branches_from_one_snapshot_repeat():
+    controller = PidfController()
+    controller.set_gains(k_p=20, k_d=1)
+    controller.set_goal(0.5)
+    model = make_drivetrain(controller=controller)
+    model.init_sim_vars()
+    model.start()
+    model.advance(until=0.4)
+    state = model.snapshot()
+    length = len(model.trace)
+
+    model.controller.set_goal(1)
+    model.advance()
+    branch = model.trace['pos'].copy()
+    model.restore(state)
+    assert len(model.trace) == length
+    model.controller.set_goal(1)
+    model.advance()
+    np.testing.assert_array_equal(model.trace['pos'], branch)
+
+    model.restore(state)  # the snapshot kept the original goal
+    model.advance()
+    assert model.trace['pos'][-1] < branch[-1]
+
+
+def test_snapshots_are_immutable():
+    model = make_drivetrain()
+    model.init_sim_vars()
+    model.start()
+    state = model.snapshot()
+    with pytest.raises(AttributeError):
+        state.trace_length = 0
+    with pytest.raises(TypeError):
+        state.attributes['_time'] = 1.0
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from model import DrivetrainModel
+from model.motors import CIM, MiniCIM
+from sweep import ParameterSweep
+
+FIXED = dict(motors=CIM(4), wheel_diameter=0.15, robot_mass=60, max_dist=3, simulation_time=5)
+
+
+def _make_sweep(**kwargs):
+    return ParameterSweep(DrivetrainModel, {'gear_ratio': [6, 8, 10], 'num_motors': [2, 4]},
+                          metrics=('time_to_dist', 'final_pos'), **dict(FIXED, **kwargs))
+
+
+def test_points_match_direct_runs():
+    sweep = _make_sweep()
+    sweep.run()
+    assert sweep.results['time_to_dist'].shape == (3, 2)
+    model = DrivetrainModel(**dict(FIXED, motors=CIM(2), gear_ratio=8, auto_calc=False))
+    model.calc()
+    assert sweep.results['time_to_dist'][1, 0] == pytest.approx(model.query().time_at(pos=3), rel=1e-6)
+    assert sweep.results['final_pos'][1, 0] == pytest.approx(model.trace['pos'][-1], rel=1e-6)
+
+
+def test_points_are_quiet(capsys):  # drivetrain constructors print traction info
+    _make_sweep().run()
+    assert capsys.readouterr().out == ""
+
+
+def test_motor_type_axis():
+    sweep = ParameterSweep(DrivetrainModel, {'motor_type': ['cim', 'minicim'], 'gear_ratio': [8]}, **FIXED)
+    sweep.run()
+    model = DrivetrainModel(**dict(FIXED, motors=MiniCIM(4), gear_ratio=8, auto_calc=False))
+    model.calc()
+    assert sweep.results['time_to_dist'][1, 0] == pytest.approx(model.query().time_at(pos=3), rel=1e-6)
+
+
+def test_workers_match_a_single_process():
+    single = _make_sweep()
+    single.run()
+    pooled = _make_sweep()
+    pooled.run(workers=2)
+    for metric in single.metrics:
+        np.testing.assert_array_equal(pooled.results[metric], single.results[metric])
+
+
+def test_best_picks_the_fastest_point():
+    sweep = _make_sweep()
+    sweep.run()
+    params, value = sweep.best()
+    assert value == np.nanmin(sweep.results['time_to_dist'])
+    assert sweep.get_params((sweep.axes['gear_ratio'].index(params['gear_ratio']),
+                             sweep.axes['num_motors'].index(params['num_motors'])))['gear_ratio'] == \
+        params['gear_ratio']
+
+
+def test_unknown_metrics_are_rejected():
+    with pytest.raises(ValueError):
+        ParameterSweep(DrivetrainModel, {'gear_ratio': [8]}, metrics=('speed',), **FIXED)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from controllers.pidf import PidfController
+from model import ControllerDoneTermination, PredicateTermination, SteadyStateTermination
+from tests._models import make_drivetrain, run
+
+
+def _make_pidf(goal=1):
+    controller = PidfController()
+    controller.set_deadband(0.01)
+    controller.set_gains(k_p=20, k_d=1)
+    controller.set_goal(goal)
+    return controller
+
+
+@pytest.mark.parametrize('analytic', [False, True])
+def test_steady_state_ends_the_run(analytic):
+    reference = run(make_drivetrain(simulation_time=5))
+    model = run(make_drivetrain(simulation_time=5, analytic=analytic, termination=SteadyStateTermination()))
+    assert model.terminated_by is model.termination[0]
+    assert model.trace['time'][-1] < 5
+    assert abs(model.trace['accel'][-1]) < 0.01
+    np.testing.assert_array_equal(model.trace['pos'], reference.trace['pos'][:len(model.trace)])
+
+
+def test_steady_state_extrapolation_reaches_simulation_time():
+    reference = run(make_drivetrain(simulation_time=5))
+    model = run(make_drivetrain(simulation_time=5, termination=SteadyStateTermination(extrapolate=True)))
+    assert model.integration_stats['extrapolated'] > 0
+    assert len(model.trace) == len(reference.trace)
+    assert model.trace['pos'][-1] == pytest.approx(reference.trace['pos'][-1], rel=1e-3)
+
+
+def test_controller_done_waits_for_the_hold_time():
+    model = run(make_drivetrain(controller=_make_pidf(), simulation_time=5,
+                                termination=ControllerDoneTermination(hold_time=0.2)))
+    assert model.terminated_by is model.termination[0]
+    done = model.trace['done'][::-1]
+    held = np.argmin(done) if not done.all() else len(done)
+    assert (held - 1) * model.time_step >= 0.2 - 1e-9
+
+
+def test_controller_done_at_rest_holds_the_position():
+    model = run(make_drivetrain(controller=_make_pidf(), simulation_time=5,
+                                termination=ControllerDoneTermination(velocity_tolerance=0.01, extrapolate=True)))
+    assert model.terminated_by is not None and model.terminated_by.at_rest
+    tail = model.trace['pos'][-model.integration_stats['extrapolated']:]
+    assert np.all(tail == tail[0])
+    assert model.trace['vel'][-1] == 0
+
+
+def test_predicate_ends_the_run():
+    model = run(make_drivetrain(termination=PredicateTermination(lambda model: model._position > 0.5)))
+    assert model.trace['pos'][-1] > 0.5
+    assert model.trace['pos'][-2] <= 0.5
+
+
+def test_criteria_reset_between_runs():
+    model = make_drivetrain(simulation_time=5, termination=SteadyStateTermination())
+    model.calc()
+    first = model.trace['time'].copy()
+    model.init_sim_vars()
+    model.calc()
+    np.testing.assert_array_equal(model.trace['time'], first)
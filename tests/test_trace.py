@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from model._trace import Trace
+from tests._models import make_drivetrain, run
+
+
+def test_trace_grows_past_its_capacity():
+    trace = Trace(('time', 'pos'), capacity=2)
+    for i in range(5):
+        trace.append([i, i * 2])
+    trace.extend(np.array([[5, 10], [6, 12]]))
+    assert len(trace) == 7
+    np.testing.assert_array_equal(trace['pos'], np.arange(7) * 2)
+    assert trace['pos'].flags['C_CONTIGUOUS']  # each channel is one contiguous column
+    assert trace.final('time') == 6
+
+    trace.truncate(3)
+    assert len(trace) == 3 and trace.final('pos') == 4
+    trace.clear()
+    assert len(trace) == 0 and 'pos' in trace and 'vel' not in trace
+
+
+def test_rows_view_matches_the_columns():
+    model = run(make_drivetrain(simulation_time=0.2))
+    rows = model.get_data_points()
+    assert len(rows) == len(model.trace)
+    assert rows[-1] == model.trace.row(-1)
+    assert list(rows[-1]) == list(model.get_channels())
+    assert [row['pos'] for row in rows[10:13]] == model.trace['pos'][10:13].tolist()
+    with pytest.raises(IndexError):
+        rows[len(rows)]
+
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from model import ElevatorModel
+from model.motors import _775pro
+from tuner import PidfTuner
+
+
+def _make_elevator():
+    return ElevatorModel(motors=_775pro(4), gear_ratio=16, payload_mass=10, pulley_diameter=2 * 0.0254, max_dist=2,
+                         motor_voltage_limit=12, simulation_time=3, auto_calc=False)
+
+
+def _make_tuner():
+    return PidfTuner(_make_elevator(), 1, tune=('k_p', 'k_d', 'k_f'))
+
+
+def test_tuned_gains_settle_sooner_and_reproduce():
+    tuner = _make_tuner()
+    gains, cost = tuner.run(max_simulations=40)
+    assert tuner.num_simulations == len(tuner.results) <= 40
+    assert cost < tuner.results[0]['cost']  # the initial gains never settle
+    ranked = tuner.get_ranked()
+    assert ranked[0]['cost'] == cost and ranked[0]['settled']
+    assert all(result['cost'] > cost for result in ranked if result['pruned'])
+
+    model = _make_elevator()
+    model.controller = tuner.make_controller(gains)
+    model.calc()
+    time, done = model.trace['time'], model.trace['done']
+    settle = int(np.argmax(time >= cost - 1e-9))
+    assert time[settle] == pytest.approx(cost)
+    held = time < cost + tuner.hold_time - 1e-9
+    assert done[settle:][held[settle:]].all() and not done[settle - 1]
+
+
+def test_workers_find_the_same_gains():
+    single = _make_tuner()
+    pooled = _make_tuner()
+    assert pooled.run(workers=2, max_simulations=40) == single.run(max_simulations=40)
+
+
+def test_unknown_costs_and_gains_are_rejected():
+    with pytest.raises(ValueError):
+        PidfTuner(_make_elevator(), 1, cost='rise_time')
+    with pytest.raises(ValueError):
+        PidfTuner(_make_elevator(), 1, tune=('k_x',))
@@ -0,0 +1,57 @@
+import zipfile
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+import pytest
+
+from optimizer import Optimizer
+from tests._models import make_drivetrain
+from workbook import get_sheet_name
+
+pytest.importorskip('xlsxwriter')
+
+NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def read_sheets(filename):  # {sheet name: {cell reference: value}}, numbers as floats
+    with zipfile.ZipFile(filename) as archive:
+        names = [sheet.get('name') for sheet in
+                 ElementTree.fromstring(archive.read('xl/workbook.xml')).iterfind('s:sheets/s:sheet', NS)]
+        sheets = {}
+        for i, name in enumerate(names):
+            cells = {}
+            for cell in ElementTree.fromstring(archive.read('xl/worksheets/sheet{}.xml'.format(i + 1))).iter(
+                    '{{{}}}c'.format(NS['s'])):
+                value, text = cell.find('s:v', NS), cell.find('s:is/s:t', NS)
+                if text is not None:
+                    cells[cell.get('r')] = text.text
+                elif value is not None:
+                    cells[cell.get('r')] = value.text if cell.get('t') in ('str', 'e') else float(value.text)
+            sheets[name] = cells
+    return sheets
+
+
+def test_optimizer_grid_is_written_row_by_row(tmp_path):
+    model = make_drivetrain(simulation_time=3)
+    optimizer = Optimizer(model, min_ratio=6, max_ratio=8, ratio_step=1, max_dist=2, distance_step=0.5, max_time=3)
+    optimizer.run()
+    filename = str(tmp_path / 'optimizer.xlsx')
+    optimizer.save_xlsx(filename)
+
+    sheets = read_sheets(filename)
+    assert list(sheets) == ['Time to Distance', 'Parameters']
+    grid = sheets['Time to Distance']
+    for i, (ratio, row) in enumerate(zip(optimizer.ratios, optimizer.time_to_dist_data)):
+        assert grid['A{}'.format(i + 3)] == ratio
+        columns = [chr(ord('B') + j) for j in range(len(row))]
+        np.testing.assert_allclose([grid['{}{}'.format(c, i + 3)] for c in columns], row)
+    parameters = sheets['Parameters']
+    values = {parameters['A{}'.format(row)]: parameters.get('B{}'.format(row))
+              for row in range(1, 100) if 'A{}'.format(row) in parameters}
+    assert values['ratios'] == len(optimizer.ratios)
+    assert values['max_dist'] == 2
+
+
+def test_sheet_names_are_made_valid():
+    assert get_sheet_name('time [s]: a/b') == 'time _s__ a_b'
+    assert len(get_sheet_name('x' * 40)) == 31
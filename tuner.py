@@ -0,0 +1,177 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+
+import numpy as np
+
+from controllers import PidfController
+
+_worker_tuner = None
+
+
+def _init_worker(tuner):
+    global _worker_tuner
+    _worker_tuner = tuner
+
+
+def _evaluate_worker_gains(args):
+    gains, cutoff = args
+    return _worker_tuner._evaluate(_worker_tuner.model, gains, cutoff)
+
+
+class PidfTuner:
+    # Pattern search over PidfController gains for a model (ElevatorModel, ArmModel, ...) driven to one goal.
+    # Every round tries each tuned gain one step up and down from the best gains so far, in parallel, and
+    # halves the steps when none of them is better. Each run stops once the controller has been done for
+    # hold_time, or as soon as its cost is already worse than the best run when the round started.
+    GAINS = ('k_p', 'k_i', 'k_d', 'k_f')
+    COSTS = ('settle_time', 'overshoot', 'integrated_error', 'peak_current')  # all only grow as a run goes on
+
+    def __init__(self, model, goal,
+                 deadband=None,  # controller deadband, defaults to 1% of the move
+                 cost='settle_time',  # one of COSTS, or {cost: weight} for a weighted sum
+                 tune=GAINS,  # gains that are searched, the rest stay at their initial value
+                 initial_gains=None,  # {gain: value}, k_p defaults to full voltage at the start position
+                 steps=None,  # {gain: first step size}
+                 hold_time=0.1,  # s the controller has to stay done for the run to count as settled
+                 min_i_error=0.1,
+                 reset_i_on_overshoot=False):
+        self.model = model
+        self.goal = goal
+        distance = abs(goal - model.initial_position) or 1
+        self.deadband = deadband if deadband is not None else distance * 0.01
+        self.cost_weights = OrderedDict([(cost, 1)] if isinstance(cost, str) else cost)
+        unknown = set(self.cost_weights) - set(self.COSTS)
+        if unknown:
+            raise ValueError("Unknown costs: {}".format(", ".join(sorted(unknown))))
+        unknown = set(tune) - set(self.GAINS)
+        if unknown:
+            raise ValueError("Unknown gains: {}".format(", ".join(sorted(unknown))))
+        self.tune = tuple(gain for gain in self.GAINS if gain in tune)
+        self.hold_time = hold_time
+        self.min_i_error = min_i_error
+        self.reset_i_on_overshoot = reset_i_on_overshoot
+
+        k_p = model.motor_voltage_limit or model.battery_voltage
+        k_p /= distance
+        self.initial_gains = OrderedDict([('k_p', k_p), ('k_i', 0), ('k_d', 0), ('k_f', 0)])
+        self.initial_gains.update(initial_gains or {})
+        self.steps = OrderedDict([('k_p', k_p / 2), ('k_i', k_p / 100), ('k_d', k_p * 10), ('k_f', k_p / 4)])
+        self.steps.update(steps or {})
+
+        self.results = []  # one dict per simulated candidate, in evaluation order
+        self.num_simulations = 0
+
+    def make_controller(self, gains):
+        controller = PidfController()
+        controller.set_deadband(self.deadband)
+        controller.set_gains(min_i_error=self.min_i_error, reset_i_on_overshoot=self.reset_i_on_overshoot, **gains)
+        controller.set_goal(self.goal)
+        return controller
+
+    def _evaluate(self, model, gains, cutoff=np.inf):
+        # Simulates one set of gains, returning a result row. pruned is set if the run was abandoned because its
+        # cost passed cutoff, cost is then only a lower bound.
+        model.controller = self.make_controller(gains)
+        channels = model.get_channels()
+        i_time, i_pos, i_current = channels.index('time'), channels.index('pos'), channels.index('current')
+        i_error, i_done = channels.index('error'), channels.index('done')
+        direction = 1 if self.goal >= model.initial_position else -1
+
+        metrics = OrderedDict((cost, 0.0) for cost in self.COSTS)
+        done_since = None
+        last_time = None
+        settled = pruned = False
+        for values in model.iter_steps():
+            time = values[i_time]
+            if last_time is not None:
+                metrics['integrated_error'] += abs(values[i_error]) * (time - last_time)
+            last_time = time
+            metrics['overshoot'] = max(metrics['overshoot'], direction * (values[i_pos] - self.goal))
+            metrics['peak_current'] = max(metrics['peak_current'], abs(values[i_current]))
+            if values[i_done]:
+                if done_since is None:
+                    done_since = time
+            else:
+                done_since = None
+            metrics['settle_time'] = done_since if done_since is not None else time
+
+            cost = sum(weight * metrics[key] for key, weight in self.cost_weights.items())
+            if done_since is not None and time - done_since >= self.hold_time:
+                settled = True
+                break
+            if cost > cutoff:
+                pruned = True
+                break
+
+        result = OrderedDict(gains)
+        result['cost'] = cost
+        result.update(metrics)
+        result['settled'] = settled
+        result['pruned'] = pruned
+        return result
+
+    def _evaluate_round(self, candidates, cutoff, executor):
+        if executor is None:
+            results = []
+            for gains in candidates:  # sequential runs can prune against improvements made within the round
+                results.append(self._evaluate(self.model, gains, cutoff))
+                if not results[-1]['pruned']:
+                    cutoff = min(cutoff, results[-1]['cost'])
+        else:
+            results = list(executor.map(_evaluate_worker_gains, [(gains, cutoff) for gains in candidates]))
+        self.results += results
+        self.num_simulations += len(results)
+        return results
+
+    def run(self, workers=1, tolerance=0.01, max_simulations=200):
+        # Returns (best gains, best cost). Stops once every step has shrunk below tolerance times its first
+        # size, or after max_simulations runs. workers=None uses every core.
+        gains = OrderedDict((gain, float(self.initial_gains[gain])) for gain in self.GAINS)
+        steps = OrderedDict((gain, float(self.steps[gain])) for gain in self.tune)
+        self.results = []
+        self.num_simulations = 0
+        seen = set()
+
+        executor = None
+        if workers != 1:
+            self.model.init_sim_vars()  # ship an empty trace with the template model
+            executor = ProcessPoolExecutor(max_workers=workers or cpu_count(), initializer=_init_worker,
+                                           initargs=(self,))
+        try:
+            best = self._evaluate_round([gains], np.inf, executor)[0]
+            seen.add(tuple(gains.values()))
+            while self.num_simulations < max_simulations and \
+                    any(steps[gain] > tolerance * self.steps[gain] for gain in self.tune):
+                candidates = []
+                for gain in self.tune:
+                    for sign in (1, -1):
+                        candidate = OrderedDict(gains)
+                        candidate[gain] = max(0.0, gains[gain] + sign * steps[gain])
+                        key = tuple(candidate.values())
+                        if key not in seen:
+                            seen.add(key)
+                            candidates.append(candidate)
+                candidates = candidates[:max_simulations - self.num_simulations]
+                results = [r for r in self._evaluate_round(candidates, best['cost'], executor) if not r['pruned']]
+                improved = min(results, key=lambda r: r['cost'], default=None)
+                if improved is not None and improved['cost'] < best['cost']:
+                    best = improved
+                    gains = OrderedDict((gain, best[gain]) for gain in self.GAINS)
+                else:
+                    steps = OrderedDict((gain, step / 2) for gain, step in steps.items())
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return OrderedDict((gain, best[gain]) for gain in self.GAINS), best['cost']
+
+    def get_ranked(self):  # completed runs best first, followed by the pruned ones
+        return sorted(self.results, key=lambda r: (r['pruned'], r['cost']))
+
+    def format_table(self, count=10):
+        columns = self.GAINS + ('cost',) + self.COSTS
+        lines = [" ".join("{:>16s}".format(column) for column in columns) + "  settled"]
+        for result in self.get_ranked()[:count]:
+            lines.append(" ".join("{:16.6g}".format(result[column]) for column in columns) +
+                         "  {}".format('pruned' if result['pruned'] else result['settled']))
+        return "\n".join(lines)
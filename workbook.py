@@ -0,0 +1,83 @@
+import re
+
+import numpy as np
+
+MAX_SHEET_NAME = 31
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+def open_workbook(filename):
+    # constant_memory streams each row to disk once the next one is started, so rows have to be written in
+    # order and nothing can be written above the current row afterwards (vertical merges included).
+    import xlsxwriter
+
+    return xlsxwriter.Workbook(filename, {'constant_memory': True, 'nan_inf_to_errors': True})
+
+
+def get_sheet_name(name):
+    return _INVALID_SHEET_CHARS.sub('_', name)[:MAX_SHEET_NAME]
+
+
+def _to_cells(values):  # numpy scalars aren't all accepted by xlsxwriter
+    return [v.item() if isinstance(v, np.generic) else v for v in values]
+
+
+def write_grid(workbook, sheet_name, title, row_label, row_values, column_label, column_values, data):
+    # Writes data[i][j] against row_values[i] and column_values[j] with one colour scale over the whole grid
+    worksheet = workbook.add_worksheet(get_sheet_name(sheet_name))
+    header_format = workbook.add_format({
+        'align':     'center',
+        'valign':    'vcenter',
+        'font_size': 16,
+        'bold':      True
+    })
+    label_format = workbook.add_format({'bold': True})
+    worksheet.freeze_panes(2, 1)
+    worksheet.set_row(0, 24)
+    worksheet.set_column(0, 0, 14)
+    worksheet.set_column(1, len(column_values), 8)
+
+    worksheet.write_string(0, 0, title, header_format)
+    if len(column_values) > 1:
+        worksheet.merge_range(0, 1, 0, len(column_values), column_label, header_format)
+    else:
+        worksheet.write_string(0, 1, column_label, header_format)
+    worksheet.write_row(1, 0, [row_label], label_format)
+    worksheet.write_row(1, 1, _to_cells(column_values), label_format)
+    for i, (value, row) in enumerate(zip(_to_cells(row_values), data)):
+        worksheet.write(i + 2, 0, value, label_format)
+        worksheet.write_row(i + 2, 1, np.asarray(row, dtype=float).tolist())
+
+    worksheet.conditional_format(2, 1, len(row_values) + 1, len(column_values), {
+        'type':      '3_color_scale',
+        'min_color': '#00ee00',
+        'mid_color': '#ffffff',
+        'max_color': '#ee0000'
+    })
+    return worksheet
+
+
+def write_metadata(workbook, items, sheet_name='Parameters'):  # items: (key, value) pairs, one per row
+    worksheet = workbook.add_worksheet(get_sheet_name(sheet_name))
+    label_format = workbook.add_format({'bold': True})
+    worksheet.set_column(0, 0, 28)
+    worksheet.set_column(1, 1, 40)
+    for row, (key, value) in enumerate(items):
+        if isinstance(value, (list, tuple, np.ndarray)):
+            value = ", ".join(str(v) for v in value)
+        elif isinstance(value, (bool, np.bool_)) or not isinstance(value, (int, float, np.number, str)):
+            value = str(value)
+        worksheet.write(row, 0, key, label_format)
+        worksheet.write(row, 1, value)
+    return worksheet
+
+
+def write_table(workbook, sheet_name, columns, rows):  # a header row, then one row per entry
+    worksheet = workbook.add_worksheet(get_sheet_name(sheet_name))
+    label_format = workbook.add_format({'bold': True})
+    worksheet.freeze_panes(1, 0)
+    worksheet.set_column(0, max(len(columns) - 1, 0), 16)
+    worksheet.write_row(0, 0, columns, label_format)
+    for i, row in enumerate(rows):
+        worksheet.write_row(i + 1, 0, _to_cells(row))
+    return worksheet